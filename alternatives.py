@@ -0,0 +1,148 @@
+"""
+Similarity-based alternatives for the Grainger rep toolbar.
+
+Every product is embedded as one dense, unit-length vector: its name and
+description TF-IDF reduced with truncated SVD, next to scaled price and
+rating and a hashed category block. Nearest neighbours are found with an
+inverted-file (IVF) index: k-means splits the catalog into lists, and each
+product only compares against in-stock products in the few lists nearest
+its own. The top k per product are computed once, in batches per list, and
+handed to the relationship graph as its alternatives edges, so showing a
+product's alternatives stays a cached slice.
+"""
+
+import math
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+TEXT_DIMS = 64
+CATEGORY_DIMS = 16
+# share of the vector each attribute group gets
+TEXT_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.6
+PRICE_WEIGHT = 0.3
+RATING_WEIGHT = 0.15
+
+EXACT_SEARCH_MAX = 5000   # catalogs up to this size compare every pair
+N_PROBE = 8               # IVF lists searched per product
+
+
+def product_columns(catalog: Any) -> Dict[str, Any]:
+    """Text, category, price, rating and stock columns of a catalog, in row order"""
+    rows = range(len(catalog))
+    field = catalog.field
+    return {
+        "text": [f"{field(r, 'name')} {field(r, 'description')}" for r in rows],
+        "category": [field(r, "category") for r in rows],
+        "price": np.fromiter((field(r, "price_value") for r in rows), dtype=np.float64, count=len(rows)),
+        "rating": np.fromiter((field(r, "rating") for r in rows), dtype=np.float64, count=len(rows)),
+        "stock": np.fromiter((field(r, "stock") for r in rows), dtype=np.int64, count=len(rows)),
+    }
+
+
+def embed(columns: Dict[str, Any], dims: int = TEXT_DIMS, seed: int = 0) -> np.ndarray:
+    """(n, d) float32 matrix of unit-length product vectors"""
+    n = len(columns["text"])
+    tfidf = TfidfVectorizer(sublinear_tf=True, max_features=1 << 17, dtype=np.float32).fit_transform(columns["text"])
+    dims = min(dims, tfidf.shape[1] - 1, n - 1)
+    if dims >= 1:
+        text = TruncatedSVD(n_components=dims, n_iter=3, random_state=seed).fit_transform(tfidf)
+    else:
+        text = tfidf.toarray()
+    text = _unit_rows(text.astype(np.float32))
+
+    category = np.zeros((n, CATEGORY_DIMS), dtype=np.float32)
+    buckets = [zlib.crc32(c.encode("utf-8")) % CATEGORY_DIMS for c in columns["category"]]
+    category[np.arange(n), buckets] = 1.0
+
+    # price on a log scale, so $10 vs $20 is as far apart as $100 vs $200
+    price = np.log1p(columns["price"])
+    price = (price - price.mean()) / (price.std() or 1.0)
+    rating = (columns["rating"] - 2.5) / 2.5
+
+    vectors = np.hstack([
+        text * TEXT_WEIGHT,
+        category * CATEGORY_WEIGHT,
+        price[:, None].astype(np.float32) * PRICE_WEIGHT,
+        rating[:, None].astype(np.float32) * RATING_WEIGHT,
+    ])
+    return _unit_rows(vectors)
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column positions and scores of each row's k best entries, best first"""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def nearest_neighbors(vectors: np.ndarray, allowed: np.ndarray, k: int = 5, n_lists: Optional[int] = None,
+                      n_probe: int = N_PROBE, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (product rows, neighbour rows, cosine similarity) of each product's k
+    nearest allowed products, excluding itself. Small catalogs are searched
+    exactly; larger ones through an IVF index with n_lists k-means lists
+    """
+    n = len(vectors)
+    allowed_rows = np.flatnonzero(allowed)
+    if n == 0 or len(allowed_rows) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+
+    if n_lists is None:
+        n_lists = 1 if n <= EXACT_SEARCH_MAX else int(math.sqrt(n))
+    if n_lists <= 1:
+        groups = [(np.arange(n), allowed_rows)]
+    else:
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=1, random_state=seed)
+        labels = kmeans.fit_predict(vectors)
+        centroids = _unit_rows(kmeans.cluster_centers_.astype(np.float32))
+        members = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[members], np.arange(n_lists + 1))
+        allowed_by_list = [members[bounds[c]:bounds[c + 1]][allowed[members[bounds[c]:bounds[c + 1]]]]
+                           for c in range(n_lists)]
+        # every product in a list probes the same lists: the ones nearest its centroid
+        probes, _ = _top_k(centroids @ centroids.T, min(n_probe, n_lists))
+        groups = [(members[bounds[c]:bounds[c + 1]], np.concatenate([allowed_by_list[p] for p in probes[c]]))
+                  for c in range(n_lists)]
+
+    src, dst, sim = [], [], []
+    for queries, candidates in groups:
+        if not len(queries) or not len(candidates):
+            continue
+        for start in range(0, len(queries), 4096):
+            batch = queries[start:start + 4096]
+            scores = vectors[batch] @ vectors[candidates].T
+            scores[batch[:, None] == candidates[None, :]] = -np.inf  # a product is not its own alternative
+            top, top_scores = _top_k(scores, k)
+            keep = np.isfinite(top_scores)
+            src.append(np.repeat(batch, top.shape[1])[keep.ravel()])
+            dst.append(candidates[top][keep])
+            sim.append(top_scores[keep])
+    if not src:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    return np.concatenate(src), np.concatenate(dst), np.concatenate(sim)
+
+
+def build_alternatives(catalog: Any, k: int = 5, **kwargs) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(product rows, alternative rows, similarity): each product's k most similar in-stock products"""
+    columns = product_columns(catalog)
+    vectors = embed(columns)
+    return nearest_neighbors(vectors, columns["stock"] > 0, k=k, **kwargs)
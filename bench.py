@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the prototype's hot paths.
+
+run: python bench.py <benchmark> [--n N]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def bench_classifier(n):
+    """Utterances/sec for transcript classification on a synthetic n-utterance transcript."""
+    import main
+
+    rng = random.Random(0)
+    templates = [
+        "Customer: I need details for product ID {n}. What is the warranty?",
+        "Customer: Also, does it come in different colors?",
+        "Customer: thanks, that helps.",
+        "Agent: The warranty is one year.",
+        "Agent: Yes, product ID {n} is available in red, blue, and green.",
+        "Agent: Hello, thank you for calling. How may I help you?",
+    ]
+    utterances = [rng.choice(templates).format(n=rng.randint(1000, 99999)) for _ in range(n)]
+
+    def baseline(batch):
+        # what parse_json_transcript used to do per utterance
+        out = []
+        for utterance in batch:
+            match = re.search(r'product\s*ID\s*([0-9]+)', utterance, re.IGNORECASE)
+            if utterance.startswith("Customer:"):
+                text = utterance.split("Customer:")[-1].strip()
+            elif utterance.startswith("Agent:"):
+                text = utterance.split("Agent:")[-1].strip()
+            else:
+                text = utterance
+            out.append((text, text.endswith('?'), match.group(1) if match else None))
+        return out
+
+    # the batched alternative: one alternation over each newline-joined chunk
+    # of 256, capturing product ID, speaker and text per line in a single scan
+    line_re = re.compile(r"(?m)^(?:(?=.*?(?i:product[^\S\n]*ID[^\S\n]*)([0-9]+)))?"
+                         r"(?:(Customer|Agent):(?:.*\2:)?)?(.*)$")
+
+    def joined_chunks(batch):
+        out = []
+        for i in range(0, len(batch), 256):
+            for product, speaker, text in line_re.findall("\n".join(batch[i:i + 256])):
+                if speaker:
+                    text = text.strip()
+                out.append((speaker or None, text, text.endswith("?"), product or None))
+        return out
+
+    _, old_secs = _timed(baseline, utterances)
+    single, new_secs = _timed(lambda: list(map(main.classify_utterance, utterances)))
+    joined, joined_secs = _timed(joined_chunks, utterances)
+    assert joined == single
+    print(f"{n:,} utterances")
+    print(f"  per-utterance re.search + split : {n / old_secs:12,.0f} utterances/sec")
+    print(f"  compiled single-pass classifier : {n / new_secs:12,.0f} utterances/sec")
+    print(f"  one regex per 256-line chunk    : {n / joined_secs:12,.0f} utterances/sec")
+
+
+def bench_product_search(n):
+    """ProductIndex build, save/load time and lookup latency for an n-SKU synthetic catalog."""
+    import os
+    import tempfile
+    from product_index import ProductIndex
+
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(max(1000, n // 20))]
+    skus = [f"SKU{i:07d}" for i in range(n)]
+    products = {
+        sku: {"name": " ".join(rng.sample(words, 3)), "category": rng.choice(words[:50]),
+              "description": " ".join(rng.sample(words, 8))}
+        for sku in skus
+    }
+
+    index, build_secs = _timed(ProductIndex.build, products)
+    print(f"{n:,} SKUs, {len(index.postings):,} tokens: built in {build_secs:.2f}s")
+    path = os.path.join(tempfile.mkdtemp(), "product_index.bin")
+    _, save_secs = _timed(index.save, path)
+    index, load_secs = _timed(ProductIndex.load, path)
+    print(f"  saved in {save_secs:.2f}s ({os.path.getsize(path) / 1e6:.1f} MB), loaded in {load_secs * 1e3:.2f}ms")
+    for label, queries in [
+        ("SKU lookup", [rng.choice(skus).lower() for _ in range(1000)]),
+        ("one-word search", [rng.choice(words) for _ in range(1000)]),
+        ("two-word search", [f"{rng.choice(words)} {rng.choice(words)}" for _ in range(1000)]),
+    ]:
+        _, secs = _timed(lambda: [index.search(q, limit=3) for q in queries])
+        print(f"  {label:16}: {secs / len(queries) * 1e3:.3f} ms/query")
+
+
+def bench_catalog_memory(n):
+    """Memory of an n-product catalog as dict-of-dicts versus ProductStore."""
+    import gc
+    import json
+    import tracemalloc
+    from catalog import ProductStore
+
+    rng = random.Random(0)
+    families = [
+        {
+            "category": rng.choice(["respirators", "hand_tools", "power_tools", "eye_protection"]),
+            "description": f"Family {f} description. " + "Rated for industrial use and meets ANSI standards. " * 2,
+            "frequently_bought_together": [f"SKU{rng.randrange(n):07d}" for _ in range(3)],
+            "alternatives": [f"SKU{rng.randrange(n):07d}" for _ in range(3)],
+        }
+        for f in range(1000)
+    ]
+    catalog = {}
+    for i in range(n):
+        product = dict(rng.choice(families))
+        product.update({
+            "name": f"Product {i} {product['category']}",
+            "price": f"${rng.uniform(1, 900):.2f}/each",
+            "stock": rng.randrange(1000),
+            "rating": round(rng.uniform(3, 5), 1),
+            "sku": f"SKU{i:07d}",
+        })
+        catalog[product["sku"]] = product
+    # round-trip through JSON so repeated values are separate objects, as when loaded from a file
+    text = json.dumps(catalog)
+    del catalog
+    gc.collect()
+
+    tracemalloc.start()
+    products = json.loads(text)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    store = ProductStore.from_dict(products)
+    del products
+    gc.collect()
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{n:,} products")
+    print(f"  dict of dicts : {dict_bytes / 1e6:9.1f} MB ({dict_bytes / n:6.0f} bytes/product)")
+    print(f"  ProductStore  : {store_bytes / 1e6:9.1f} MB ({store_bytes / n:6.0f} bytes/product)")
+
+
+def bench_catalog_startup(n):
+    """Time to open an n-product catalog and look up a product: mapped file versus building a ProductStore."""
+    import os
+    import tempfile
+    from catalog import MappedCatalog, ProductStore, write_catalog
+
+    rng = random.Random(0)
+    products = {
+        f"SKU{i:07d}": {
+            "name": f"Product {i}", "category": rng.choice(["respirators", "hand_tools", "power_tools"]),
+            "price": f"${rng.uniform(1, 900):.2f}/each", "stock": rng.randrange(1000),
+            "rating": round(rng.uniform(3, 5), 1), "description": f"Family {i % 1000} description.",
+            "frequently_bought_together": [f"SKU{rng.randrange(n):07d}" for _ in range(3)],
+            "alternatives": [f"SKU{rng.randrange(n):07d}" for _ in range(3)],
+        }
+        for i in range(n)
+    }
+    path = os.path.join(tempfile.mkdtemp(), "catalog.bin")
+    _, write_secs = _timed(write_catalog, products, path)
+    print(f"{n:,} products: catalog file written in {write_secs:.2f}s ({os.path.getsize(path) / 1e6:.1f} MB)")
+    skus = [f"SKU{rng.randrange(n):07d}" for _ in range(1000)]
+    for label, opener in [("ProductStore.from_dict", lambda: ProductStore.from_dict(products)),
+                          ("MappedCatalog", lambda: MappedCatalog(path))]:
+        catalog, open_secs = _timed(opener)
+        _, lookup_secs = _timed(lambda: [catalog[sku].to_dict() for sku in skus])
+        print(f"  {label:22}: open {open_secs * 1e3:9.2f} ms, {lookup_secs / len(skus) * 1e6:6.1f} us/product decoded")
+
+
+def bench_relation_graph(n):
+    """RelationGraph build and neighbour/k-hop latency for n products with ~10 edges each."""
+    import numpy as np
+    from catalog import ProductStore
+    from relations import Adjacency, RelationGraph
+
+    rng = np.random.default_rng(0)
+    store = ProductStore()
+    for i in range(n):
+        store[f"SKU{i:07d}"] = {"name": f"Product {i}"}
+    n_edges = n * 10
+    src = rng.integers(0, n, n_edges)
+    dst = rng.integers(0, n, n_edges)
+    weight = rng.random(n_edges)
+    adjacency, build_secs = _timed(Adjacency.from_edges, n, src, dst, weight)
+    print(f"{n:,} products, {adjacency.n_edges:,} edges: CSR built in {build_secs:.2f}s")
+    graph = RelationGraph(store, {"frequently_bought_together": adjacency})
+    skus = [f"SKU{rng.integers(0, n):07d}" for _ in range(1000)]
+    for label, fn in [("ranked neighbours", lambda sku: graph.ranked(sku, "frequently_bought_together", 10)),
+                      ("2-hop, fanout 10", lambda sku: graph.k_hop(sku, "frequently_bought_together", 2, 10, 10))]:
+        _, secs = _timed(lambda: [fn(sku) for sku in skus])
+        print(f"  {label:18}: {secs / len(skus) * 1e3:.3f} ms/query")
+
+
+def bench_copurchase(n):
+    """Co-purchase counting and top-N scoring for n order lines over a 100k-SKU catalog."""
+    import resource
+    from copurchase import CHUNK_LINES, CopurchaseCounts
+
+    rng = random.Random(0)
+    skus = [f"SKU{i:07d}" for i in range(100_000)]
+    counts = CopurchaseCounts(skus)
+
+    lines = order = 0
+    count_secs = 0.0
+    while lines < n:
+        # generating the synthetic chunk is not part of the timing
+        order_ids, chunk = [], []
+        while len(chunk) < CHUNK_LINES and lines + len(chunk) < n:
+            order += 1
+            for _ in range(rng.randint(1, 6)):
+                order_ids.append(str(order))
+                chunk.append(skus[min(int(rng.paretovariate(1.2)) - 1, len(skus) - 1)])
+        lines += len(chunk)
+        _, secs = _timed(counts.add_lines, order_ids, chunk, False)
+        count_secs += secs
+    _, secs = _timed(counts.add_lines, [], [], True)
+    count_secs += secs
+
+    (src, _, _), score_secs = _timed(counts.top_pairs)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    print(f"{n:,} order lines, {counts.n_orders:,} orders")
+    print(f"  counted in {count_secs:.1f}s ({n / count_secs:,.0f} lines/sec), peak RSS {peak:.0f} MB")
+    print(f"  {counts.pairs.nnz:,} product pairs scored in {score_secs:.2f}s; {len(src):,} FBT entries kept")
+
+
+def bench_alternatives(n):
+    """Alternatives engine: embedding and IVF build time, recall against exact search and lookup latency for n SKUs."""
+    import numpy as np
+    from alternatives import embed, nearest_neighbors, product_columns
+    from catalog import ProductStore
+    from relations import Adjacency
+
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(5000)]
+    categories = [f"category{i}" for i in range(40)]
+    store = ProductStore()
+    for i in range(n):
+        family = rng.randrange(2000)
+        store[f"SKU{i:07d}"] = {
+            "name": f"{words[family]} {' '.join(rng.sample(words, 2))}",
+            "category": categories[family % len(categories)],
+            "description": " ".join([words[(family * 7 + j) % len(words)] for j in range(4)] + rng.sample(words, 4)),
+            "price": f"${rng.uniform(1, 900):.2f}/each", "stock": rng.choice([0, rng.randrange(1, 500)]),
+            "rating": round(rng.uniform(3, 5), 1),
+        }
+
+    columns = product_columns(store)
+    vectors, embed_secs = _timed(embed, columns)
+    allowed = columns["stock"] > 0
+    (src, dst, sim), ann_secs = _timed(nearest_neighbors, vectors, allowed, 5)
+    print(f"{n:,} SKUs ({int(allowed.sum()):,} in stock): embedded in {embed_secs:.1f}s, "
+          f"top-5 neighbours for every SKU in {ann_secs:.1f}s")
+
+    adjacency = Adjacency.from_edges(n, src, dst, sim)
+    sample = np.array(rng.sample(range(n), 200))
+    exact = vectors[sample] @ vectors[allowed].T
+    exact[sample[:, None] == np.flatnonzero(allowed)[None, :]] = -np.inf
+    exact_top = np.flatnonzero(allowed)[np.argsort(-exact, axis=1)[:, :5]]
+    found = sum(len(set(adjacency.neighbors(r)[0].tolist()) & set(t.tolist())) for r, t in zip(sample, exact_top))
+    print(f"  recall@5 against exact search: {found / exact_top.size:.1%}")
+    _, secs = _timed(lambda: [adjacency.neighbors(int(r)) for r in sample])
+    print(f"  cached top-k lookup: {secs / len(sample) * 1e6:.1f} us/query")
+
+
+def _synthetic_questions(n, rng):
+    products = [f"product{i}" for i in range(2000)]
+    verbs = ["install", "apply", "clean", "store", "replace", "charge", "mount", "seal", "cure", "test"]
+    topics = ["temperature", "warranty", "voltage", "size", "color", "weight", "cure time", "surface",
+              "battery", "filter", "lens", "thread", "mask", "glove", "drill bit", "blade"]
+    return [f"How do I {rng.choice(verbs)} the {rng.choice(products)} {rng.choice(topics)} "
+            f"on {rng.choice(topics)} {rng.choice(verbs)}?" for _ in range(n)]
+
+
+def bench_batch_search(n):
+    """Replaying 2,000 queries against n questions: one search() per query versus search_batch()."""
+    from search_index import TfidfIndex
+
+    rng = random.Random(0)
+    texts = _synthetic_questions(n, rng)
+    index = TfidfIndex()
+    _, fit_secs = _timed(index.fit, list(range(1, n + 1)), texts, [1000 + i % 50 for i in range(n)])
+    queries = _synthetic_questions(2_000, rng)
+    print(f"{n:,} questions (fit in {fit_secs:.1f}s), {len(queries):,} queries, top 3")
+    _, loop_secs = _timed(lambda: [index.search(q, k=3, threshold=0.2) for q in queries])
+    _, batch_secs = _timed(index.search_batch, queries, 3, 0.2)
+    print(f"  search() per query : {len(queries) / loop_secs:10,.0f} queries/sec")
+    print(f"  search_batch()     : {len(queries) / batch_secs:10,.0f} queries/sec")
+
+
+def bench_scoring_kernel(n):
+    """Top-3 scoring at 10^4 questions and each power of ten up to n: sklearn cosine_similarity over the whole matrix versus the posting-list kernel."""
+    import numpy as np
+    from sklearn.metrics.pairwise import cosine_similarity
+    from search_index import TfidfIndex
+
+    rng = random.Random(0)
+    texts = _synthetic_questions(n, rng)
+    queries = _synthetic_questions(1_000, rng)
+    sizes = [size for size in (10_000, 100_000, 1_000_000) if size < n] + [n]
+    for size in sizes:
+        index = TfidfIndex()
+        _, fit_secs = _timed(index.fit, list(range(1, size + 1)), texts[:size], [1000 + i % 50 for i in range(size)])
+        print(f"{size:,} questions (fit in {fit_secs:.1f}s), top 3 above 0.2")
+
+        def legacy(query):
+            # the original tfidf_search_all: score every row, then filter and sort in Python
+            similarities = cosine_similarity(index.vectorizer.transform([query]), index.matrix)[0]
+            scored = [(i, score) for i, score in enumerate(similarities) if score > 0.2]
+            scored.sort(key=lambda x: x[1], reverse=True)
+            return scored[:3]
+
+        sample = queries[:max(20, min(len(queries), 2_000_000 // size))]
+        expected, legacy_secs = _timed(lambda: [legacy(q) for q in sample])
+        found, kernel_secs = _timed(lambda: [index.search(q, k=3, threshold=0.2) for q in queries])
+        _, batch_secs = _timed(index.search_batch, queries, 3, 0.2)
+        # near-ties can swap places between the two sums, so compare scores rather than rows
+        agree = sum(len(a) == len(b) and np.allclose([s for _, s in a], [s for _, s in b])
+                    for a, b in zip(expected, found))
+        print(f"  cosine_similarity : {len(sample) / legacy_secs:10,.0f} queries/sec ({len(sample)} queries)")
+        print(f"  search()          : {len(queries) / kernel_secs:10,.0f} queries/sec "
+              f"(same top-3 scores on {agree / len(sample):.0%} of the sample)")
+        print(f"  search_batch()    : {len(queries) / batch_secs:10,.0f} queries/sec")
+
+
+def bench_query_cache(n):
+    """Replaying 5,000 rep queries (a few hundred distinct, skewed) against n stored questions, with and without the query cache."""
+    import main
+
+    rng = random.Random(0)
+    conn = main.load_engine(":memory:")
+    g_item_nos = [g for items in main.load_categories(conn).values() for g in items]
+    records = [(rng.choice(g_item_nos), {"question": text, "answer": "See the spec sheet.",
+                                         "additional_answers": ["Ask the branch.", "Check the manual."]})
+               for text in _synthetic_questions(n, rng)]
+    main._insert_batch(conn, records)
+    main.index.sync(conn)
+    distinct = _synthetic_questions(500, rng)
+    queries = [distinct[min(int(rng.paretovariate(1.2)) - 1, len(distinct) - 1)] for _ in range(5_000)]
+    print(f"{n:,} questions, {len(queries):,} queries ({len(set(queries))} distinct), top 3")
+
+    _, plain_secs = _timed(lambda: [main.hydrate_results(conn, main.search_questions(q, k=3)) for q in queries])
+    _, cached_secs = _timed(lambda: [main.cached_search(conn, q, k=3) for q in queries])
+    stats = main.query_cache.stats()
+    print(f"  search + hydrate : {len(queries) / plain_secs:10,.0f} queries/sec")
+    print(f"  cached_search    : {len(queries) / cached_secs:10,.0f} queries/sec "
+          f"(hit rate {stats['hits']['hit_rate']:.1%}, "
+          f"{(stats['hits']['bytes'] + stats['answers']['bytes']) / 1024:,.0f} KiB cached)")
+
+
+def bench_fts_search(n):
+    """Top-3 question search over n stored questions: the in-memory TF-IDF matrix versus FTS5 candidates re-ranked with TF-IDF."""
+    import main
+
+    rng = random.Random(0)
+    conn = main.load_engine(":memory:")
+    g_item_nos = [g for items in main.load_categories(conn).values() for g in items]
+    records = [(rng.choice(g_item_nos), {"question": text, "answer": "See the spec sheet.", "additional_answers": []})
+               for text in _synthetic_questions(n, rng)]
+    _, insert_secs = _timed(main._insert_batch, conn, records)
+    main.index.sync(conn)
+    queries = _synthetic_questions(500, rng)
+    print(f"{n:,} questions (inserted with FTS5 triggers in {insert_secs:.1f}s), {len(queries)} queries, top 3")
+
+    tfidf, tfidf_secs = _timed(lambda: [main.search_questions(q, k=3) for q in queries])
+    fts, fts_secs = _timed(lambda: [main.fts_search(conn, q, k=3) for q in queries])
+    agree = sum(len({m[0] for m in a} & {m[0] for m in b}) for a, b in zip(tfidf, fts))
+    found = sum(len(a) for a in tfidf)
+    postings = main.index.postings()
+    matrix_bytes = sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (main.index.matrix, postings))
+    weights_bytes = main.index.vectorizer.idf_.nbytes + sum(
+        sys.getsizeof(t) + 28 for t in main.index.vectorizer.vocabulary_)
+    print(f"  TF-IDF matrix : {len(queries) / tfidf_secs:8,.0f} queries/sec, {matrix_bytes / 2**20:7.1f} MiB matrix + postings")
+    print(f"  FTS5 + rerank : {len(queries) / fts_secs:8,.0f} queries/sec, {weights_bytes / 2**20:7.1f} MiB vocabulary + IDF")
+    print(f"  top-3 overlap : {agree / max(found, 1):.1%}")
+
+
+def bench_dedupe(n):
+    """Near-duplicate clustering of n questions (1 in 10 a reworded copy): pairs compared within each product versus across the whole corpus."""
+    import dedupe
+    from search_index import TfidfIndex
+
+    rng = random.Random(0)
+    texts = _synthetic_questions(n, rng)
+    products = [1000 + rng.randrange(2000) for _ in range(n)]
+    copies = rng.sample(range(n), n // 10)
+    for i in copies:
+        texts.append(texts[i].replace("How do I", "How should I", 1))
+        products.append(products[i])
+    index = TfidfIndex()
+    index.fit(list(range(1, len(texts) + 1)), texts, products)
+    vectors = index.vectorizer.transform(texts)
+    print(f"{len(texts):,} questions ({len(copies):,} reworded copies) over 2,000 products, threshold {dedupe.DUPLICATE_THRESHOLD}")
+
+    (i, j, _), blocked_secs = _timed(dedupe.duplicate_pairs, vectors, products)
+    found = set(zip(i.tolist(), j.tolist()))
+    recall = sum((c, n + k) in found for k, c in enumerate(copies)) / len(copies)
+    labels, cluster_secs = _timed(dedupe.cluster_labels, len(texts), i, j)
+    print(f"  per product     : {blocked_secs:7.2f}s, {len(found):,} pairs, {recall:.1%} of the copies found")
+    print(f"  clustering      : {cluster_secs * 1e3:7.1f} ms, {len(texts) - len(set(labels.tolist())):,} questions merged")
+    if len(texts) <= 25_000:  # quadratic, and most pairs share a common word
+        _, flat_secs = _timed(dedupe.duplicate_pairs, vectors, [0] * len(texts))
+        print(f"  whole corpus    : {flat_secs:7.2f}s")
+    else:
+        print("  whole corpus    : skipped above 25,000 questions (quadratic)")
+
+
+def bench_feedback(n):
+    """n upvotes spread over 1,000 answers in an on-disk database: UPDATE + commit per click versus the buffered feedback log."""
+    import tempfile
+    import main
+    from feedback import FeedbackLog
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = main.open_database(os.path.join(tmp, "feedback.db"))
+        main._insert_batch(conn, [(1001, {"question": f"question {i}", "answer": "primary",
+                                          "additional_answers": ["extra"]}) for i in range(500)])
+        extras = [aid for (aid,) in conn.execute("SELECT answer_id FROM Answer WHERE is_primary = 0")]
+        clicks = [rng.choice(extras) for _ in range(n)]
+
+        def per_click():
+            for aid in clicks:
+                conn.execute("UPDATE Answer SET upvotes = upvotes + 1 WHERE answer_id = ? AND is_primary = 0", (aid,))
+                conn.commit()
+                conn.execute("SELECT upvotes FROM Answer WHERE answer_id = ?", (aid,)).fetchone()
+
+        def buffered():
+            log = FeedbackLog(conn, rep_id="bench")
+            for aid in clicks:
+                log.upvote(aid)
+            log.close()
+
+        _, update_secs = _timed(per_click)
+        _, log_secs = _timed(buffered)
+        conn.close()
+    print(f"{n:,} upvotes")
+    print(f"  UPDATE + commit per click : {n / update_secs:10,.0f} clicks/sec")
+    print(f"  feedback log              : {n / log_secs:10,.0f} clicks/sec (events kept in Feedback)")
+
+
+BENCHMARKS = {
+    "classifier": (bench_classifier, 1_000_000),
+    "product-search": (bench_product_search, 1_000_000),
+    "catalog-memory": (bench_catalog_memory, 1_000_000),
+    "catalog-startup": (bench_catalog_startup, 1_000_000),
+    "relation-graph": (bench_relation_graph, 1_000_000),
+    "copurchase": (bench_copurchase, 10_000_000),
+    "alternatives": (bench_alternatives, 1_000_000),
+    "batch-search": (bench_batch_search, 100_000),
+    "scoring-kernel": (bench_scoring_kernel, 1_000_000),
+    "query-cache": (bench_query_cache, 100_000),
+    "fts-search": (bench_fts_search, 100_000),
+    "feedback": (bench_feedback, 20_000),
+    "dedupe": (bench_dedupe, 100_000),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--n", type=int, default=None, help="problem size (default depends on the benchmark)")
+    args = parser.parse_args()
+    fn, default_n = BENCHMARKS[args.benchmark]
+    fn(args.n or default_n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""
+Compact product catalog storage for the Grainger rep toolbar.
+
+ProductStore keeps the catalog column by column instead of as one dict per
+product: repeated strings are interned, prices are parsed once into a number
+and a unit, stock and rating live in typed arrays and relationship lists are
+stored as integer SKU ids. Indexing it by SKU gives a ProductView that reads
+like the old product dict, so display code keeps working unchanged.
+
+write_catalog serializes a catalog to a flat binary file that MappedCatalog
+maps read-only: fixed-width records, an on-disk SKU hash table and a shared
+string heap, so the widget starts without parsing or copying the catalog.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, Iterator, List, Tuple
+
+PRICE_RE = re.compile(r"\$?\s*([0-9][0-9,]*(?:\.[0-9]+)?)\s*/*\s*(.*)")
+
+# fields a ProductView answers to, in the order the old dicts listed them
+PRODUCT_FIELDS = ("name", "category", "price", "stock", "rating", "sku", "description",
+                  "frequently_bought_together", "alternatives")
+
+
+def parse_price(price: str) -> Tuple[float, str]:
+    """Split a display price like "$556.07//kit" or "$12.75/box of 40" into (556.07, "kit")"""
+    match = PRICE_RE.match(price.strip())
+    if not match:
+        return 0.0, price.strip()
+    return float(match.group(1).replace(",", "")), match.group(2).strip()
+
+
+def format_price(value: float, unit: str) -> str:
+    """Inverse of parse_price: (223.26, "each") -> "$223.26/each" """
+    return f"${value:,.2f}/{unit}" if unit else f"${value:,.2f}"
+
+
+class ProductView:
+    """Read-only, dict-like view of one product in a ProductStore"""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "ProductStore", row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._store.field(self._row, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._store.field(self._row, key)
+        return default if value is _MISSING else value
+
+    def keys(self) -> Tuple[str, ...]:
+        return PRODUCT_FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(PRODUCT_FIELDS)
+
+    def __contains__(self, key: str) -> bool:
+        return key in PRODUCT_FIELDS
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(key, self[key]) for key in PRODUCT_FIELDS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+
+_MISSING = object()
+
+
+class ProductStore:
+    """Column-oriented product catalog with a dict-like SKU interface"""
+
+    __slots__ = ("sku_ids", "sku_names", "rows", "row_ids", "names", "categories", "descriptions",
+                 "prices", "units", "stocks", "ratings", "rel_start", "rel_len", "rel_ids")
+
+    # relationship kinds, stored side by side in the shared rel_* arrays
+    RELATIONS = ("frequently_bought_together", "alternatives")
+
+    def __init__(self):
+        # every SKU ever mentioned gets an integer id, including SKUs that are
+        # only referenced by relationship lists and are not in the catalog
+        self.sku_ids: Dict[str, int] = {}
+        self.sku_names: List[str] = []
+        self.rows = array("i")                # sku id -> row, or -1 for SKUs not in the catalog
+        self.row_ids = array("i")             # row -> sku id
+        self.names: List[str] = []
+        self.categories: List[str] = []
+        self.descriptions: List[str] = []
+        self.prices = array("d")
+        self.units: List[str] = []
+        self.stocks = array("i")
+        self.ratings = array("H")             # tenths of a star, so 4.8 stays 4.8
+        # relationship lists: row * len(RELATIONS) + kind -> slice of rel_ids
+        self.rel_start = array("i")
+        self.rel_len = array("i")
+        self.rel_ids = array("i")
+
+    @classmethod
+    def from_dict(cls, products: Dict[str, Dict[str, Any]]) -> "ProductStore":
+        store = cls()
+        for sku, product in products.items():
+            store[sku] = product
+        return store
+
+    def sku_id(self, sku: str) -> int:
+        """Integer id for a SKU, assigning one if it is new"""
+        sku_id = self.sku_ids.get(sku)
+        if sku_id is None:
+            sku_id = self.sku_ids[sys.intern(sku)] = len(self.sku_names)
+            self.sku_names.append(sku)
+            self.rows.append(-1)
+        return sku_id
+
+    def row(self, sku: str) -> int:
+        """Row of a SKU in the catalog, or -1"""
+        sku_id = self.sku_ids.get(sku)
+        return -1 if sku_id is None else self.rows[sku_id]
+
+    # ---- dict-like interface -------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def __contains__(self, sku: str) -> bool:
+        return self.row(sku) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.sku_names[sku_id] for sku_id in self.row_ids)
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[str, ProductView]]:
+        return ((self.sku_names[sku_id], ProductView(self, row)) for row, sku_id in enumerate(self.row_ids))
+
+    def __getitem__(self, sku: str) -> ProductView:
+        row = self.row(sku)
+        if row < 0:
+            raise KeyError(sku)
+        return ProductView(self, row)
+
+    def get(self, sku: str, default: Any = None) -> Any:
+        return self[sku] if sku in self else default
+
+    def __setitem__(self, sku: str, product: Dict[str, Any]):
+        """Add a product, or overwrite it in place if the SKU is already stored"""
+        price, unit = parse_price(product.get("price", ""))
+        intern = sys.intern
+        sku_id = self.sku_id(sku)
+        row = self.rows[sku_id]
+        values = (
+            intern(product.get("name", "")),
+            intern(product.get("category", "")),
+            intern(product.get("description", "")),
+            intern(unit),
+        )
+        relations = [[self.sku_id(s) for s in product.get(kind, [])] for kind in self.RELATIONS]
+
+        if row < 0:
+            row = self.rows[sku_id] = len(self.row_ids)
+            self.row_ids.append(sku_id)
+            self.names.append(values[0])
+            self.categories.append(values[1])
+            self.descriptions.append(values[2])
+            self.units.append(values[3])
+            self.prices.append(price)
+            self.stocks.append(int(product.get("stock", 0)))
+            self.ratings.append(round(float(product.get("rating", 0)) * 10))
+            for _ in self.RELATIONS:
+                self.rel_start.append(0)
+                self.rel_len.append(0)
+        else:
+            self.names[row], self.categories[row], self.descriptions[row], self.units[row] = values
+            self.prices[row] = price
+            self.stocks[row] = int(product.get("stock", 0))
+            self.ratings[row] = round(float(product.get("rating", 0)) * 10)
+
+        for kind, ids in enumerate(relations):
+            slot = row * len(self.RELATIONS) + kind
+            start, length = self.rel_start[slot], self.rel_len[slot]
+            if list(self.rel_ids[start:start + length]) == ids:
+                continue
+            # identical to the last list written (whole product families share one)? reuse it
+            prev = slot - len(self.RELATIONS)
+            if prev >= 0 and list(self.rel_ids[self.rel_start[prev]:self.rel_start[prev] + self.rel_len[prev]]) == ids:
+                self.rel_start[slot] = self.rel_start[prev]
+            else:
+                self.rel_start[slot] = len(self.rel_ids)
+                self.rel_ids.extend(ids)
+            self.rel_len[slot] = len(ids)
+
+    # ---- field access ---------------------------------------------------
+
+    def related_ids(self, row: int, kind: str) -> array:
+        """SKU ids of one relationship list for a row"""
+        slot = row * len(self.RELATIONS) + self.RELATIONS.index(kind)
+        start = self.rel_start[slot]
+        return self.rel_ids[start:start + self.rel_len[slot]]
+
+    def field(self, row: int, key: str) -> Any:
+        if key == "name":
+            return self.names[row]
+        if key == "category":
+            return self.categories[row]
+        if key == "description":
+            return self.descriptions[row]
+        if key == "sku":
+            return self.sku_names[self.row_ids[row]]
+        if key == "price":
+            return format_price(self.prices[row], self.units[row])
+        if key == "price_value":
+            return self.prices[row]
+        if key == "price_unit":
+            return self.units[row]
+        if key == "stock":
+            return self.stocks[row]
+        if key == "rating":
+            return self.ratings[row] / 10
+        if key in self.RELATIONS:
+            return [self.sku_names[i] for i in self.related_ids(row, key)]
+        return _MISSING
+
+
+# ---- memory-mapped catalog file -------------------------------------------
+#
+# Layout (little-endian):
+#   header       MAGIC, then the section table below
+#   records      one fixed-width RECORD per product row
+#   sku table    per SKU id: (string offset, length, row or -1)
+#   hash slots   open-addressing table of SKU id + 1 (0 = empty), keyed by crc32 of the SKU
+#   rel ids      relationship lists as uint32 SKU ids
+#   strings      UTF-8 heap, each distinct string stored once
+
+MAGIC = b"GRCATLG1"
+HEADER = struct.Struct("<8sIIII6Q40s")   # magic, rows, skus, slots, pad, 6 section offsets, content hash
+RECORD = struct.Struct("<I8IdiH2x4I")    # sku id, 4 x (str offset, len), price, stock, rating, 2 x (rel start, len)
+SKU_ENTRY = struct.Struct("<IIi")
+SLOT = struct.Struct("<I")
+
+
+def _sku_hash(sku: bytes) -> int:
+    return zlib.crc32(sku)
+
+
+def write_catalog(products: Any, path: str):
+    """
+    Write a catalog (a ProductStore or anything with .items() of product
+    dicts/views) to the binary format MappedCatalog reads
+    """
+    store = products if isinstance(products, ProductStore) else ProductStore.from_dict(products)
+    heap = bytearray()
+    offsets: Dict[str, Tuple[int, int]] = {}
+
+    def put(text: str) -> Tuple[int, int]:
+        loc = offsets.get(text)
+        if loc is None:
+            data = text.encode("utf-8")
+            loc = offsets[text] = (len(heap), len(data))
+            heap.extend(data)
+        return loc
+
+    records = bytearray()
+    for row, sku_id in enumerate(store.row_ids):
+        strings = [put(s) for s in (store.names[row], store.categories[row],
+                                    store.descriptions[row], store.units[row])]
+        rels = []
+        for kind in range(len(store.RELATIONS)):
+            slot = row * len(store.RELATIONS) + kind
+            rels += [store.rel_start[slot], store.rel_len[slot]]
+        records += RECORD.pack(sku_id, *(x for loc in strings for x in loc), store.prices[row],
+                               store.stocks[row], store.ratings[row], *rels)
+
+    skus = bytearray()
+    n_slots = 1
+    while n_slots < 2 * max(len(store.sku_names), 1):
+        n_slots *= 2
+    slots = [0] * n_slots
+    for sku_id, sku in enumerate(store.sku_names):
+        skus += SKU_ENTRY.pack(*put(sku), store.rows[sku_id])
+        i = _sku_hash(sku.encode("utf-8")) & (n_slots - 1)
+        while slots[i]:
+            i = (i + 1) & (n_slots - 1)
+        slots[i] = sku_id + 1
+
+    sections = [bytes(records), bytes(skus), array("I", slots).tobytes(),
+                store.rel_ids.tobytes() if sys.byteorder == "little" else _swapped(store.rel_ids), bytes(heap)]
+    content_hash = hashlib.sha1(b"".join(sections)).hexdigest().encode()
+    position = HEADER.size
+    starts = []
+    for section in sections:
+        starts.append(position)
+        position += len(section)
+    starts.append(position)
+    header = HEADER.pack(MAGIC, len(store.row_ids), len(store.sku_names), n_slots, 0, *starts, content_hash)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for section in sections:
+            f.write(section)
+    os.replace(tmp_path, path)
+
+
+def _swapped(values: array) -> bytes:
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values.tobytes()
+
+
+class MappedCatalog:
+    """
+    Read-only catalog backed by a memory-mapped file from write_catalog.
+    Opening it only reads the header; products are decoded when touched, and
+    every process mapping the same file shares its pages in the OS cache
+    """
+
+    RELATIONS = ProductStore.RELATIONS
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.n_rows, self.n_skus, self.n_slots, _,
+         self._records, self._skus, self._slots, self._rels, self._heap, self._end,
+         content_hash) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a catalog file")
+        self.content_hash = content_hash.decode()
+
+    def close(self):
+        self._map.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._heap + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def sku_name(self, sku_id: int) -> str:
+        offset, length, _ = SKU_ENTRY.unpack_from(self._map, self._skus + sku_id * SKU_ENTRY.size)
+        return self._string(offset, length)
+
+    def sku_id(self, sku: str) -> int:
+        """SKU id via the on-disk hash table, or -1"""
+        data = sku.encode("utf-8")
+        mask = self.n_slots - 1
+        i = _sku_hash(data) & mask
+        while True:
+            entry = SLOT.unpack_from(self._map, self._slots + i * SLOT.size)[0]
+            if not entry:
+                return -1
+            offset, length, _ = SKU_ENTRY.unpack_from(self._map, self._skus + (entry - 1) * SKU_ENTRY.size)
+            start = self._heap + offset
+            if length == len(data) and self._map[start:start + length] == data:
+                return entry - 1
+            i = (i + 1) & mask
+
+    def row(self, sku: str) -> int:
+        """Row of a SKU in the catalog, or -1"""
+        sku_id = self.sku_id(sku)
+        if sku_id < 0:
+            return -1
+        return SKU_ENTRY.unpack_from(self._map, self._skus + sku_id * SKU_ENTRY.size)[2]
+
+    # ---- dict-like interface (same as ProductStore) ----------------------
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __contains__(self, sku: str) -> bool:
+        return self.row(sku) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.field(row, "sku") for row in range(self.n_rows))
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[str, ProductView]]:
+        return ((self.field(row, "sku"), ProductView(self, row)) for row in range(self.n_rows))
+
+    def __getitem__(self, sku: str) -> ProductView:
+        row = self.row(sku)
+        if row < 0:
+            raise KeyError(sku)
+        return ProductView(self, row)
+
+    def get(self, sku: str, default: Any = None) -> Any:
+        return self[sku] if sku in self else default
+
+    # ---- field access ---------------------------------------------------
+
+    def _record(self, row: int) -> tuple:
+        return RECORD.unpack_from(self._map, self._records + row * RECORD.size)
+
+    def related_ids(self, row: int, kind: str) -> array:
+        """SKU ids of one relationship list for a row"""
+        record = self._record(row)
+        k = 12 + 2 * self.RELATIONS.index(kind)
+        start, length = record[k], record[k + 1]
+        ids = array("I")
+        ids.frombytes(self._map[self._rels + start * 4:self._rels + (start + length) * 4])
+        if sys.byteorder != "little":
+            ids.byteswap()
+        return ids
+
+    def field(self, row: int, key: str) -> Any:
+        record = self._record(row)
+        if key == "sku":
+            return self.sku_name(record[0])
+        if key == "name":
+            return self._string(record[1], record[2])
+        if key == "category":
+            return self._string(record[3], record[4])
+        if key == "description":
+            return self._string(record[5], record[6])
+        if key == "price":
+            return format_price(record[9], self._string(record[7], record[8]))
+        if key == "price_value":
+            return record[9]
+        if key == "price_unit":
+            return self._string(record[7], record[8])
+        if key == "stock":
+            return record[10]
+        if key == "rating":
+            return record[11] / 10
+        if key in self.RELATIONS:
+            return [self.sku_name(i) for i in self.related_ids(row, key)]
+        return _MISSING
+
+
+def open_catalog(path: str, products: Dict[str, Dict[str, Any]]) -> Any:
+    """MappedCatalog for path if it exists, otherwise a ProductStore built from products"""
+    if path and os.path.exists(path):
+        try:
+            return MappedCatalog(path)
+        except (OSError, ValueError, struct.error):
+            pass  # unreadable or from another format; fall back to the in-memory catalog
+    return ProductStore.from_dict(products)
+
+
+if __name__ == "__main__":
+    # python catalog.py <path>: write the built-in catalog to a mapped catalog file
+    from menu import PRODUCT_DB
+    write_catalog(PRODUCT_DB, sys.argv[1] if len(sys.argv) > 1 else "catalog.bin")
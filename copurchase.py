@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Co-purchase mining for frequently-bought-together lists.
+
+Reads order-line files (CSV, or Parquet when pyarrow is installed) a chunk at
+a time, turns each chunk into a sparse order x product incidence matrix X and
+adds X.T @ X to a running product x product co-occurrence count. The counts
+are saved between runs so each day's orders are added on top of the last
+state instead of re-reading history. Pairs are scored by lift (or support),
+the top N per product become its frequently_bought_together list and the
+result is written back to the catalog file the widget maps.
+
+Order lines must keep an order's lines together, as order exports do; an
+order split across two chunks is carried over rather than counted twice.
+
+run: python copurchase.py orders.csv [more files ...] [--top 5] [--min-count 3]
+"""
+
+import argparse
+import csv
+import itertools
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from catalog import ProductStore, open_catalog, write_catalog
+
+STATE_FORMAT = 1
+CHUNK_LINES = 1_000_000
+MAX_BASKET = 50          # larger orders are bulk restocks, not "bought together"
+MERGE_EVERY = 8          # chunk results summed into the running total this often
+
+
+def iter_order_lines(path: str, order_column: str = "order_id", sku_column: str = "sku",
+                     chunk_lines: int = CHUNK_LINES) -> Iterator[Tuple[List[str], List[str]]]:
+    """(order ids, SKUs) for each chunk of up to chunk_lines lines of a CSV or Parquet file"""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit(f"Reading {path} needs pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_lines, columns=[order_column, sku_column]):
+            yield ([str(x) for x in batch.column(0).to_pylist()],
+                   [str(x) for x in batch.column(1).to_pylist()])
+        return
+
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        order_i, sku_i = header.index(order_column), header.index(sku_column)
+        while True:
+            lines = list(itertools.islice(reader, chunk_lines))
+            if not lines:
+                return
+            yield [line[order_i] for line in lines], [line[sku_i] for line in lines]
+
+
+class CopurchaseCounts:
+    """Running co-occurrence counts: orders seen, orders per product and orders per product pair"""
+
+    def __init__(self, skus: List[str]):
+        self.skus = list(skus)
+        self.rows = {sku: row for row, sku in enumerate(self.skus)}
+        n = len(self.skus)
+        self.pairs = sparse.csr_matrix((n, n), dtype=np.int64)
+        self.item_counts = np.zeros(n, dtype=np.int64)
+        self.n_orders = 0
+        self._pending: List[sparse.csr_matrix] = []
+        self._carry: Tuple[List[str], List[str]] = ([], [])
+
+    # ---- counting -------------------------------------------------------
+
+    def add_file(self, path: str, **kwargs) -> int:
+        """Count every order in one file; returns the number of order lines read"""
+        lines = 0
+        for order_ids, skus in iter_order_lines(path, **kwargs):
+            lines += len(order_ids)
+            self.add_lines(order_ids, skus, final=False)
+        self.add_lines([], [], final=True)
+        return lines
+
+    def add_lines(self, order_ids: List[str], skus: List[str], final: bool = True):
+        """
+        Count one chunk of order lines. Unless final, the chunk's last order is
+        held back in case it continues in the next chunk
+        """
+        order_ids = self._carry[0] + order_ids
+        skus = self._carry[1] + skus
+        self._carry = ([], [])
+        if not final and order_ids:
+            last = order_ids[-1]
+            cut = len(order_ids)
+            while cut and order_ids[cut - 1] == last:
+                cut -= 1
+            self._carry = (order_ids[cut:], skus[cut:])
+            order_ids, skus = order_ids[:cut], skus[:cut]
+        if not order_ids:
+            return
+
+        orders: Dict[str, int] = {}
+        order_no = np.fromiter((orders.setdefault(o, len(orders)) for o in order_ids), dtype=np.int64,
+                               count=len(order_ids))
+        rows = self.rows
+        product = np.fromiter((rows.get(s, -1) for s in skus), dtype=np.int64, count=len(skus))
+        known = product >= 0
+        self.n_orders += len(orders)
+
+        # binary incidence matrix: repeated lines of one SKU in an order count once
+        x = sparse.csr_matrix((np.ones(int(known.sum()), dtype=np.int64), (order_no[known], product[known])),
+                              shape=(len(orders), len(self.skus)))
+        x.sum_duplicates()
+        x.data[:] = 1
+        self.item_counts += np.bincount(x.indices, minlength=len(self.skus))
+
+        basket = np.diff(x.indptr)
+        x = x[(basket >= 2) & (basket <= MAX_BASKET)]
+        if not x.nnz:
+            return
+        pairs = (x.T @ x).tocsr()
+        pairs.setdiag(0)
+        pairs.eliminate_zeros()
+        self._pending.append(pairs)
+        if len(self._pending) >= MERGE_EVERY:
+            self._merge()
+
+    def _merge(self):
+        if self._pending:
+            self.pairs = sum(self._pending, self.pairs).tocsr()
+            self._pending = []
+
+    # ---- scoring --------------------------------------------------------
+
+    def top_pairs(self, top_n: int = 5, min_count: int = 3, metric: str = "lift") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (product rows, partner rows, scores) keeping each product's top_n
+        partners by lift or support, among pairs bought together in at least
+        min_count orders
+        """
+        self._merge()
+        pairs = self.pairs.tocoo()
+        keep = pairs.data >= min_count
+        src, dst, count = pairs.row[keep], pairs.col[keep], pairs.data[keep].astype(np.float64)
+        if metric == "lift":
+            score = count * self.n_orders / (self.item_counts[src] * self.item_counts[dst])
+        elif metric == "support":
+            score = count / max(self.n_orders, 1)
+        else:
+            raise ValueError(f"unknown metric {metric!r}")
+
+        # best first within each product (more shared orders breaks ties), then cut at top_n
+        order = np.lexsort((dst, -count, -score, src))
+        src, dst, score = src[order], dst[order], score[order]
+        starts = np.searchsorted(src, src, side="left")
+        keep = np.arange(len(src)) - starts < top_n
+        return src[keep], dst[keep], score[keep]
+
+    def fbt_lists(self, **kwargs) -> Dict[str, List[str]]:
+        """{SKU: [partner SKU, ...]} best first, for products with any qualifying pair"""
+        src, dst, _ = self.top_pairs(**kwargs)
+        lists: Dict[str, List[str]] = {}
+        for a, b in zip(src.tolist(), dst.tolist()):
+            lists.setdefault(self.skus[a], []).append(self.skus[b])
+        return lists
+
+    # ---- persistence ----------------------------------------------------
+
+    def save(self, path: str):
+        """Write the counts so the next run can add to them"""
+        self._merge()
+        pairs = self.pairs
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, format=STATE_FORMAT, skus=np.array(self.skus), n_orders=self.n_orders,
+                            item_counts=self.item_counts, data=pairs.data, indices=pairs.indices,
+                            indptr=pairs.indptr)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, skus: List[str]) -> Optional["CopurchaseCounts"]:
+        """
+        Counts saved by save(), re-keyed to the given catalog SKUs (products no
+        longer in the catalog are dropped); None if there is no saved state
+        """
+        try:
+            state = np.load(path)
+        except OSError:
+            return None
+        if int(state["format"]) != STATE_FORMAT:
+            return None
+        counts = cls(skus)
+        counts.n_orders = int(state["n_orders"])
+        old_skus = state["skus"].tolist()
+        n_old = len(old_skus)
+        pairs = sparse.csr_matrix((state["data"], state["indices"], state["indptr"]), shape=(n_old, n_old))
+        if old_skus == counts.skus:
+            counts.pairs = pairs
+            counts.item_counts = state["item_counts"]
+            return counts
+
+        new_row = np.array([counts.rows.get(sku, -1) for sku in old_skus], dtype=np.int64)
+        kept = np.flatnonzero(new_row >= 0)
+        counts.item_counts[new_row[kept]] = state["item_counts"][kept]
+        pairs = pairs[kept][:, kept].tocoo()
+        counts.pairs = sparse.csr_matrix((pairs.data, (new_row[kept][pairs.row], new_row[kept][pairs.col])),
+                                         shape=(len(skus), len(skus)))
+        return counts
+
+
+def apply_fbt(catalog: Any, lists: Dict[str, List[str]]) -> ProductStore:
+    """Copy of the catalog with frequently_bought_together replaced wherever a mined list exists"""
+    store = ProductStore()
+    for sku, product in catalog.items():
+        product = dict(product.items())
+        if sku in lists:
+            product["frequently_bought_together"] = lists[sku]
+        store[sku] = product
+    return store
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    import menu
+
+    parser = argparse.ArgumentParser(description="Mine frequently-bought-together lists from order lines")
+    parser.add_argument("paths", nargs="+", help="order-line files (.csv, or .parquet with pyarrow)")
+    parser.add_argument("--catalog", default=menu.CATALOG_PATH,
+                        help="catalog file to read and rewrite (built from PRODUCT_DB if missing)")
+    parser.add_argument("--state", default=os.environ.get("GRAINGER_COPURCHASE", "copurchase_state.npz"),
+                        help="saved counts to add today's orders to")
+    parser.add_argument("--fresh", action="store_true", help="ignore saved counts and start over")
+    parser.add_argument("--top", type=int, default=5, help="partners kept per product")
+    parser.add_argument("--min-count", type=int, default=3, help="orders a pair needs to qualify")
+    parser.add_argument("--metric", choices=["lift", "support"], default="lift")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES, help="order lines read per chunk")
+    parser.add_argument("--order-column", default="order_id")
+    parser.add_argument("--sku-column", default="sku")
+    args = parser.parse_args(argv)
+
+    catalog = open_catalog(args.catalog, menu.PRODUCT_DB)
+    skus = list(catalog)
+    counts = None if args.fresh else CopurchaseCounts.load(args.state, skus)
+    counts = counts or CopurchaseCounts(skus)
+    for path in args.paths:
+        lines = counts.add_file(path, order_column=args.order_column, sku_column=args.sku_column,
+                                chunk_lines=args.chunk_lines)
+        print(f"{path}: {lines:,} order lines")
+    counts.save(args.state)
+
+    lists = counts.fbt_lists(top_n=args.top, min_count=args.min_count, metric=args.metric)
+    store = apply_fbt(catalog, lists)
+    if hasattr(catalog, "close"):
+        catalog.close()
+    write_catalog(store, args.catalog)
+    print(f"{counts.n_orders:,} orders counted; {len(lists):,} products got new frequently bought together "
+          f"lists; catalog written to {args.catalog}")
+
+
+if __name__ == "__main__":
+    main()
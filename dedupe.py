@@ -0,0 +1,78 @@
+"""
+Near-duplicate question detection over TF-IDF vectors.
+
+Questions are only ever compared with questions about the same product, and
+two count as duplicates when the cosine similarity of their (L2-normalized)
+TF-IDF rows reaches the threshold. Used at ingest to merge a new paraphrase
+into the stored question, and by the recluster job to merge the paraphrases
+already in the database.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+DUPLICATE_THRESHOLD = 0.9
+CHUNK_ROWS = 1000  # rows compared at once, which bounds the size of one similarity block
+
+
+def product_groups(products):
+    """Row positions of each product's rows, as {g_item_no: array of positions}"""
+    products = np.asarray(products, dtype=np.int64)
+    if not len(products):
+        return {}
+    order = np.argsort(products, kind="stable")
+    starts = np.flatnonzero(np.r_[True, products[order][1:] != products[order][:-1]])
+    ends = np.r_[starts[1:], len(order)]
+    return {int(products[order[s]]): order[s:e] for s, e in zip(starts, ends)}
+
+
+def best_matches(vectors, products, stored_vectors, stored_products, threshold=DUPLICATE_THRESHOLD):
+    """
+    For each row of vectors, the position of the most similar stored row
+    about the same product and its similarity, or -1 and 0.0 when none
+    reaches threshold
+    """
+    best = np.full(vectors.shape[0], -1, dtype=np.int64)
+    best_sim = np.zeros(vectors.shape[0])
+    stored_groups = product_groups(stored_products)
+    for g_item_no, rows in product_groups(products).items():
+        stored_rows = stored_groups.get(g_item_no)
+        if stored_rows is None:
+            continue
+        candidates = stored_vectors[stored_rows].T.tocsc()
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk = rows[start:start + CHUNK_ROWS]
+            sims = (vectors[chunk] @ candidates).tocsr()
+            top = np.asarray(sims.argmax(axis=1)).ravel()
+            top_sim = sims[np.arange(len(chunk)), top].A1 if sims.nnz else np.zeros(len(chunk))
+            hit = top_sim >= threshold
+            best[chunk[hit]] = stored_rows[top[hit]]
+            best_sim[chunk[hit]] = top_sim[hit]
+    return best, best_sim
+
+
+def duplicate_pairs(vectors, products, threshold=DUPLICATE_THRESHOLD):
+    """(i, j, similarity) arrays of every pair of rows i < j about the same product at or above threshold"""
+    found_i, found_j, found_sim = [], [], []
+    for rows in product_groups(products).values():
+        if len(rows) < 2:
+            continue
+        group = vectors[rows].T.tocsc()
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk = rows[start:start + CHUNK_ROWS]
+            sims = (vectors[chunk] @ group).tocoo()
+            i, j = chunk[sims.row], rows[sims.col]
+            keep = (sims.data >= threshold) & (i < j)
+            found_i.append(i[keep])
+            found_j.append(j[keep])
+            found_sim.append(sims.data[keep])
+    if not found_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_sim)
+
+
+def cluster_labels(n, i, j):
+    """Cluster number of each of n rows, where rows linked by any (i, j) pair share a cluster"""
+    graph = sparse.coo_matrix((np.ones(len(i), dtype=np.int8), (i, j)), shape=(n, n))
+    return connected_components(graph, directed=False)[1]
@@ -0,0 +1,156 @@
+"""
+Write-behind log of rep feedback on answers.
+
+Upvotes and flags are appended to an in-memory buffer instead of being
+written one click at a time. The buffer is flushed in one transaction once it
+holds enough events or its oldest event is old enough (or on flush() /
+close()): the events go into the Feedback table and the Answer.upvotes /
+Answer.flags counters are bumped by the batch's totals in the same commit.
+Upvotes also add their time weight to Answer.rank_mass and the answer's
+rank_score is recomputed (see ranking.py), in the same commit. Until then the
+log adds its pending counts on top of the stored ones, so the rep who clicked
+sees the new score and order straight away.
+
+Counters are only ever incremented, so several processes can log feedback on
+the same database; each one sees the others' votes once they are flushed and
+it reads the answer again.
+"""
+
+import getpass
+import os
+import time
+
+import ranking
+
+FLUSH_EVENTS = 100     # buffered events that trigger a flush
+FLUSH_SECONDS = 5.0    # age of the oldest buffered event that triggers a flush
+REP_ID = os.environ.get("GRAINGER_REP_ID") or getpass.getuser()
+
+
+class FeedbackLog:
+    """Buffered upvote / flag events for one database connection"""
+
+    def __init__(self, conn, rep_id=REP_ID, max_events=FLUSH_EVENTS, max_age=FLUSH_SECONDS, clock=time.time):
+        self.conn = conn
+        self.rep_id = rep_id
+        self.max_events = max_events
+        self.max_age = max_age
+        self.clock = clock
+        self._events = []   # (answer_id, kind, reason, rep_id, created_at) not yet written
+        self._pending = {}  # answer_id -> [upvotes, flags, rank mass] not yet written
+        self._answers = {}  # answer_id -> (question_id, is_primary, stored upvotes, flags, rank mass)
+
+    def __len__(self):
+        return len(self._events)
+
+    def answer(self, answer_id):
+        """(question_id, is_primary, upvotes, flags, rank mass) of an answer as last read, or None if there is none"""
+        info = self._answers.get(answer_id)
+        if info is None:
+            row = self.conn.execute(
+                "SELECT question_id, is_primary, upvotes, flags, rank_mass FROM Answer WHERE answer_id = ?",
+                (answer_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            info = self._answers[answer_id] = (row[0], bool(row[1]), row[2] or 0, row[3] or 0, row[4] or 0.0)
+        return info
+
+    def reload(self):
+        """Forgets the answers read so far (e.g. after they were merged), so they are read again"""
+        self._answers = {}
+
+    def pending(self, answer_id):
+        """(upvotes, flags) logged for an answer but not written yet"""
+        counts = self._pending.get(answer_id)
+        return (counts[0], counts[1]) if counts else (0, 0)
+
+    def counts(self, answer_id):
+        """(upvotes, flags) of an answer, buffered feedback included"""
+        info = self.answer(answer_id)
+        upvotes, flags = self.pending(answer_id)
+        return info[2] + upvotes, info[3] + flags
+
+    def rank(self, answer_id):
+        """Rank score of an answer, buffered feedback included"""
+        info = self.answer(answer_id)
+        counts = self._pending.get(answer_id, (0, 0, 0.0))
+        return ranking.rank_score(info[4] + counts[2], info[3] + counts[1])
+
+    def upvote(self, answer_id, rep_id=None):
+        """Logs an upvote on a non-primary answer; its new count, or None if it can't be upvoted"""
+        info = self.answer(answer_id)
+        if info is None or info[1]:
+            return None
+        upvotes = info[2] + self._log(answer_id, "upvote", None, rep_id)[0]
+        self.maybe_flush()
+        return upvotes
+
+    def flag(self, answer_id, reason="", rep_id=None):
+        """Logs a flag on an answer; its new flag count, or None if there is no such answer"""
+        info = self.answer(answer_id)
+        if info is None:
+            return None
+        flags = info[3] + self._log(answer_id, "flag", reason, rep_id)[1]
+        self.maybe_flush()
+        return flags
+
+    def _log(self, answer_id, kind, reason, rep_id):
+        """Buffers one event; returns the answer's pending [upvotes, flags]"""
+        now = self.clock()
+        self._events.append((answer_id, kind, reason, rep_id or self.rep_id, now))
+        counts = self._pending.setdefault(answer_id, [0, 0, 0.0])
+        if kind == "flag":
+            counts[1] += 1
+        else:
+            counts[0] += 1
+            counts[2] += ranking.weight(now)
+        return counts
+
+    def maybe_flush(self):
+        """Flushes if the buffer is full or its oldest event has waited long enough"""
+        if self._events and (len(self._events) >= self.max_events
+                             or self.clock() - self._events[0][4] >= self.max_age):
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered event and counter change in one transaction; returns how many events"""
+        if not self._events:
+            return 0
+        try:
+            self.conn.executemany(
+                "INSERT INTO Feedback (answer_id, kind, reason, rep_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                self._events
+            )
+            self.conn.executemany(
+                "UPDATE Answer SET upvotes = upvotes + ?, flags = flags + ?, rank_mass = rank_mass + ? "
+                "WHERE answer_id = ?",
+                [(upvotes, flags, mass, answer_id) for answer_id, (upvotes, flags, mass) in self._pending.items()]
+            )
+            # re-read the totals (other processes may have added to them) and re-rank just these answers
+            stored = {}
+            answer_ids = list(self._pending)
+            for i in range(0, len(answer_ids), 500):
+                chunk = answer_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for row in self.conn.execute(
+                    f"SELECT answer_id, question_id, is_primary, upvotes, flags, rank_mass FROM Answer "
+                    f"WHERE answer_id IN ({placeholders})", chunk
+                ):
+                    stored[row[0]] = (row[1], bool(row[2]), row[3], row[4], row[5])
+            self.conn.executemany(
+                "UPDATE Answer SET rank_score = ? WHERE answer_id = ?",
+                [(ranking.rank_score(info[4], info[3]), answer_id) for answer_id, info in stored.items()]
+            )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()  # keep the events buffered for the next try
+            raise
+        self._answers.update(stored)
+        written = len(self._events)
+        self._events = []
+        self._pending = {}
+        return written
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Headless JSON mode for the Q&A guide and the rep toolbar.
+
+Reads one JSON command per line on stdin and writes one JSON response per
+line on stdout, keeping the database connection, TF-IDF index, product index
+and relationship graph loaded between commands. Responses are written as
+soon as they are ready but only flushed when no more input is waiting, so a
+client can pipeline thousands of commands without a round trip per command.
+Upvotes and flags are buffered by the feedback log (see feedback.py) and
+written when it fills up, when input goes idle and on exit.
+
+Commands (an optional "id" is echoed back on the response):
+  {"cmd": "search", "query": "...", "category": "adhesives", "k": 3}
+  {"cmd": "search", "queries": ["...", "..."], "k": 3}    (scored as one batch)
+  {"cmd": "product", "sku": "HWN5400"}          or  {"cmd": "product", "query": "n95 mask"}
+  {"cmd": "fbt", "sku": "HWN5400", "limit": 5}
+  {"cmd": "alternatives", "sku": "HWN5400", "limit": 5}
+  {"cmd": "upvote", "answer_id": 7, "rep": "jdoe"}          (rep defaults to GRAINGER_REP_ID / login)
+  {"cmd": "flag", "answer_id": 7, "reason": "outdated", "rep": "jdoe"}
+  {"cmd": "ingest", "paths": ["transcripts/"], "workers": 4}
+  {"cmd": "recluster", "threshold": 0.9}        merge near-duplicate stored questions
+  {"cmd": "stats"}                              query cache hit rates and memory
+
+Responses: {"id": ..., "ok": true, "result": ...} or {"id": ..., "ok": false, "error": "..."}
+
+run: python headless.py < commands.ndjson
+"""
+
+import argparse
+import json
+import select
+import sys
+
+import main
+
+PRODUCT_FIELDS = ("sku", "name", "category", "price", "stock", "rating")
+
+
+class UsageError(Exception):
+    """A command that is malformed or refers to something that does not exist"""
+
+
+class Session:
+    """Warm state shared by every command of one headless process"""
+
+    def __init__(self, db_path=main.DB_PATH, index_dir=main.INDEX_DIR):
+        self.db_path = db_path
+        self.conn = main.load_engine(db_path, index_dir)
+        self._categories = None
+        self._widget = None
+
+    @property
+    def categories(self):
+        if self._categories is None:
+            self._categories = main.load_categories(self.conn)
+        return self._categories
+
+    @property
+    def widget(self):
+        """The toolbar's catalog, product index and relationship graph, loaded on first use"""
+        if self._widget is None:
+            import menu
+            self._widget = menu.GraingerWidget(show_timings=False)
+        return self._widget
+
+    def idle(self):
+        """Called whenever no more input is waiting"""
+        main.feedback.maybe_flush()
+
+    def close(self):
+        main.close_engine(self.conn)
+
+    # ---- commands ---------------------------------------------------------
+
+    def handle(self, request):
+        """Result of one decoded command"""
+        cmd = request.get("cmd")
+        handler = getattr(self, f"cmd_{cmd}", None) if isinstance(cmd, str) else None
+        if handler is None:
+            raise UsageError(f"unknown command {cmd!r}")
+        return handler(request)
+
+    def cmd_search(self, request):
+        g_item_nos = None
+        category = request.get("category")
+        if category is not None:
+            if not isinstance(category, str) or category not in self.categories:
+                raise UsageError(f"unknown category {category!r}")
+            g_item_nos = self.categories[category]
+        k = _count(request, "k", 3)
+        threshold = _number(request, "threshold", 0.2)
+
+        if "queries" in request:
+            # uncached queries are scored together; answers read once for every uncached hit
+            return main.cached_search_batch(self.conn, _strings(request, "queries"), threshold=threshold, k=k,
+                                            g_item_nos=g_item_nos, category=category)
+        return main.cached_search(self.conn, _string(request, "query"), threshold=threshold, k=k,
+                                  g_item_nos=g_item_nos, category=category)
+
+    def _product(self, sku):
+        """(canonical SKU, product) for a SKU given in any case"""
+        canonical = self.widget.index.lookup_sku(sku)
+        product = self.widget.products.get(canonical) if canonical is not None else None
+        if product is None:
+            raise UsageError(f"unknown SKU {sku!r}")
+        return canonical, product
+
+    def cmd_product(self, request):
+        if "sku" in request:
+            sku, product = self._product(_string(request, "sku"))
+            return dict(product.to_dict(), sku=sku)
+        skus = self.widget.search_products(_string(request, "query"), _count(request, "limit", 3))
+        return [{field: self.widget.products[sku][field] for field in PRODUCT_FIELDS} for sku in skus]
+
+    def _related(self, request, kind):
+        sku, _ = self._product(_string(request, "sku"))
+        ranked = self.widget.relations.ranked(sku, kind, _count(request, "limit", None))
+        return [dict({field: self.widget.products[s][field] for field in PRODUCT_FIELDS}, score=score)
+                for s, score in ranked]
+
+    def cmd_fbt(self, request):
+        return self._related(request, "frequently_bought_together")
+
+    def cmd_alternatives(self, request):
+        return self._related(request, "alternatives")
+
+    def cmd_upvote(self, request):
+        answer_id = _integer(request, "answer_id")
+        upvotes = main.upvote_answer(self.conn, answer_id, request.get("rep"))
+        if upvotes is None:
+            raise UsageError(f"cannot upvote {answer_id}: not found or primary answer")
+        return {"answer_id": answer_id, "upvotes": upvotes}
+
+    def cmd_flag(self, request):
+        answer_id = _integer(request, "answer_id")
+        flags = main.flag_answer(self.conn, answer_id, request.get("reason", ""), request.get("rep"))
+        if flags is None:
+            raise UsageError(f"cannot flag {answer_id}: not found")
+        return {"answer_id": answer_id, "flags": flags}
+
+    def cmd_ingest(self, request):
+        paths = main.expand_transcript_paths(_strings(request, "paths"))
+        if not paths:
+            raise UsageError("no transcript files matched")
+        stats = main.bulk_ingest(self.conn, paths, workers=_count(request, "workers", None),
+                                 batch_size=_count(request, "batch_size", 5000))
+        stats["indexed"] = main.index.sync(self.conn, self.db_path)
+        return stats
+
+    def cmd_recluster(self, request):
+        return main.recluster(self.conn, self.db_path, _number(request, "threshold", main.dedupe.DUPLICATE_THRESHOLD))
+
+    def cmd_stats(self, request):
+        return main.query_cache.stats()
+
+
+def _required(request, key):
+    if key not in request:
+        raise UsageError(f"missing {key!r}")
+    return request[key]
+
+
+def _string(request, key):
+    value = _required(request, key)
+    if not isinstance(value, str):
+        raise UsageError(f"{key!r} must be a string")
+    return value
+
+
+def _strings(request, key):
+    value = _required(request, key)
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise UsageError(f"{key!r} must be a list of strings")
+    return value
+
+
+def _integer(request, key):
+    value = _required(request, key)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise UsageError(f"{key!r} must be an integer")
+    return value
+
+
+def _count(request, key, default):
+    """request[key] as a positive integer, or default when it is absent (or null, if default is None)"""
+    value = request.get(key, default)
+    if value is None and default is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        raise UsageError(f"{key!r} must be a positive integer")
+    return value
+
+
+def _number(request, key, default):
+    value = request.get(key, default)
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise UsageError(f"{key!r} must be a number")
+    return value
+
+
+def _input_waiting(stream):
+    """True if more input can be read without blocking (always False when unknown)"""
+    try:
+        return bool(select.select([stream], [], [], 0)[0])
+    except (OSError, ValueError):
+        return False
+
+
+def serve(session, stdin=sys.stdin, stdout=sys.stdout):
+    """Answer commands from stdin until it closes"""
+    for line in stdin:
+        if not line.strip():
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise UsageError("command must be a JSON object")
+            request_id = request.get("id")
+            # encoded here so a result that is not JSON-serializable fails only this command
+            response = json.dumps({"id": request_id, "ok": True, "result": session.handle(request)})
+        except (UsageError, ValueError, TypeError, OSError) as e:
+            response = json.dumps({"id": request_id, "ok": False, "error": str(e)})
+        except Exception as e:
+            # a bug in one command must not take down the session serving the rest
+            response = json.dumps({"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}"})
+        stdout.write(response + "\n")
+        if not _input_waiting(stdin):
+            stdout.flush()
+            session.idle()
+    stdout.flush()
+
+
+def headless_main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer newline-delimited JSON commands on stdin.")
+    parser.add_argument("--db", default=main.DB_PATH, help="Q&A database (default: GRAINGER_DB or grainger_qa.db)")
+    parser.add_argument("--index", default=main.INDEX_DIR, help="TF-IDF index directory")
+    args = parser.parse_args(argv)
+
+    session = Session(args.db, args.index)
+    try:
+        serve(session)
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    headless_main()
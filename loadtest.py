@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Load test for service.py.
+
+Opens N concurrent keep-alive connections from one process and has each send
+requests back to back for a fixed time, then reports throughput and p50/p99
+latency per concurrency level.
+
+run: python loadtest.py [--concurrency 100 250 500 1000] [--seconds 10] [--path "/search?q=..."]
+"""
+
+import argparse
+import asyncio
+import random
+import resource
+import time
+from urllib.parse import quote
+
+QUERIES = [
+    "how do I install super adhesive",
+    "what is the temperature limit for the sealant",
+    "is the adhesive waterproof",
+    "how long does it take to cure",
+    "can I use it on wood",
+    "does the light need batteries",
+]
+
+
+def default_paths():
+    return [f"/search?q={quote(q)}" for q in QUERIES] + [f"/products?q={quote(q)}" for q in ("gloves", "n95", "drill")]
+
+
+async def client(host, port, paths, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random()
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(paths)
+            started = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors.append(head.split(b"\r\n", 1)[0])
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def run_level(host, port, paths, concurrency, seconds):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client(host, port, paths, deadline, latencies, errors)
+                                     for _ in range(concurrency)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if isinstance(r, Exception)]
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e3 if latencies else float("nan")
+    print(f"{concurrency:5d} connections: {len(latencies) / elapsed:9,.0f} req/s  "
+          f"p50 {pct(0.50):7.1f} ms  p99 {pct(0.99):7.1f} ms  "
+          f"({len(latencies):,} requests, {len(errors)} errors, {len(failed)} failed connections)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure service.py latency under concurrent load.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[100, 250, 500, 1000])
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each level")
+    parser.add_argument("--path", action="append", help="request path to use (repeatable; default: a query mix)")
+    args = parser.parse_args()
+
+    # one socket per connection; raise the soft open-file limit as far as allowed
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, max(args.concurrency) + 256)), hard))
+
+    paths = args.path or default_paths()
+    for concurrency in args.concurrency:
+        asyncio.run(run_level(args.host, args.port, paths, concurrency, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,171 @@
+import argparse
+import glob
+import os
 import sqlite3
+import sys
 import json
+import math
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import dedupe
+import ranking
+from feedback import FeedbackLog
+from query_cache import QueryCache
+from search_index import open_index
+
+index = None  # TfidfIndex over Question.question_text, see search_index.py
+query_cache = None  # QueryCache over `index`, see query_cache.py
+search_tier = None  # tier picked by load_engine, see SEARCH_TIER
+feedback = None  # FeedbackLog on load_engine's connection, see feedback.py
+
+# the knowledge base lives on disk so Q&A entries survive between rep sessions
+DB_PATH = os.environ.get("GRAINGER_DB", "grainger_qa.db")
+# saved vocabulary / IDF weights / matrix, so startup doesn't refit the vectorizer
+INDEX_DIR = os.environ.get("GRAINGER_INDEX", "grainger_index")
+# "tfidf": score against the in-memory TF-IDF matrix; "fts": pull candidates from
+# the FTS5 tables (questions and answers) and re-rank only those with TF-IDF
+SEARCH_TIER = os.environ.get("GRAINGER_SEARCH", "tfidf")
+FTS_CANDIDATES = 200  # BM25 candidates pulled per table before re-ranking
+FTS_MAX_DF = 0.05     # query words in more of the questions than this don't pull candidates
+FTS_MIN_WORDS = 2     # ...unless every word is that common, then the rarest few do
+FTS_MIN_CANDIDATES = 10  # fewer candidates than this and the query is widened...
+FTS_WIDEN_ROWS = 1000    # ...to words in up to this many questions, whatever FTS_MAX_DF allows
+
+class _JsonStream:
+    """
+    Reads one JSON document from a file a chunk at a time. Values are decoded
+    individually with raw_decode, and consumed text is dropped from the
+    buffer, so memory depends on the largest single value, not the file size.
+    """
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buf += chunk
+
+    def _error(self, msg):
+        return json.JSONDecodeError(msg, self.buf, self.pos)
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file), without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, chars):
+        c = self.peek()
+        if not c or c not in chars:
+            raise self._error(f"Expecting one of {chars!r}")
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # a number cut off at the end of the buffer decodes "successfully"; read more first
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
 
-vectorizer = None
-tfidf_matrix = None
-rows = None  # will hold (question_id, question_text, answer_text, g_item_no) → we’ll reshape this
 
-def parse_json_transcript(file_path):
-    # list to store q and a dictionaries
-    records = []
+def iter_transcript_results(file_path, chunk_size=1 << 16):
+    """
+    Yields the entries of the top-level "results" array one at a time,
+    without loading the whole export into memory.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        stream = _JsonStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == "results" and stream.peek() == "[":
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield stream.value()
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                stream.value()  # some other top-level field; skip it
+            if stream.expect(",}") == "}":
+                return
+
+
+PRODUCT_ID_RE = re.compile(r'product\s*ID\s*([0-9]+)', re.IGNORECASE)
+SPEAKER_RE = re.compile(r'(Customer|Agent):')
+
+
+def best_alternative(result):
+    """The transcript text of the highest-confidence alternative ('' if there are none)."""
+    alts = result.get("alternatives") or []
+    if not alts:
+        return ""
+    alt = alts[0] if len(alts) == 1 else max(alts, key=lambda a: a.get("confidence") or 0.0)
+    return (alt.get("transcript") or "").strip()
+
+
+def classify_utterance(utterance):
+    """
+    Classifies one utterance in a single pass.
+    Returns (speaker, text, is_question, product_id) where speaker is
+    "Customer", "Agent" or None, text is what follows the speaker label, and
+    product_id is the first "product ID <n>" mentioned (or None).
+    """
+    match = SPEAKER_RE.match(utterance)
+    speaker = match.group(1) if match else None
+    text = utterance.rpartition(speaker + ":")[2].strip() if speaker else utterance
+    product = PRODUCT_ID_RE.search(utterance)
+    return speaker, text, text.endswith('?'), product.group(1) if product else None
+
+
+def iter_qa_records(results):
+    """
+    Turns transcript results into Q&A records, yielding each one as soon as
+    the agent's answer to a customer question arrives.
+    """
     current_product_id = None
     qa_pending = None
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        transcript_data = json.load(f)
-    for result in transcript_data.get("results", []):
-        alt = result.get("alternatives", [])[0]
-        utterance = alt.get("transcript", "").strip()
-
+    for speaker, text, is_question, product_id in map(classify_utterance, map(best_alternative, results)):
         # Look for a product ID pattern
-        prod_id_match = re.search(r'product\s*ID\s*([0-9]+)', utterance, re.IGNORECASE)
-        if prod_id_match:
-            current_product_id = prod_id_match.group(1)
+        if product_id:
+            current_product_id = product_id
 
         # Identify a Customer question.
-        if utterance.startswith("Customer:"):
-            text = utterance.split("Customer:")[-1].strip()
-            if text.endswith('?'):
-                # qa_pending = {"product_id": current_product_id, "question": text}
+        if speaker == "Customer":
+            if is_question:
                 qa_pending = {
                     "product_id": current_product_id,
                     "question": text,
@@ -39,13 +174,21 @@ def parse_json_transcript(file_path):
                 }
 
         # Look for an Agent answer following a Customer question.
-        elif utterance.startswith("Agent:"):
-            text = utterance.split("Agent:")[-1].strip()
+        elif speaker == "Agent":
             if qa_pending and text:
                 qa_pending["answer"] = text
-                records.append(qa_pending)
+                yield qa_pending
                 qa_pending = None
-    return records
+
+
+def iter_json_transcript(file_path):
+    """Streams Q&A records out of a (possibly very large) JSON transcript export."""
+    return iter_qa_records(iter_transcript_results(file_path))
+
+
+def parse_json_transcript(file_path):
+    # list to store q and a dictionaries
+    return list(iter_json_transcript(file_path))
 
 
 def review_and_edit_records(records):
@@ -110,48 +253,435 @@ def insert_question_records(conn, records):
     """
     Inserts each record into Question + Answer.
     Stores the one primary answer, then any additional_answers as non-primary.
+    A question already stored for the product (or a near-duplicate of one)
+    is not inserted again: its answers are added to the stored question.
+    Returns (questions, answers) inserted.
     """
-    cursor = conn.cursor()
+    valid = []
     for rec in records:
         try:
             g_item_no = int(rec["product_id"])
-        except ValueError:
+        except (TypeError, ValueError):
             print(f"Invalid product id: {rec['product_id']}")
             continue
+        rec.setdefault("additional_answers", [])
+        valid.append((g_item_no, rec))
+    fresh, matches, _ = _match_existing(conn, valid)
+    questions, answers = _insert_batch(conn, fresh)
+    return questions, answers + _merge_matches(conn, matches)
+
 
-        # 1) Insert the question
-        cursor.execute(
-            "INSERT INTO Question (g_item_no, question_text) VALUES (?, ?)",
-            (g_item_no, rec["question"])
+def _insert_batch(conn, records):
+    """
+    Inserts [(g_item_no, record)] in one transaction with executemany.
+    Question ids are handed out up front so answers can reference them
+    without a lastrowid round trip per question; the write lock is taken
+    (BEGIN IMMEDIATE) before MAX(question_id) is read, so a concurrent
+    writer cannot hand out the same ids.
+    """
+    cursor = conn.cursor()
+    if not conn.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    try:
+        next_qid = cursor.execute("SELECT COALESCE(MAX(question_id), 0) + 1 FROM Question").fetchone()[0]
+        questions = []
+        answers = []
+        aliases = []
+        for qid, (g_item_no, rec) in enumerate(records, start=next_qid):
+            questions.append((qid, g_item_no, rec["question"]))
+            answers.append((qid, rec["answer"], 1))
+            for extra in rec.get("additional_answers", []):
+                answers.append((qid, extra, 0))
+            for text, similarity in rec.get("aliases", []):
+                aliases.append((qid, text, similarity))
+
+        cursor.executemany(
+            "INSERT INTO Question (question_id, g_item_no, question_text) VALUES (?, ?, ?)",
+            questions
+        )
+        cursor.executemany(
+            "INSERT INTO Answer (question_id, answer_text, is_primary) VALUES (?, ?, ?)",
+            answers
         )
-        qid = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO QuestionAlias (question_id, alias_text, similarity) VALUES (?, ?, ?)",
+            aliases
+        )
+        ranking.rank_unranked(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    products = {qid: g_item_no for qid, g_item_no, _ in questions}
+    _texts_added([g_item_no for _, g_item_no, _ in questions] + [products[qid] for qid, _, _ in answers],
+                 [text for _, _, text in questions] + [text for _, text, _ in answers])
+    return len(questions), len(answers)
+
+
+def _texts_added(g_item_nos, texts):
+    """
+    Tells the query cache about newly stored question / answer texts when the
+    FTS5 tier can match them right away (the TF-IDF tier hears about new
+    questions from the index itself on sync).
+    """
+    vectorizer = index.vectorizer if index is not None else None
+    if query_cache is None or search_tier != "fts" or not texts or vectorizer is None:
+        return
+    query_cache.texts_added(vectorizer.transform([text or "" for text in texts]), g_item_nos)
+
+
+def _normalize_question(text):
+    return " ".join((text or "").lower().split()).rstrip("?.! ")
 
-        # 2) Insert the primary answer
-        cursor.execute(
-            "INSERT INTO Answer (question_id, answer_text, is_primary) VALUES (?, ?, 1)",
-            (qid, rec["answer"])
+
+def _fold_record(first, rec):
+    """Keeps the answers of rec, a repeat of the question in first, on first as additional info"""
+    known = [first["answer"]] + first["additional_answers"]
+    for answer in [rec["answer"]] + rec.get("additional_answers", []):
+        if answer and answer not in known:
+            first["additional_answers"].append(answer)
+            known.append(answer)
+
+
+def _match_existing(conn, records, threshold=dedupe.DUPLICATE_THRESHOLD):
+    """
+    Dedupe stage of an insert batch of [(g_item_no, record)].
+    A record whose question is already stored for its product, word for word
+    or as a near-duplicate (TF-IDF cosine >= threshold, see dedupe.py), is
+    matched to the stored question. Near-duplicates within the batch are
+    folded into the first of them, which keeps their answers as additional
+    info and their wording in its "aliases". Near-duplicates are only looked
+    for once the index has a vectorizer.
+    Returns (records to insert, [(question_id, g_item_no, record, similarity
+    or None for a word-for-word match)], number of records folded).
+    """
+    items = sorted({g for g, _ in records})
+    stored = []  # (question_id, g_item_no, question_text) of the batch's products
+    for i in range(0, len(items), 500):
+        chunk = items[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        stored.extend(conn.execute(
+            f"SELECT question_id, g_item_no, question_text FROM Question WHERE g_item_no IN ({placeholders})",
+            chunk
+        ))
+    existing = {}
+    for qid, g, text in stored:
+        existing.setdefault((g, _normalize_question(text)), qid)
+    matches = []
+    rest = []
+    for g, rec in records:
+        qid = existing.get((g, _normalize_question(rec["question"])))
+        if qid is not None:
+            matches.append((qid, g, rec, None))
+        else:
+            rest.append((g, rec))
+
+    vectorizer = index.vectorizer if index is not None else None
+    if vectorizer is None or not rest:
+        return rest, matches, 0
+    vectors = vectorizer.transform([rec["question"] or "" for _, rec in rest])
+    products = [g for g, _ in rest]
+    unmatched = list(range(len(rest)))
+    if stored:
+        best, similarity = dedupe.best_matches(
+            vectors, products,
+            vectorizer.transform([text or "" for _, _, text in stored]), [g for _, g, _ in stored],
+            threshold
         )
+        for pos, (hit, sim) in enumerate(zip(best.tolist(), similarity.tolist())):
+            if hit >= 0:
+                matches.append((stored[hit][0], products[pos], rest[pos][1], sim))
+        unmatched = [pos for pos in unmatched if best[pos] < 0]
+
+    # near-duplicates within the batch: each cluster is inserted once, as its first record
+    vectors = vectors[unmatched]
+    i, j, _ = dedupe.duplicate_pairs(vectors, [products[pos] for pos in unmatched], threshold)
+    labels = dedupe.cluster_labels(len(unmatched), i, j)
+    fresh = []
+    firsts = {}  # cluster -> row of the record that stands for it
+    for row, (pos, label) in enumerate(zip(unmatched, labels.tolist())):
+        first = firsts.setdefault(label, row)
+        if first == row:
+            fresh.append(rest[pos])
+            continue
+        first_rec = rest[unmatched[first]][1]
+        _fold_record(first_rec, rest[pos][1])
+        first_rec.setdefault("aliases", []).append(
+            (rest[pos][1]["question"], float(vectors[first].multiply(vectors[row]).sum())))
+    return fresh, matches, len(unmatched) - len(fresh)
 
-        # 3) Insert any additional answers
-        for extra in rec.get("additional_answers", []):
-            cursor.execute(
-                "INSERT INTO Answer (question_id, answer_text, is_primary) VALUES (?, ?, 0)",
-                (qid, extra)
-            )
 
+def _merge_matches(conn, matches):
+    """
+    Stores the answers of records matched to a stored question (see
+    _match_existing) as additional info on it, skipping answers it already
+    has, and the wording of near-duplicate questions as its aliases.
+    Returns how many answers were added.
+    """
+    if not matches:
+        return 0
+    qids = sorted({qid for qid, _, _, _ in matches})
+    existing = set()
+    for i in range(0, len(qids), 500):
+        chunk = qids[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        existing.update(conn.execute(
+            f"SELECT question_id, answer_text FROM Answer WHERE question_id IN ({placeholders})",
+            chunk
+        ))
+    products = {}
+    extras = set()
+    aliases = []
+    for qid, g, rec, similarity in matches:
+        products[qid] = g
+        for text in [rec["answer"]] + rec.get("additional_answers", []):
+            if text and (qid, text) not in existing:
+                extras.add((qid, text))
+        if similarity is not None:
+            aliases.append((qid, rec["question"], similarity))
+        aliases.extend((qid, text, sim) for text, sim in rec.get("aliases", []))
+    extras = sorted(extras)
+    conn.executemany(
+        "INSERT INTO Answer (question_id, answer_text, is_primary) VALUES (?, ?, 0)", extras)
+    conn.executemany(
+        "INSERT INTO QuestionAlias (question_id, alias_text, similarity) VALUES (?, ?, ?)", aliases)
+    ranking.rank_unranked(conn)
     conn.commit()
+    if query_cache is not None:
+        query_cache.invalidate_answers({qid for qid, _ in extras})
+    _texts_added([products[qid] for qid, _ in extras], [text for _, text in extras])
+    return len(extras)
 
 
-def create_example_data(conn):
-    cursor = conn.cursor()
-    # Drop tables if they already exist
-    cursor.execute("DROP TABLE IF EXISTS Product")
-    cursor.execute("DROP TABLE IF EXISTS Question")
-    cursor.execute("DROP TABLE IF EXISTS Answer")
+def _parse_transcript_file(path):
+    """Worker for bulk_ingest: returns (path, records, error message or None)."""
+    try:
+        return path, parse_json_transcript(path), None
+    except (OSError, ValueError, LookupError, AttributeError) as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
 
+def expand_transcript_paths(patterns):
+    """
+    Expands files, directories (every file inside, recursively) and glob
+    patterns into a sorted list of transcript paths.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                paths.update(os.path.join(root, f) for f in files)
+        else:
+            paths.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def bulk_ingest(conn, paths, workers=None, batch_size=5000):
+    """
+    Non-interactive ingest of many transcripts.
+    Files are parsed in a process pool, questions already stored for the same
+    product (or repeated within the run), word for word or as near-duplicates
+    (see _match_existing), are merged instead of re-inserted, their new
+    answers are kept as additional info, and rows are written with
+    executemany in transactions of about batch_size questions.
+    Returns a stats dict.
+    """
+    started = time.perf_counter()
+    stats = {"files": len(paths), "failed": 0, "records": 0, "questions": 0,
+             "answers": 0, "duplicates": 0, "near_duplicates": 0, "invalid": 0}
+    pending = []
+    pending_keys = {}  # (g_item_no, normalized question) -> record waiting in this batch
+    matches = []  # records matched to stored questions, merged once every batch is in
+
+    def flush():
+        fresh, matched, folded = _match_existing(conn, pending)
+        matches.extend(matched)
+        near = folded + sum(1 for match in matched if match[3] is not None)
+        stats["duplicates"] += len(matched) + folded - near
+        stats["near_duplicates"] += near
+        q, a = _insert_batch(conn, fresh)
+        stats["questions"] += q
+        stats["answers"] += a
+        pending.clear()
+        pending_keys.clear()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+        for path, records, error in pool.map(_parse_transcript_file, paths, chunksize=chunksize):
+            if error:
+                stats["failed"] += 1
+                print(f"Skipping {path}: {error}")
+                continue
+            for rec in records:
+                stats["records"] += 1
+                try:
+                    g_item_no = int(rec["product_id"])
+                except (TypeError, ValueError):
+                    stats["invalid"] += 1
+                    continue
+                key = (g_item_no, _normalize_question(rec["question"]))
+                first = pending_keys.get(key)
+                if first is not None:
+                    # repeated within the batch: keep its answers on the first copy
+                    stats["duplicates"] += 1
+                    _fold_record(first, rec)
+                    continue
+                rec.setdefault("additional_answers", [])
+                pending_keys[key] = rec
+                pending.append((g_item_no, rec))
+            if len(pending) >= batch_size:
+                flush()
+    if pending:
+        flush()
+
+    # answers that arrived with a duplicate question become additional info on the stored one
+    stats["answers"] += _merge_matches(conn, matches)
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def ingest_main(argv):
+    """Command line entry point: python main.py ingest <file|dir|glob> ..."""
+    parser = argparse.ArgumentParser(prog="main.py ingest",
+                                     description="Bulk-load call transcripts into the Q&A database.")
+    parser.add_argument("paths", nargs="+", help="transcript files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="questions per insert transaction")
+    args = parser.parse_args(argv)
+
+    paths = expand_transcript_paths(args.paths)
+    if not paths:
+        print("No transcript files matched.")
+        return
+    # the index's vectorizer is what near-duplicate questions are compared with
+    conn = load_engine(DB_PATH)
+    stats = bulk_ingest(conn, paths, workers=args.workers, batch_size=args.batch_size)
+    index.sync(conn, DB_PATH)
+    close_engine(conn)
+
+    secs = max(stats["seconds"], 1e-9)
+    rows = stats["questions"] + stats["answers"]
+    print(f"Ingested {stats['files'] - stats['failed']}/{stats['files']} transcripts in {secs:.2f}s "
+          f"({(stats['files'] - stats['failed']) / secs:.1f} transcripts/sec)")
+    print(f"Inserted {stats['questions']} questions and {stats['answers']} answers "
+          f"({rows / secs:.1f} rows/sec); {stats['duplicates']} duplicate and "
+          f"{stats['near_duplicates']} near-duplicate questions merged, "
+          f"{stats['invalid']} Q&A pairs without a usable product id skipped.")
+
+
+def recluster(conn, db_path=DB_PATH, threshold=dedupe.DUPLICATE_THRESHOLD):
+    """
+    Batch re-clustering of the stored questions (the engine must be loaded).
+    Questions about the same product whose TF-IDF cosine reaches threshold
+    are grouped, transitively, and each group is merged into its oldest
+    question: the others' answers move onto it as additional info (identical
+    answers are combined, keeping their votes, flags and feedback), their
+    wording is kept as its aliases and they are deleted. The merge is one
+    transaction; the TF-IDF index is rebuilt afterwards.
+    Returns a stats dict.
+    """
+    started = time.perf_counter()
+    feedback.flush()
+    rows = conn.execute("SELECT question_id, g_item_no, question_text FROM Question ORDER BY question_id").fetchall()
+    stats = {"questions": len(rows), "clusters": 0, "merged": 0, "answers_combined": 0}
+    vectorizer = index.vectorizer
+    if vectorizer is not None and len(rows) > 1:
+        vectors = vectorizer.transform([text or "" for _, _, text in rows])
+        i, j, _ = dedupe.duplicate_pairs(vectors, [g or 0 for _, g, _ in rows], threshold)
+        labels = dedupe.cluster_labels(len(rows), i, j)
+    else:
+        labels = range(len(rows))
+
+    firsts = {}  # cluster -> row of its oldest question
+    moves = []  # (canonical question_id, duplicate question_id)
+    aliases = []
+    for row, label in enumerate(labels):
+        first = firsts.setdefault(label, row)
+        if first != row:
+            moves.append((rows[first][0], rows[row][0]))
+            aliases.append((rows[first][0], rows[row][2], float(vectors[first].multiply(vectors[row]).sum())))
+    if moves:
+        try:
+            conn.executemany("UPDATE QuestionAlias SET question_id = ? WHERE question_id = ?", moves)
+            conn.executemany(
+                "INSERT INTO QuestionAlias (question_id, alias_text, similarity) VALUES (?, ?, ?)", aliases)
+            conn.executemany("UPDATE Answer SET question_id = ?, is_primary = 0 WHERE question_id = ?", moves)
+            stats["answers_combined"] = _combine_answers(conn, sorted({qid for qid, _ in moves}))
+            conn.executemany("DELETE FROM Question WHERE question_id = ?", [(qid,) for _, qid in moves])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        # fewer questions than the index holds: sync rebuilds it, which also empties the query cache
+        feedback.reload()
+        index.sync(conn, db_path)
+    stats["clusters"] = len({qid for qid, _ in moves})
+    stats["merged"] = len(moves)
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def _combine_answers(conn, question_ids):
+    """
+    Folds answers with the same text on each question into one, keeping the
+    primary answer (else the oldest), with their upvotes, flags, decayed votes
+    and Feedback rows added together. Returns how many answers were removed.
+    """
+    kept = {}  # (question_id, answer_text) -> [answer_id, upvotes, flags, rank mass]
+    removed = []  # (kept answer_id, removed answer_id)
+    for i in range(0, len(question_ids), 500):
+        chunk = question_ids[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for answer_id, qid, text, upvotes, flags, created_at, mass in conn.execute(
+            f"SELECT answer_id, question_id, answer_text, upvotes, flags, created_at, rank_mass FROM Answer "
+            f"WHERE question_id IN ({placeholders}) ORDER BY question_id, is_primary DESC, answer_id",
+            chunk
+        ):
+            keep = kept.get((qid, text))
+            if keep is None:
+                kept[(qid, text)] = [answer_id, upvotes or 0, flags or 0, mass or 0.0]
+                continue
+            # its votes carry over; its own posting weight does not
+            posted = ranking.POSTED_WEIGHT * ranking.weight(created_at) if created_at is not None else 0.0
+            keep[1] += upvotes or 0
+            keep[2] += flags or 0
+            keep[3] += max((mass or 0.0) - posted, 0.0)
+            removed.append((keep[0], answer_id))
+    if removed:
+        survivors = {answer_id for answer_id, _ in removed}
+        conn.executemany("UPDATE Feedback SET answer_id = ? WHERE answer_id = ?", removed)
+        conn.executemany("DELETE FROM Answer WHERE answer_id = ?", [(answer_id,) for _, answer_id in removed])
+        conn.executemany(
+            "UPDATE Answer SET upvotes = ?, flags = ?, rank_mass = ?, rank_score = ? WHERE answer_id = ?",
+            [(upvotes, flags, mass, ranking.rank_score(mass, flags), answer_id)
+             for answer_id, upvotes, flags, mass in kept.values() if answer_id in survivors]
+        )
+    return len(removed)
+
+
+def recluster_main(argv):
+    """Command line entry point: python main.py recluster [--threshold 0.9]"""
+    parser = argparse.ArgumentParser(prog="main.py recluster",
+                                     description="Merge near-duplicate questions already in the Q&A database.")
+    parser.add_argument("--threshold", type=float, default=dedupe.DUPLICATE_THRESHOLD,
+                        help="TF-IDF cosine at which two questions about the same product are merged")
+    args = parser.parse_args(argv)
+
+    conn = load_engine(DB_PATH)
+    stats = recluster(conn, DB_PATH, args.threshold)
+    close_engine(conn)
+    print(f"Merged {stats['merged']} of {stats['questions']} questions into {stats['clusters']} canonical "
+          f"questions ({stats['answers_combined']} identical answers combined) in {stats['seconds']:.2f}s.")
+
+
+def _migration_1_base_schema(conn):
+    """
+    Creates the Product / Question / Answer tables.
+    """
     # 1) Product table (unchanged)
-    cursor.execute('''
-    CREATE TABLE Product (
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS Product (
       g_item_no INTEGER PRIMARY KEY,
       mfr_model INTEGER,
       product_name VARCHAR(255),
@@ -167,8 +697,8 @@ def create_example_data(conn):
     ''')
 
     # 2) Question table
-    cursor.execute('''
-    CREATE TABLE Question (
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS Question (
       question_id INTEGER PRIMARY KEY,
       g_item_no    INTEGER,
       question_text VARCHAR(255),
@@ -177,8 +707,8 @@ def create_example_data(conn):
     ''')
 
     # 3) Answer table
-    cursor.execute('''
-    CREATE TABLE Answer (
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS Answer (
       answer_id   INTEGER PRIMARY KEY,
       question_id INTEGER,
       answer_text TEXT,
@@ -188,18 +718,197 @@ def create_example_data(conn):
     )
     ''')
 
+
+def _migration_2_product_categories(conn):
+    """
+    Adds the Category table and Product.category_id, replacing the hardcoded
+    g_item_no ranges the question lookup used to filter on.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS Category (
+      category_id INTEGER PRIMARY KEY,
+      name        VARCHAR(50) UNIQUE
+    )
+    ''')
+    conn.execute("ALTER TABLE Product ADD COLUMN category_id INTEGER REFERENCES Category(category_id)")
+    conn.executemany(
+        "INSERT OR IGNORE INTO Category (category_id, name) VALUES (?, ?)",
+        [(1, 'adhesives'), (2, 'safety'), (3, 'light')]
+    )
+    # products created before categories existed keep the ranges they were grouped by
+    conn.execute("UPDATE Product SET category_id = 1 WHERE g_item_no BETWEEN 1000 AND 1005")
+    conn.execute("UPDATE Product SET category_id = 2 WHERE g_item_no BETWEEN 2000 AND 2005")
+    conn.execute("UPDATE Product SET category_id = 3 WHERE g_item_no BETWEEN 3000 AND 3005")
+
+
+def _migration_3_lookup_indexes(conn):
+    """
+    Indexes for hydrating search results: answers by question (already in
+    display order) and questions / products by the columns we filter on.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_question ON Answer(question_id, is_primary, upvotes)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_question_product ON Question(g_item_no)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_product_category ON Product(category_id)")
+
+
+def _migration_4_full_text_search(conn):
+    """
+    FTS5 indexes over question and answer text, kept in step with Question
+    and Answer by triggers (upvotes do not touch them), and filled from the
+    rows already stored.
+    """
+    for table, fts, key, column in (("Question", "QuestionText", "question_id", "question_text"),
+                                    ("Answer", "AnswerText", "answer_id", "answer_text")):
+        conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+          {column}, content='{table}', content_rowid='{key}', tokenize='porter unicode61'
+        )
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+          INSERT INTO {fts} (rowid, {column}) VALUES (new.{key}, new.{column});
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+          INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.{key}, old.{column});
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {key}, {column} ON {table} BEGIN
+          INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.{key}, old.{column});
+          INSERT INTO {fts} (rowid, {column}) VALUES (new.{key}, new.{column});
+        END
+        ''')
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def _migration_5_feedback_log(conn):
+    """
+    Adds the Feedback event log (one row per upvote or flag, with the rep and
+    the time in epoch seconds) and the Answer.flags counter next to upvotes.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS Feedback (
+      feedback_id INTEGER PRIMARY KEY,
+      answer_id   INTEGER NOT NULL,
+      kind        VARCHAR(10) NOT NULL,
+      reason      TEXT,
+      rep_id      VARCHAR(50),
+      created_at  REAL NOT NULL,
+      FOREIGN KEY (answer_id) REFERENCES Answer(answer_id)
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_answer ON Feedback(answer_id, kind)")
+    conn.execute("ALTER TABLE Answer ADD COLUMN flags INTEGER DEFAULT 0")
+
+
+def _migration_6_answer_ranking(conn):
+    """
+    Adds each answer's posting time and its precomputed rank (see ranking.py):
+    rank_mass holds its decayed votes, rank_score the sort key extras are
+    shown in. Existing answers are ranked as if posted now.
+    """
+    conn.execute("ALTER TABLE Answer ADD COLUMN created_at REAL")
+    conn.execute("ALTER TABLE Answer ADD COLUMN rank_mass REAL")
+    conn.execute("ALTER TABLE Answer ADD COLUMN rank_score REAL")
+    conn.execute("DROP INDEX IF EXISTS idx_answer_question")
+    conn.execute("CREATE INDEX idx_answer_question ON Answer(question_id, is_primary, rank_score)")
+    # finds the rows rank_unranked has to fill in without scanning the table
+    conn.execute("CREATE INDEX idx_answer_unranked ON Answer(answer_id) WHERE rank_score IS NULL")
+    ranking.rank_unranked(conn)
+
+
+def _migration_7_question_aliases(conn):
+    """
+    Adds QuestionAlias: the wording of near-duplicate questions that were
+    merged into a canonical question (see dedupe.py), with their similarity
+    to it.
+    """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS QuestionAlias (
+      alias_id    INTEGER PRIMARY KEY,
+      question_id INTEGER NOT NULL,
+      alias_text  TEXT NOT NULL,
+      similarity  REAL,
+      FOREIGN KEY (question_id) REFERENCES Question(question_id)
+    )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alias_question ON QuestionAlias(question_id)")
+
+
+# each migration moves the schema up one version; append new ones, never edit old ones
+MIGRATIONS = [
+    _migration_1_base_schema,
+    _migration_2_product_categories,
+    _migration_3_lookup_indexes,
+    _migration_4_full_text_search,
+    _migration_5_feedback_log,
+    _migration_6_answer_ranking,
+    _migration_7_question_aliases,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """
+    Brings the database schema up to SCHEMA_VERSION.
+    The current version is kept in PRAGMA user_version, so an up-to-date
+    database costs a single pragma read.
+    """
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {current} is newer than this program ({SCHEMA_VERSION})."
+        )
+    for version in range(current, SCHEMA_VERSION):
+        conn.execute("BEGIN")
+        try:
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def open_database(db_path=DB_PATH):
+    """
+    Opens (or creates) the on-disk knowledge base and applies any pending migrations.
+    WAL journaling lets searches keep reading while answers are being written.
+    """
+    conn = sqlite3.connect(db_path)
+    if db_path != ":memory:":
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    migrate(conn)
+    create_example_data(conn)
+    if ranking.rank_unranked(conn):
+        conn.commit()
+    return conn
+
+
+def create_example_data(conn):
+    """
+    Seeds the demo products, questions and answers into an empty database.
+    Existing data is left alone, so this is safe to call on every start.
+    """
+    cursor = conn.cursor()
+    if cursor.execute("SELECT 1 FROM Product LIMIT 1").fetchone():
+        return
+
     # --- dummy data ---
     products = [
-        (1001, 12345, 'Super Adhesive',   'UltraBond Series', 'Red',    'Matte', 'Tube',     '50ml',  '30', 'minutes', 'Industrial use'),
-        (1002, 67890, 'Waterproof Sealant','SealPro Series',   'Blue',   'Glossy','Bottle',   '100ml', '45', 'minutes', 'Building & construction'),
-        (1003, 54321, 'High-Temp Sealant','HeatShield Series', 'Yellow', 'Satin', 'Cartridge', '200ml', '60', 'minutes', 'Automotive')
+        (1001, 12345, 'Super Adhesive',   'UltraBond Series', 'Red',    'Matte', 'Tube',     '50ml',  '30', 'minutes', 'Industrial use', 1),
+        (1002, 67890, 'Waterproof Sealant','SealPro Series',   'Blue',   'Glossy','Bottle',   '100ml', '45', 'minutes', 'Building & construction', 1),
+        (1003, 54321, 'High-Temp Sealant','HeatShield Series', 'Yellow', 'Satin', 'Cartridge', '200ml', '60', 'minutes', 'Automotive', 1)
     ]
     cursor.executemany('''
       INSERT INTO Product
       (g_item_no, mfr_model, product_name, brand_series, color,
        finishing_features, container_type, container_size,
-       working_time, working_time_type, product_use)
-      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+       working_time, working_time_type, product_use, category_id)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', products)
 
     # questions
@@ -262,27 +971,337 @@ def create_example_data(conn):
 
     conn.commit()
 
-def tfidf_search_all(user_input, question_texts, tfidf_matrix, threshold=0.2):
+def search_questions(user_input, threshold=0.2, k=None, g_item_nos=None):
+    """
+    Returns a list of (question_id, g_item_no, similarity) for the k best
+    questions (all of them if k is None) whose TF-IDF similarity > threshold,
+    best first. Nothing is read from the database.
+    If g_item_nos is given, only questions about those products are scored.
+    """
+    if index is None:
+        return []
+    return index.search(user_input, k=k, threshold=threshold, g_item_nos=g_item_nos, ids=True)
+
+def tfidf_search_all(conn, user_input, threshold=0.2, k=None, g_item_nos=None):
     """
     Returns a list of (question_id, question_text, g_item_no, similarity)
-    for all questions whose TF-IDF similarity > threshold.
+    for the k best questions (all of them if k is None) whose TF-IDF
+    similarity > threshold, best first.
+    If g_item_nos is given, only questions about those products are scored.
+    """
+    matches = search_questions(user_input, threshold, k, g_item_nos)
+    if not matches:
+        return []
+
+    # question texts stay in the database; only the matches are looked up
+    qids = [qid for qid, _, _ in matches]
+    placeholders = ",".join("?" * len(qids))
+    texts = dict(conn.execute(
+        f"SELECT question_id, question_text FROM Question WHERE question_id IN ({placeholders})",
+        qids
+    ).fetchall())
+    return [(qid, texts.get(qid), gid, score) for qid, gid, score in matches]
+
+def search_questions_batch(queries, threshold=0.2, k=None, g_item_nos=None):
     """
-    user_vec = vectorizer.transform([user_input])
-    sims = cosine_similarity(user_vec, tfidf_matrix)[0]
+    search_questions for a list of queries: one list of
+    (question_id, g_item_no, similarity) per query, in query order. The
+    queries are vectorized and scored together (see TfidfIndex.search_batch).
+    """
+    if index is None:
+        return [[] for _ in queries]
+    return index.search_batch(queries, k=k, threshold=threshold, g_item_nos=g_item_nos, ids=True)
 
-    matches = [(i, score) for i, score in enumerate(sims) if score > threshold]
-    matches.sort(key=lambda x: x[1], reverse=True)
+def tfidf_search_batch(conn, queries, threshold=0.2, k=None, g_item_nos=None):
+    """
+    tfidf_search_all for a list of queries: one list of
+    (question_id, question_text, g_item_no, similarity) per query, in query
+    order, with the question texts for every query read in one pass.
+    """
+    batches = search_questions_batch(queries, threshold, k, g_item_nos)
+    qids = sorted({qid for matches in batches for qid, _, _ in matches})
+    texts = {}
+    for i in range(0, len(qids), 500):
+        chunk = qids[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        texts.update(conn.execute(
+            f"SELECT question_id, question_text FROM Question WHERE question_id IN ({placeholders})",
+            chunk
+        ))
+    return [[(qid, texts.get(qid), gid, score) for qid, gid, score in matches] for matches in batches]
+
+FTS_WORD_RE = re.compile(r"(?u)\b\w\w+\b")  # the vectorizer's token pattern
+
+def fts_words(user_input, vectorizer, n_docs, max_rows=0):
+    """
+    Query words selective enough to look up in the FTS5 tables. Words like
+    "how" or "the" match nearly every row, and BM25 has to score every match
+    before it can cut to the best few, so they are left to the re-ranking.
+    A word counts as selective in up to FTS_MAX_DF of the questions or
+    max_rows questions, whichever is more.
+    """
+    words = list(dict.fromkeys(FTS_WORD_RE.findall(user_input.lower())))
+    vocabulary, idf = vectorizer.vocabulary_, vectorizer.idf_
+    # smoothed idf = ln((1 + n) / (1 + df)) + 1, solved for df
+    df = {w: (1 + n_docs) / math.exp(idf[vocabulary[w]] - 1) - 1 if w in vocabulary else 0.0 for w in words}
+    selective = [w for w in words if df[w] <= max(FTS_MAX_DF * n_docs, max_rows)]
+    return selective or sorted(words, key=df.get)[:FTS_MIN_WORDS]
+
+def fts_candidates(conn, words, g_item_nos=None, limit=FTS_CANDIDATES):
+    """
+    BM25 candidates from the FTS5 tables: {question_id: (g_item_no, [texts])}
+    for the best `limit` questions matching any of the words plus the
+    questions of the best `limit` matching answers, where texts are the
+    question text followed by any matching answer texts.
+    """
+    if not words:
+        return {}
+    params = [" OR ".join(f'"{word}"' for word in words)]
+    scope = ""
+    if g_item_nos is not None:
+        # one JSON parameter instead of a placeholder per product
+        scope = "AND q.g_item_no IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(g) for g in g_item_nos]))
+    params.append(limit)
+
+    candidates = {}
+    for qid, gid, qtext in conn.execute(f'''
+      SELECT q.question_id, q.g_item_no, q.question_text
+      FROM QuestionText t
+      JOIN Question q ON q.question_id = t.rowid
+      WHERE QuestionText MATCH ? {scope}
+      ORDER BY t.rank LIMIT ?
+    ''', params):
+        candidates[qid] = (gid, [qtext])
+    for qid, gid, qtext, atext in conn.execute(f'''
+      SELECT q.question_id, q.g_item_no, q.question_text, a.answer_text
+      FROM AnswerText t
+      JOIN Answer a   ON a.answer_id = t.rowid
+      JOIN Question q ON q.question_id = a.question_id
+      WHERE AnswerText MATCH ? {scope}
+      ORDER BY t.rank LIMIT ?
+    ''', params):
+        candidates.setdefault(qid, (gid, [qtext]))[1].append(atext)
+    return candidates
+
+def fts_search(conn, user_input, threshold=0.2, k=None, g_item_nos=None, limit=FTS_CANDIDATES):
+    """
+    Two-stage search: BM25 candidates from FTS5 for the query's selective
+    words (see fts_words / fts_candidates), then TF-IDF re-ranking of only
+    those texts against the whole query. A question scores the best cosine
+    similarity of its own text or any matching answer. Returns
+    (question_id, g_item_no, similarity) like search_questions; only the
+    vectorizer of the index is used, so it can be loaded weights-only.
+
+    When the selective words match fewer than FTS_MIN_CANDIDATES questions
+    (typical of a small corpus, where the rare words are in one or two
+    questions and the best TF-IDF matches share only the commoner words),
+    the lookup is repeated with every word in up to FTS_WIDEN_ROWS
+    questions. That keeps the top results close to the TF-IDF tier's at the
+    cost of a larger BM25 scan; see python bench.py fts-search.
+    """
+    vectorizer = index.vectorizer if index is not None else None
+    if vectorizer is None:
+        return []
+    words = fts_words(user_input, vectorizer, index.fitted_docs)
+    candidates = fts_candidates(conn, words, g_item_nos, limit)
+    if len(candidates) < FTS_MIN_CANDIDATES:
+        wider = fts_words(user_input, vectorizer, index.fitted_docs, FTS_WIDEN_ROWS)
+        if wider != words:
+            candidates = fts_candidates(conn, wider, g_item_nos, limit)
+    if not candidates:
+        return []
+    owners, texts = [], [user_input]
+    for qid, (_, candidate_texts) in candidates.items():
+        for text in candidate_texts:
+            owners.append(qid)
+            texts.append(text or "")
+    # query and candidates in one transform, so a refit swapping the vectorizer can't mix vocabularies
+    vectors = vectorizer.transform(texts)
+    scores = (vectors[1:] @ vectors[0].T).toarray().ravel()
+    best = {}
+    for qid, score in zip(owners, scores.tolist()):
+        if score > best.get(qid, 0.0):
+            best[qid] = score
+    matches = sorted(((qid, candidates[qid][0], score) for qid, score in best.items() if score > threshold),
+                     key=lambda m: (-m[2], m[0]))
+    return matches if k is None else matches[:k]
+
+def hydrate_results(conn, matches):
+    """
+    Turns (question_id, g_item_no, similarity) matches into display records
+    with one query for all of them:
+      {"question_id", "question_text", "g_item_no", "product_name", "score",
+       "primary": answer text or None, "primary_rank": its rank score,
+       "extras": [[answer_id, text, upvotes, rank score], ...]}
+    Extras come back ordered by rank score DESC, answer_id ASC, so flagged
+    answers sink (see ranking.py). Order of the matches is kept.
+    """
+    if not matches:
+        return []
+    hits = {
+        qid: {"question_id": qid, "question_text": None, "g_item_no": gid,
+              "product_name": None, "score": score, "primary": None, "primary_rank": None, "extras": []}
+        for qid, gid, score in matches
+    }
+    placeholders = ",".join("?" * len(hits))
+    cursor = conn.execute(f'''
+      SELECT q.question_id, q.question_text, p.product_name,
+             a.answer_id, a.answer_text, a.is_primary, a.upvotes, a.rank_score
+      FROM Question q
+      LEFT JOIN Product p ON p.g_item_no = q.g_item_no
+      LEFT JOIN Answer  a ON a.question_id = q.question_id
+      WHERE q.question_id IN ({placeholders})
+      ORDER BY q.question_id, a.is_primary DESC, a.rank_score DESC, a.answer_id ASC
+    ''', list(hits))
+    for qid, qtext, pname, aid, atext, is_primary, upvotes, rank in cursor:
+        hit = hits[qid]
+        hit["question_text"] = qtext
+        hit["product_name"] = pname
+        if aid is None:
+            continue
+        if is_primary:
+            if hit["primary"] is None:
+                hit["primary"] = atext
+                hit["primary_rank"] = rank
+        else:
+            hit["extras"].append([aid, atext, upvotes, rank])
+    if feedback is not None and len(feedback):
+        # feedback still in the buffer counts too
+        for hit in hits.values():
+            for extra in hit["extras"]:
+                if feedback.pending(extra[0]) != (0, 0):
+                    extra[2], extra[3] = feedback.counts(extra[0])[0], feedback.rank(extra[0])
+            hit["extras"].sort(key=_extra_order)
+    return [hits[qid] for qid, _, _ in matches]
+
+def cached_search(conn, user_input, threshold=0.2, k=3, g_item_nos=None, category=None):
+    """
+    search_questions + hydrate_results through the query cache: hydrated
+    hits for one query, searched within category (whose products are
+    g_item_nos). Returned records are copies, safe to change with record_upvote.
+    """
+    return cached_search_batch(conn, [user_input], threshold, k, g_item_nos, category)[0]
+
+def cached_search_batch(conn, queries, threshold=0.2, k=3, g_item_nos=None, category=None):
+    """
+    cached_search for a list of queries. Queries missing from the cache are
+    scored together (see search_questions_batch) and the answers of every
+    uncached hit are read in one query.
+    """
+    if query_cache is None:
+        if search_tier == "fts":
+            batches = [fts_search(conn, q, threshold, k, g_item_nos) for q in queries]
+        else:
+            batches = search_questions_batch(queries, threshold, k, g_item_nos)
+        return [hydrate_results(conn, matches) for matches in batches]
+
+    if category is not None:
+        scope = category
+    else:
+        scope = None if g_item_nos is None else tuple(sorted(g_item_nos))
+    keys = [(_normalize_question(q), scope, k, threshold) for q in queries]
+    batches = [query_cache.get_hits(key) for key in keys]
+    missing = {}  # key -> positions of the uncached queries with that key
+    for i, key in enumerate(keys):
+        if batches[i] is None:
+            missing.setdefault(key, []).append(i)
+    if missing:
+        texts = [queries[positions[0]] for positions in missing.values()]
+        if search_tier == "fts":
+            found = [fts_search(conn, text, threshold, k, g_item_nos) for text in texts]
+        elif len(texts) == 1:
+            found = [search_questions(texts[0], threshold, k, g_item_nos)]
+        else:
+            found = search_questions_batch(texts, threshold, k, g_item_nos)
+        for (key, positions), matches in zip(missing.items(), found):
+            query_cache.put_hits(key, key[0], g_item_nos, matches)
+            for i in positions:
+                batches[i] = matches
+
+    records = {}
+    unread = []
+    for matches in batches:
+        for qid, gid, _ in matches:
+            if qid not in records:
+                records[qid] = query_cache.get_answers(qid)
+                if records[qid] is None:
+                    unread.append((qid, gid, 0.0))
+    for hit in hydrate_results(conn, unread):
+        del hit["score"]
+        records[hit["question_id"]] = hit
+        query_cache.put_answers(hit["question_id"], hit)
+    now = time.time()
+    return [
+        rank_hits([dict(records[qid], score=score, extras=[list(extra) for extra in records[qid]["extras"]])
+                   for qid, _, score in matches], now)
+        for matches in batches
+    ]
+
+def _extra_order(extra):
+    return (-(extra[3] if extra[3] is not None else -math.inf), extra[0])
 
-    results = []
-    for idx, score in matches:
-        qid, qtext, gid = rows[idx]
-        results.append((qid, qtext, gid, score))
-    return results
+def rank_hits(hits, now=None):
+    """
+    Re-orders hydrated hits by similarity blended with the rank of each
+    question's best answer (ranking.blend), stored as "rank" on each hit.
+    Constant work per hit: the answer ranks were computed when feedback came in.
+    """
+    for hit in hits:
+        ranks = [r for r in [hit["primary_rank"]] + [extra[3] for extra in hit["extras"]] if r is not None]
+        hit["rank"] = ranking.blend(hit["score"], max(ranks) if ranks else None, now)
+    hits.sort(key=lambda hit: -hit["rank"])
+    return hits
+
+def print_search_results(hits):
+    """Prints hydrated search results (see hydrate_results)."""
+    for hit in hits:
+        print(f"\nProduct: {hit['product_name'] or hit['g_item_no']}")
+        print(f"Question: {hit['question_text']}")
+        if hit["primary"]:
+            print(f"Answer: {hit['primary']}")
+        if hit["extras"]:
+            print("Additional Info:")
+            for aid, txt, uv, _ in hit["extras"]:
+                print(f" • [{aid}] {txt}  (upvotes: {uv})")
+        print(f"Similarity: {hit['score']*100:.1f}%")
+        print("-"*40)
+
+def record_upvote(hits, answer_id, upvotes, rank):
+    """
+    Applies an answer's new upvote count and rank score (after an upvote or
+    a flag) to the displayed results and re-sorts that question's extras, so
+    the page can be redrawn without querying again.
+    """
+    for hit in hits:
+        for extra in hit["extras"]:
+            if extra[0] == answer_id:
+                extra[2], extra[3] = upvotes, rank
+                hit["extras"].sort(key=_extra_order)
+                return
+
+def load_categories(conn):
+    """
+    Returns {category name: [g_item_no, ...]} from the Category table.
+    Categories without products are included with an empty list.
+    """
+    categories = {}
+    cursor = conn.execute('''
+      SELECT c.name, p.g_item_no
+      FROM Category c
+      LEFT JOIN Product p ON p.category_id = c.category_id
+      ORDER BY c.category_id, p.g_item_no
+    ''')
+    for name, g_item_no in cursor:
+        items = categories.setdefault(name, [])
+        if g_item_no is not None:
+            items.append(g_item_no)
+    return categories
 
 def print_all_qas(conn):
     """
     Prints all Q&As in columns: Question ID | Product ID | Question | Answer
-    with primary answers first, then extras (upvotes DESC, answer_id ASC).
+    with primary answers first, then extras (rank score DESC, answer_id ASC).
     """
     cursor = conn.cursor()
     cursor.execute('''
@@ -296,7 +1315,7 @@ def print_all_qas(conn):
       ORDER BY
         q.question_id,
         a.is_primary  DESC,
-        a.upvotes     DESC,
+        a.rank_score  DESC,
         a.answer_id   ASC
     ''')
     rows = cursor.fetchall()
@@ -312,26 +1331,71 @@ def print_all_qas(conn):
         print(f"{qid:<5} {pid:<5} {qtext:<50} {atext:<50}")
     print()
 
-def main():
-    global vectorizer, tfidf_matrix, rows
+def _feedback_log(conn):
+    """The engine's feedback log, or one that writes straight through for any other connection"""
+    if feedback is not None and feedback.conn is conn:
+        return feedback
+    return FeedbackLog(conn, max_events=1)
 
-    conn = sqlite3.connect(":memory:")
-    create_example_data(conn)
-    cursor = conn.cursor()
+def upvote_answer(conn, answer_id, rep_id=None):
+    """
+    Logs an upvote on a non-primary answer and returns its new count, or None
+    if there is no such answer (or it is the primary one). The vote is
+    written with the next feedback flush; the count already includes it.
+    """
+    log = _feedback_log(conn)
+    upvotes = log.upvote(answer_id, rep_id)
+    if upvotes is not None:
+        _feedback_changed(log, answer_id)
+    return upvotes
 
-    # Define product categories and associated product IDs
-    categories = {
-        "adhesives": set(range(1000, 1006)),
-        "safety":    set(range(2000, 2006)),
-        "light":     set(range(3000, 3006)),
-    }
+def flag_answer(conn, answer_id, reason="", rep_id=None):
+    """
+    Logs a flag on an answer with the rep's reason and returns its new flag
+    count, or None if there is no such answer. The answer's rank drops
+    right away (see ranking.py).
+    """
+    log = _feedback_log(conn)
+    flags = log.flag(answer_id, reason, rep_id)
+    if flags is not None:
+        _feedback_changed(log, answer_id)
+    return flags
 
-    # Build the TF‑IDF model
-    cursor.execute("SELECT question_id, question_text, g_item_no FROM Question")
-    rows = cursor.fetchall()
-    question_texts = [r[1] for r in rows]
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(question_texts)
+def _feedback_changed(log, answer_id):
+    if query_cache is not None:
+        query_cache.answer_changed(log.answer(answer_id)[0], answer_id, log.counts(answer_id)[0], log.rank(answer_id))
+
+def answer_feedback(answer_id):
+    """(upvotes, rank score) of an answer including buffered feedback, for record_upvote"""
+    return feedback.counts(answer_id)[0], feedback.rank(answer_id)
+
+def load_engine(db_path=DB_PATH, index_dir=INDEX_DIR, tier=None):
+    """
+    Opens the database and its TF-IDF index (made the module's `index`) and
+    returns the connection, with an empty query cache (`query_cache`) in
+    front of them and a feedback log (`feedback`) for upvotes and flags;
+    call close_engine when done so buffered feedback is written. Only questions added since the index was saved get
+    vectorized. tier (default SEARCH_TIER) picks how cached_search finds
+    questions; the "fts" tier loads the index weights-only.
+    """
+    global index, query_cache, search_tier, feedback
+
+    search_tier = tier or SEARCH_TIER
+    conn = open_database(db_path)
+    index = open_index(conn, db_path, index_dir if db_path != ":memory:" else None,
+                       weights_only=search_tier == "fts")
+    query_cache = QueryCache(index)
+    feedback = FeedbackLog(conn)
+    return conn
+
+def close_engine(conn):
+    """Writes any buffered feedback and closes the connection from load_engine."""
+    if feedback is not None and feedback.conn is conn:
+        feedback.close()
+    conn.close()
+
+def main():
+    conn = load_engine(DB_PATH)
 
     while True:
         print()
@@ -348,7 +1412,8 @@ def main():
 
         elif cmd == 'q':
             # Ask for product category first
-            print("\nAvailable categories: adhesives, safety, light")
+            categories = load_categories(conn)
+            print("\nAvailable categories: " + ", ".join(categories))
             cat = input("Enter a product category (or 'exit' to return): ").strip().lower()
             if cat == 'exit':
                 print()
@@ -366,63 +1431,29 @@ def main():
                     print()
                     break
 
-                results = [
-                    r for r in tfidf_search_all(user_query, question_texts, tfidf_matrix)
-                    if r[2] in allowed_ids
-                ]
+                # the category is applied before scoring, so only its questions are read;
+                # repeated questions come straight from the query cache
+                hits = cached_search(conn, user_query, k=3, g_item_nos=allowed_ids, category=cat)
 
-                if not results:
+                if not hits:
                     print("No matching questions found for that category.")
                     continue
 
                 while True:
-                    for qid, qtext, gid, score in results[:3]:
-                        cursor.execute("SELECT product_name FROM Product WHERE g_item_no = ?", (gid,))
-                        pname = cursor.fetchone()[0]
-                        print(f"\nProduct: {pname}")
-                        print(f"Question: {qtext}")
-
-                        cursor.execute(
-                            "SELECT answer_text FROM Answer WHERE question_id = ? AND is_primary = 1",
-                            (qid,)
-                        )
-                        primary = cursor.fetchone()
-                        if primary:
-                            print(f"Answer: {primary[0]}")
-
-                        cursor.execute(
-                            """SELECT answer_id, answer_text, upvotes
-                               FROM Answer
-                               WHERE question_id = ? AND is_primary = 0
-                               ORDER BY upvotes DESC, answer_id ASC""",
-                            (qid,)
-                        )
-                        extras = cursor.fetchall()
-                        if extras:
-                            print("Additional Info:")
-                            for aid, txt, uv in extras:
-                                print(f" • [{aid}] {txt}  (upvotes: {uv})")
-
-                        print(f"Similarity: {score*100:.1f}%")
-                        print("-"*40)
+                    print_search_results(hits)
 
                     action = input("Enter 'u <answer_id>' to upvote, 'f <answer_id>' to flag, or press Enter for new query: ").strip().lower()
                     if action == '':
+                        feedback.maybe_flush()
                         print()
                         break
 
                     if action.startswith('u '):
                         try:
                             aid = int(action.split()[1])
-                            cursor.execute(
-                                "UPDATE Answer SET upvotes = upvotes + 1 WHERE answer_id = ? AND is_primary = 0",
-                                (aid,)
-                            )
-                            if cursor.rowcount:
-                                conn.commit()
-                                new_score = cursor.execute(
-                                    "SELECT upvotes FROM Answer WHERE answer_id = ?", (aid,)
-                                ).fetchone()[0]
+                            new_score = upvote_answer(conn, aid)
+                            if new_score is not None:
+                                record_upvote(hits, aid, *answer_feedback(aid))
                                 print(f"Answer {aid} upvoted! New score: {new_score}")
                             else:
                                 print(f"Cannot upvote {aid}: not found or primary answer.")
@@ -432,7 +1463,11 @@ def main():
                         try:
                             aid = int(action.split()[1])
                             reason = input("Enter flag reason: ").strip()
-                            print(f"Answer {aid} flagged for review. Reason: {reason}")
+                            if flag_answer(conn, aid, reason) is not None:
+                                record_upvote(hits, aid, *answer_feedback(aid))
+                                print(f"Answer {aid} flagged for review. Reason: {reason}")
+                            else:
+                                print(f"Cannot flag {aid}: answer not found.")
                         except ValueError:
                             print("Invalid answer ID.")
                     else:
@@ -453,6 +1488,8 @@ def main():
                 confirm = input("Are you happy with these entries? (y/n): ").strip().lower()
                 if confirm == 'y':
                     insert_question_records(conn, records)
+                    added = index.sync(conn, DB_PATH)
+                    print(f"TF-IDF index updated with {added} new question(s).\n")
 
                 else:
                     print("Record insertion canceled.")
@@ -461,26 +1498,26 @@ def main():
             except json.JSONDecodeError:
                 print("There was an error parsing the JSON file. Please ensure the file is in proper JSON format.")
 
-                vectorizer = TfidfVectorizer()
-                tfidf_matrix = vectorizer.fit_transform(question_texts)
-                print("TF-IDF model updated with new question.\n")
-                continue
-
         elif cmd == 'p':
+            feedback.flush()
             print_all_qas(conn)
             print()
 
         else:
             print("Unknown command. Please enter Q, P, or E.")
 
-    conn.close()
+    close_engine(conn)
 
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["ingest"]:
+        ingest_main(sys.argv[2:])
+    elif sys.argv[1:2] == ["recluster"]:
+        recluster_main(sys.argv[2:])
+    else:
+        main()
 
 
-# if flagged as unhelpful move to the bottom
 # add a note for next rep
 
 
@@ -8,9 +8,15 @@ to quickly look up products, alternatives, and frequently bought together items.
 
 import sys
 import os
+import io
 import time
 import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+import alternatives
+import product_index
+import relations
+from catalog import ProductStore, open_catalog
 
 
 # ANSI color codes for terminal styling
@@ -222,7 +228,29 @@ PRODUCT_DB = {
 
 
 
-# Sample search index for quick lookup
+# Where the prebuilt product search index is kept between runs
+PRODUCT_INDEX_PATH = os.environ.get("GRAINGER_PRODUCT_INDEX", "product_index.bin")
+
+# Search results listed per product lookup
+RESULTS_SHOWN = 3
+
+# Catalog file written by `python catalog.py <path>`; mapped read-only when present
+CATALOG_PATH = os.environ.get("GRAINGER_CATALOG", "catalog.bin")
+
+# Saved relationship graph for the catalog file
+RELATIONS_PATH = os.environ.get("GRAINGER_RELATIONS", "catalog_relations")
+
+# Demo-only pauses (fake search/loading delays); off unless GRAINGER_SIMULATED_DELAYS=1
+SIMULATED_DELAYS = os.environ.get("GRAINGER_SIMULATED_DELAYS", "0") == "1"
+
+# Per-command latency readout; set GRAINGER_SHOW_TIMINGS=0 to hide it
+SHOW_TIMINGS = os.environ.get("GRAINGER_SHOW_TIMINGS", "1") != "0"
+
+CLEAR_SCREEN = "\033[2J\033[H"
+
+
+# Curated extra keywords; the product index is built from each product's
+# SKU, name, category and description, and these are added on top
 SEARCH_INDEX = {
     "full face respirator": ["HWN5400", "PASPECML", "SCT2000"],
     "gloves": ["GLOVE100", "GLOVE200", "GLOVELAT", "NITRISTRONG"],
@@ -244,64 +272,117 @@ SEARCH_INDEX = {
 class GraingerWidget:
     """Grainger Menu Toolbar for Customer Service Representatives"""
    
-    def __init__(self):
-        self.products = PRODUCT_DB
+    def __init__(self, index_path=PRODUCT_INDEX_PATH, catalog_path=CATALOG_PATH, relations_path=RELATIONS_PATH,
+                 simulated_delays=SIMULATED_DELAYS, show_timings=SHOW_TIMINGS):
+        # the mapped catalog file if there is one, else a columnar copy of PRODUCT_DB;
+        # either way indexing it by SKU still reads like a product dict
+        self.products = open_catalog(catalog_path, PRODUCT_DB)
         self.search_index = SEARCH_INDEX
+        self.index_path = index_path
+        # loaded (or built once) here so each lookup is a hash/posting lookup, not a scan
+        self.index = product_index.load_or_build(index_path, self.products, self.search_index)
+        self.relations_path = relations_path
+        self._relations = None
+        self.simulated_delays = simulated_delays
+        self.show_timings = show_timings
         self.current_customer = None
         self.last_results = []
         self.widget_visible = True
+        # everything shown for a screen is held here and written to the terminal
+        # in one go before the next prompt; sys.stdout itself is left alone so
+        # input() keeps readline's line editing and history
+        self.screen = io.StringIO()
    
+    def show(self, *args, **kwargs):
+        """print() into the current screen"""
+        print(*args, file=self.screen, **kwargs)
+
+    def flush_screen(self):
+        """Write the held screen to the terminal in one write"""
+        text = self.screen.getvalue()
+        if text:
+            sys.stdout.write(text)
+            self.screen.seek(0)
+            self.screen.truncate()
+        sys.stdout.flush()
+
+    def prompt(self, text: str) -> str:
+        """Flush the screen, then read a line with input()"""
+        self.flush_screen()
+        return input(text)
+
     def clear_screen(self):
-        """Clear the terminal screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        """Clear the terminal screen with an ANSI escape instead of spawning a shell"""
+        self.screen.write(CLEAR_SCREEN)
+
+    def simulate_delay(self, seconds: float):
+        """Pause only when simulated delays are turned on (demos)"""
+        if self.simulated_delays:
+            self.flush_screen()
+            time.sleep(seconds)
+
+    def display_timing(self, label: str, started: float):
+        """Show how long a command took since started (a time.perf_counter() value)"""
+        if self.show_timings:
+            self.show(f"{Colors.CYAN}({label} took {(time.perf_counter() - started) * 1000:.1f} ms){Colors.ENDC}")
    
     def display_header(self):
         """Display the widget header"""
-        print(f"{Colors.HEADER}{Colors.BOLD}╔════════════════════════════════════════════════════════════╗")
-        print(f"║                GRAINGER REP TOOLBAR                        ║")
-        print(f"╚════════════════════════════════════════════════════════════╝{Colors.ENDC}")
+        self.show(f"{Colors.HEADER}{Colors.BOLD}╔════════════════════════════════════════════════════════════╗")
+        self.show(f"║                GRAINGER REP TOOLBAR                        ║")
+        self.show(f"╚════════════════════════════════════════════════════════════╝{Colors.ENDC}")
        
     def display_menu(self):
         """Display the main menu options"""
-        print(f"\n{Colors.BOLD}QUICK COMMANDS:{Colors.ENDC}")
-        print(f"{Colors.GREEN}[P]{Colors.ENDC} Product lookup")
-        print(f"{Colors.GREEN}[Q]{Colors.ENDC} Quit widget")
-        print(f"{Colors.GREEN}[/]{Colors.ENDC} Toggle widget visibility")
+        self.show(f"\n{Colors.BOLD}QUICK COMMANDS:{Colors.ENDC}")
+        self.show(f"{Colors.GREEN}[P]{Colors.ENDC} Product lookup")
+        self.show(f"{Colors.GREEN}[Q]{Colors.ENDC} Quit widget")
+        self.show(f"{Colors.GREEN}[/]{Colors.ENDC} Toggle widget visibility")
    
-    def search_products(self, query: str) -> List[str]:
-        """Search for products based on query"""
-        query = query.lower()
-        results = []
-       
-        # Direct SKU lookup
-        if query in [p.lower() for p in self.products.keys()]:
-            for sku in self.products:
-                if sku.lower() == query:
-                    return [sku]
-       
-        # Search index lookup
-        for term, skus in self.search_index.items():
-            if query in term or term in query:
-                results.extend(skus)
-       
-        # Remove duplicates while preserving order
-        unique_results = []
-        for sku in results:
-            if sku not in unique_results:
-                unique_results.append(sku)
-       
-        return unique_results
+    @property
+    def relations(self) -> relations.RelationGraph:
+        """
+        FBT/alternative graph, loaded or built the first time a product's
+        relations are shown; alternatives are the most similar in-stock products
+        """
+        if self._relations is None:
+            self._relations = relations.load_or_build(self.relations_path, self.products,
+                                                      derived={"alternatives": alternatives.build_alternatives})
+        return self._relations
+
+    def search_products(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Search for products based on query; only the best limit SKUs are ranked"""
+        return self.index.search(query, limit)
+
+    def update_product(self, sku: str, product: Dict[str, Any]):
+        """
+        Add or change a catalog entry and re-index just that product. Like the
+        catalog edit itself, the change stays in memory until save_index()
+        """
+        if not isinstance(self.products, ProductStore):
+            # the mapped catalog is read-only; edits go to an in-memory copy
+            self.products = ProductStore.from_dict(self.products)
+        old = self.products[sku].to_dict() if sku in self.products else None
+        self.products[sku] = product
+        self.index.update_product(sku, old, product)
+        self._relations = None
+
+    def save_index(self):
+        """Write the product index if it was edited, e.g. once the edited catalog has been saved too"""
+        if self.index.dirty and self.index_path:
+            self.index.save(self.index_path)
    
     def display_product(self, sku: str, is_alternative=False):
         """Display detailed product information"""
+        started = time.perf_counter()
         if sku not in self.products:
-            print(f"{Colors.RED}Product SKU {sku} not found.{Colors.ENDC}")
+            self.show(f"{Colors.RED}Product SKU {sku} not found.{Colors.ENDC}")
             return
         
         product = self.products[sku]
-        print(f"\n{Colors.BOLD}{Colors.BLUE}══════ PRODUCT DETAILS ══════{Colors.ENDC}")
-        print(f"{Colors.BOLD}Product:{Colors.ENDC} {product['name']} ({sku})")
-        print(f"{Colors.BOLD}Price:{Colors.ENDC} {product['price']} | {Colors.BOLD}Score:{Colors.ENDC} {product['rating']}/5.0")
+        self.show(f"\n{Colors.BOLD}{Colors.BLUE}══════ PRODUCT DETAILS ══════{Colors.ENDC}")
+        self.show(f"{Colors.BOLD}Product:{Colors.ENDC} {product['name']} ({sku})")
+        self.show(f"{Colors.BOLD}Price:{Colors.ENDC} {product['price']} | {Colors.BOLD}Score:{Colors.ENDC} {product['rating']}/5.0")
         
         if product['stock'] > 100:
             stock_color = Colors.GREEN
@@ -310,16 +391,17 @@ class GraingerWidget:
         else:
             stock_color = Colors.RED
         
-        print(f"{Colors.BOLD}Stock:{Colors.ENDC} {stock_color}{product['stock']} units{Colors.ENDC}")
-        print(f"{Colors.BOLD}Description:{Colors.ENDC} {product['description']}")
+        self.show(f"{Colors.BOLD}Stock:{Colors.ENDC} {stock_color}{product['stock']} units{Colors.ENDC}")
+        self.show(f"{Colors.BOLD}Description:{Colors.ENDC} {product['description']}")
 
-        print(f"\n{Colors.BOLD}OTHER OPTIONS:{Colors.ENDC}")
-        print(f"{Colors.GREEN}[F]{Colors.ENDC} Frequently Bought Together")
+        self.show(f"\n{Colors.BOLD}OTHER OPTIONS:{Colors.ENDC}")
+        self.show(f"{Colors.GREEN}[F]{Colors.ENDC} Frequently Bought Together")
         # Only show Alternatives option if this isn't being viewed as an alternative itself
         if not is_alternative:
-            print(f"{Colors.GREEN}[A]{Colors.ENDC} Alternatives")
-        print(f"{Colors.GREEN}[B]{Colors.ENDC} Back to search results")
-        print(f"{Colors.GREEN}[M]{Colors.ENDC} Main menu")
+            self.show(f"{Colors.GREEN}[A]{Colors.ENDC} Alternatives")
+        self.show(f"{Colors.GREEN}[B]{Colors.ENDC} Back to search results")
+        self.show(f"{Colors.GREEN}[M]{Colors.ENDC} Main menu")
+        self.display_timing("product lookup", started)
         
         # Return the product SKU for use in handle_product_options
         return sku
@@ -327,16 +409,16 @@ class GraingerWidget:
     def handle_product_options(self, sku: str, is_alternative=False):
         """Handle options after displaying a product"""
         while True:
-            command = input(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
+            command = self.prompt(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
             
             if command == 'f':
                 self.display_frequently_bought_together(sku)
-                input(f"\n{Colors.CYAN}Press Enter to return to product options...{Colors.ENDC}")
+                self.prompt(f"\n{Colors.CYAN}Press Enter to return to product options...{Colors.ENDC}")
                 # Re-display the product after showing frequently bought together items
                 self.display_product(sku, is_alternative)
             elif command == 'a' and not is_alternative:
                 self.display_alternatives(sku)
-                input(f"\n{Colors.CYAN}Press Enter to return to product options...{Colors.ENDC}")
+                self.prompt(f"\n{Colors.CYAN}Press Enter to return to product options...{Colors.ENDC}")
                 # Re-display the product after showing alternatives
                 self.display_product(sku, is_alternative)
             elif command == 'b':
@@ -346,148 +428,148 @@ class GraingerWidget:
                 # Return to main menu
                 return 'menu'
             else:
-                print(f"{Colors.YELLOW}Invalid command. Please try again.{Colors.ENDC}")
+                self.show(f"{Colors.YELLOW}Invalid command. Please try again.{Colors.ENDC}")
     
     def display_frequently_bought_together(self, sku: str):
         """Display frequently bought together items"""
+        started = time.perf_counter()
         if sku not in self.products:
-            print(f"{Colors.RED}Product SKU {sku} not found.{Colors.ENDC}")
+            self.show(f"{Colors.RED}Product SKU {sku} not found.{Colors.ENDC}")
             return
        
         product = self.products[sku]
-        fbt_skus = product.get('frequently_bought_together', [])
+        fbt_skus = self.relations.neighbors(sku, 'frequently_bought_together')
        
-        print(f"\n{Colors.BOLD}{Colors.BLUE}══════ FREQUENTLY BOUGHT TOGETHER WITH {sku} ══════{Colors.ENDC}")
-        print(f"{Colors.BOLD}Product:{Colors.ENDC} {product['name']}")
+        self.show(f"\n{Colors.BOLD}{Colors.BLUE}══════ FREQUENTLY BOUGHT TOGETHER WITH {sku} ══════{Colors.ENDC}")
+        self.show(f"{Colors.BOLD}Product:{Colors.ENDC} {product['name']}")
        
         if not fbt_skus:
-            print(f"{Colors.YELLOW}No frequently bought together items found for this product.{Colors.ENDC}")
+            self.show(f"{Colors.YELLOW}No frequently bought together items found for this product.{Colors.ENDC}")
             return
        
+        # the graph only holds SKUs that are in the catalog
         for i, fbt_sku in enumerate(fbt_skus, 1):
-            if fbt_sku in self.products:
-                fbt_product = self.products[fbt_sku]
-                print(f"\n{i}. {Colors.BOLD}{fbt_product['name']}{Colors.ENDC} ({fbt_sku})")
-                print(f"   Price: {fbt_product['price']} | Stock: {fbt_product['stock']} units")
-               
-               
-            else:
-                print(f"{i}. {Colors.YELLOW}SKU: {fbt_sku} (Product data not available){Colors.ENDC}")
+            fbt_product = self.products[fbt_sku]
+            self.show(f"\n{i}. {Colors.BOLD}{fbt_product['name']}{Colors.ENDC} ({fbt_sku})")
+            self.show(f"   Price: {fbt_product['price']} | Stock: {fbt_product['stock']} units")
        
         # Quick copy suggestion for email
         primary_name = product['name']
-        if fbt_skus and fbt_skus[0] in self.products:
+        if fbt_skus:
             suggestion = f"Based on your interest in {primary_name}, many customers also purchase {self.products[fbt_skus[0]]['name']} for optimal performance."
-            print(f"\n{Colors.CYAN}Suggested text for customer email:{Colors.ENDC}")
-            print(f"\"{suggestion}\"")
+            self.show(f"\n{Colors.CYAN}Suggested text for customer email:{Colors.ENDC}")
+            self.show(f"\"{suggestion}\"")
            
         # Add an option to view one of the frequently bought together products
-        print(f"\n{Colors.BOLD}COMMANDS:{Colors.ENDC}")
-        print(f"{Colors.GREEN}[number]{Colors.ENDC} View product details")
-        print(f"{Colors.GREEN}[B]{Colors.ENDC} Back to original product")
+        self.show(f"\n{Colors.BOLD}COMMANDS:{Colors.ENDC}")
+        self.show(f"{Colors.GREEN}[number]{Colors.ENDC} View product details")
+        self.show(f"{Colors.GREEN}[B]{Colors.ENDC} Back to original product")
+        self.display_timing("lookup", started)
        
-        command = input(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
+        command = self.prompt(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
        
         if command.isdigit() and 1 <= int(command) <= len(fbt_skus):
             selected_sku = fbt_skus[int(command) - 1]
-            if selected_sku in self.products:
-                # Display the selected product and handle its options
-                selected_product_sku = self.display_product(selected_sku)
-                self.handle_product_options(selected_product_sku)
+            # Display the selected product and handle its options
+            selected_product_sku = self.display_product(selected_sku)
+            self.handle_product_options(selected_product_sku)
         # For 'b' or any other command, function returns to caller
    
     def display_alternatives(self, sku: str):
         """Display alternative products"""
+        started = time.perf_counter()
         if sku not in self.products:
-            print(f"{Colors.RED}Product SKU {sku} not found.{Colors.ENDC}")
+            self.show(f"{Colors.RED}Product SKU {sku} not found.{Colors.ENDC}")
             return
        
         product = self.products[sku]
-        alt_skus = product.get('alternatives', [])
+        alt_skus = self.relations.neighbors(sku, 'alternatives')
        
-        print(f"\n{Colors.BOLD}{Colors.BLUE}══════ ALTERNATIVES TO {sku} ══════{Colors.ENDC}")
-        print(f"{Colors.BOLD}Product:{Colors.ENDC} {product['name']}")
-        print(f"Price: {product['price']} | Stock: {product['stock']} units")
+        self.show(f"\n{Colors.BOLD}{Colors.BLUE}══════ ALTERNATIVES TO {sku} ══════{Colors.ENDC}")
+        self.show(f"{Colors.BOLD}Product:{Colors.ENDC} {product['name']}")
+        self.show(f"Price: {product['price']} | Stock: {product['stock']} units")
        
         if not alt_skus:
-            print(f"{Colors.YELLOW}No alternatives found for this product.{Colors.ENDC}")
+            self.show(f"{Colors.YELLOW}No alternatives found for this product.{Colors.ENDC}")
             return
        
-        print(f"\n{Colors.BOLD}Alternative Options:{Colors.ENDC}")
+        self.show(f"\n{Colors.BOLD}Alternative Options:{Colors.ENDC}")
         for i, alt_sku in enumerate(alt_skus, 1):
-            if alt_sku in self.products:
-                alt_product = self.products[alt_sku]
-                print(f"\n{i}. {Colors.BOLD}{alt_product['name']}{Colors.ENDC} ({alt_sku})")
-                print(f"   Price: {alt_product['price']} | Stock: {alt_product['stock']} units")
-               
-                # Highlight key differences (would be more sophisticated in real system)
-                if alt_product['rating'] > product['rating']:
-                    print(f"   {Colors.GREEN}★ Higher customer rating{Colors.ENDC}")
-            else:
-                print(f"{i}. {Colors.YELLOW}SKU: {alt_sku} (Product data not available){Colors.ENDC}")
+            alt_product = self.products[alt_sku]
+            self.show(f"\n{i}. {Colors.BOLD}{alt_product['name']}{Colors.ENDC} ({alt_sku})")
+            self.show(f"   Price: {alt_product['price']} | Stock: {alt_product['stock']} units")
+           
+            # Highlight key differences (would be more sophisticated in real system)
+            if alt_product['rating'] > product['rating']:
+                self.show(f"   {Colors.GREEN}★ Higher customer rating{Colors.ENDC}")
                
         # Quick copy suggestion for email
         primary_alternative = product['name']
-        if alt_skus and alt_skus[0] in self.products:
+        if alt_skus:
             suggestion = f"A great alternative to the {primary_alternative} is the product {self.products[alt_skus[0]]['name']}."
-            print(f"\n{Colors.CYAN}Suggested text for customer email:{Colors.ENDC}")
-            print(f"\"{suggestion}\"")
+            self.show(f"\n{Colors.CYAN}Suggested text for customer email:{Colors.ENDC}")
+            self.show(f"\"{suggestion}\"")
 
         # Add an option to view one of the alternative products
-        print(f"\n{Colors.BOLD}COMMANDS:{Colors.ENDC}")
-        print(f"{Colors.GREEN}[number]{Colors.ENDC} View product details")
-        print(f"{Colors.GREEN}[B]{Colors.ENDC} Back to original product")
+        self.show(f"\n{Colors.BOLD}COMMANDS:{Colors.ENDC}")
+        self.show(f"{Colors.GREEN}[number]{Colors.ENDC} View product details")
+        self.show(f"{Colors.GREEN}[B]{Colors.ENDC} Back to original product")
+        self.display_timing("lookup", started)
        
-        command = input(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
+        command = self.prompt(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
        
         # Inside display_alternatives method, where you display the selected product:
         if command.isdigit() and 1 <= int(command) <= len(alt_skus):
             selected_sku = alt_skus[int(command) - 1]
-            if selected_sku in self.products:
-                # Display the selected product and handle its options
-                # Pass is_alternative=True to indicate this is an alternative product
-                selected_product_sku = self.display_product(selected_sku, is_alternative=True)
-                self.handle_product_options(selected_product_sku, is_alternative=True)
+            # Display the selected product and handle its options
+            # Pass is_alternative=True to indicate this is an alternative product
+            selected_product_sku = self.display_product(selected_sku, is_alternative=True)
+            self.handle_product_options(selected_product_sku, is_alternative=True)
     
    
     def product_lookup(self):
         """Handle product lookup workflow"""
-        query = input(f"\n{Colors.GREEN}Enter product name or ID:{Colors.ENDC} ")
+        query = self.prompt(f"\n{Colors.GREEN}Enter product name or ID:{Colors.ENDC} ")
         if not query.strip():
             return
        
-        print(f"\nSearching for '{query}'...")
-        time.sleep(0.5)  # Simulate search delay
+        self.show(f"\nSearching for '{query}'...")
+        self.simulate_delay(0.5)
        
-        results = self.search_products(query)
+        started = time.perf_counter()
+        # only the results shown are ranked; the rest are just counted
+        results, total = self.index.search_with_total(query, RESULTS_SHOWN)
         self.last_results = results
        
         if not results:
-            print(f"{Colors.YELLOW}No products found matching '{query}'.{Colors.ENDC}")
+            self.show(f"{Colors.YELLOW}No products found matching '{query}'.{Colors.ENDC}")
             return
        
         while True:  # Loop to allow returning to search results
-            print(f"\n{Colors.BOLD}Search Results:{Colors.ENDC}")
-            for i, sku in enumerate(results[:3], 1):  # Show top 5 results
+            self.show(f"\n{Colors.BOLD}Search Results:{Colors.ENDC}")
+            for i, sku in enumerate(results, 1):  # Show top 3 results
                 if sku in self.products:
                     product = self.products[sku]
-                    print(f"{i}. {product['name']} ({sku}) - {product['price']}")
+                    self.show(f"{i}. {product['name']} ({sku}) - {product['price']}")
                 else:
-                    print(f"{i}. Unknown product ({sku})")
+                    self.show(f"{i}. Unknown product ({sku})")
            
-            if len(results) > 3:
-                print(f"...and {len(results) - 5} more results.")
+            if total > len(results):
+                self.show(f"...and {total - len(results)} more results.")
+            if started is not None:
+                self.display_timing("search", started)
+                started = None  # only the first listing is the search itself
            
-            print(f"\n{Colors.BOLD}COMMANDS:{Colors.ENDC}")
-            print(f"{Colors.GREEN}[number]{Colors.ENDC} View product details")
-            print(f"{Colors.GREEN}[M]{Colors.ENDC} Return to main menu")
+            self.show(f"\n{Colors.BOLD}COMMANDS:{Colors.ENDC}")
+            self.show(f"{Colors.GREEN}[number]{Colors.ENDC} View product details")
+            self.show(f"{Colors.GREEN}[M]{Colors.ENDC} Return to main menu")
            
-            choice = input(f"\n{Colors.GREEN}Select product number for details:{Colors.ENDC} ").lower()
+            choice = self.prompt(f"\n{Colors.GREEN}Select product number for details:{Colors.ENDC} ").lower()
            
             if choice == 'm':
                 break  # Return to main menu
                
-            if choice.isdigit() and 1 <= int(choice) <= len(results[:5]):
+            if choice.isdigit() and 1 <= int(choice) <= len(results):
                 selected_sku = results[int(choice) - 1]
                 # Display the product and handle options
                 product_sku = self.display_product(selected_sku)
@@ -497,7 +579,7 @@ class GraingerWidget:
                     break  # Return to main menu
                 # For 'back', the loop continues and shows search results again
             else:
-                print(f"{Colors.YELLOW}Invalid selection. Please try again.{Colors.ENDC}")
+                self.show(f"{Colors.YELLOW}Invalid selection. Please try again.{Colors.ENDC}")
    
    
     def run(self):
@@ -508,16 +590,16 @@ class GraingerWidget:
                 self.display_header()
                 self.display_menu()
            
-            command = input(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
+            command = self.prompt(f"\n{Colors.GREEN}Command:{Colors.ENDC} ").lower()
            
             if command == 'q':
                 break
             elif command == '/':
                 self.widget_visible = not self.widget_visible
                 if self.widget_visible:
-                    print(f"{Colors.GREEN}Widget visible.{Colors.ENDC}")
+                    self.show(f"{Colors.GREEN}Widget visible.{Colors.ENDC}")
                 else:
-                    print(f"{Colors.YELLOW}Widget hidden. Type '/' to show.{Colors.ENDC}")
+                    self.show(f"{Colors.YELLOW}Widget hidden. Type '/' to show.{Colors.ENDC}")
             elif not self.widget_visible:
                 if command == '/':
                     self.widget_visible = True
@@ -525,10 +607,10 @@ class GraingerWidget:
             elif command == 'p':
                 self.product_lookup()
             else:
-                print(f"{Colors.YELLOW}Invalid command. Please try again.{Colors.ENDC}")
+                self.show(f"{Colors.YELLOW}Invalid command. Please try again.{Colors.ENDC}")
            
             if self.widget_visible and command != '/':
-                input(f"\n{Colors.CYAN}Press Enter to continue...{Colors.ENDC}")
+                self.prompt(f"\n{Colors.CYAN}Press Enter to continue...{Colors.ENDC}")
 
 
 
@@ -542,15 +624,18 @@ def main():
     print("This tool helps you quickly find product information while chatting with customers.")
     print(f"\n{Colors.BOLD}Loading widget...{Colors.ENDC}")
    
-    # Simulate loading
-    for i in range(5):
-        sys.stdout.write(".")
-        sys.stdout.flush()
-        time.sleep(0.2)
+    # Simulate loading (demo only; the widget is ready as soon as it is constructed)
+    if widget.simulated_delays:
+        for i in range(5):
+            sys.stdout.write(".")
+            widget.simulate_delay(0.2)
     print("\n")
    
-    # Run the widget
-    widget.run()
+    # Run the widget, one terminal write per screen
+    try:
+        widget.run()
+    finally:
+        widget.flush_screen()
    
     print(f"\n{Colors.HEADER}Thank you for using the Grainger Rep Toolbar!{Colors.ENDC}")
 
@@ -0,0 +1,518 @@
+"""
+Product search index for the Grainger rep toolbar.
+
+Built from the catalog itself: every product's SKU, name, category and
+description (plus any curated keywords) is tokenized into a token -> SKU
+posting index with per-field weights, next to a case-folded SKU map for
+direct lookups.
+
+The index is saved as a flat binary file laid out like catalog.bin: a SKU
+table with an on-disk hash table of case-folded SKUs, a sorted token table
+pointing at each token's postings ((SKU position, weight) arrays) and a
+shared string heap. Loading maps the file and reads only its header, so the
+widget starts in the same time whatever the catalog size, and a search reads
+just the posting lists of its own tokens. Products changed after loading are
+re-indexed in memory on top of the mapped file (their mapped postings are
+skipped), with the catalog fingerprint updated from that product alone.
+"""
+
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# how much a token counts toward a match, by the field it came from
+FIELD_WEIGHTS = {
+    "sku": 4.0,
+    "name": 3.0,
+    "keywords": 2.5,
+    "category": 2.0,
+    "description": 1.0,
+}
+PREFIX_MATCH_WEIGHT = 0.5
+MIN_PREFIX_LENGTH = 3  # shortest token on either side of a prefix match ("m" is not a prefix of "masks")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric tokens of text"""
+    return TOKEN_RE.findall(text.casefold())
+
+
+HASH_MODULUS = 1 << 160
+
+
+def product_hash(sku: str, product: Dict[str, Any]) -> int:
+    """Hash of the fields one product is indexed from"""
+    fields = [sku] + [product.get(f, "") for f in ("name", "category", "description")]
+    return int.from_bytes(hashlib.sha1(json.dumps(fields).encode()).digest(), "big")
+
+
+def catalog_hash(products: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Sum of every product's product_hash: independent of catalog order, and
+    kept current after an edit by subtracting the old product's hash and
+    adding the new one
+    """
+    return sum(product_hash(sku, product) for sku, product in products.items()) % HASH_MODULUS
+
+
+def _fingerprint(products_hash: int, keywords: Optional[Dict[str, List[str]]]) -> str:
+    digest = hashlib.sha1(f"{products_hash:040x}".encode())
+    digest.update(json.dumps(keywords or {}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def catalog_fingerprint(products: Dict[str, Dict[str, Any]],
+                        keywords: Optional[Dict[str, List[str]]] = None) -> Optional[str]:
+    """
+    Stable hash of the fields the index is built from, to tell when a saved
+    index is stale. Only a mapped catalog file has one: it carries a hash of
+    its contents written with it. An in-memory catalog gives None rather than
+    hashing every product at each startup.
+    """
+    content_hash = getattr(products, "content_hash", None)
+    if not content_hash:
+        return None
+    digest = hashlib.sha1(content_hash.encode())
+    digest.update(json.dumps(keywords or {}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+# ---- file format -----------------------------------------------------------
+#   header       MAGIC, counts, the section table below, fingerprint and catalog hash
+#   sku table    per SKU position: (string offset, length)
+#   hash slots   open-addressing table of SKU position + 1 (0 = empty), keyed by crc32 of the case-folded SKU
+#   token table  per token, in sorted order: (string offset, length, postings start, postings length)
+#   positions    postings' SKU positions, uint32
+#   weights      postings' weights, float32
+#   strings      UTF-8 heap
+
+MAGIC = b"GRPIDX02"
+HEADER = struct.Struct("<8sIIII7Q40s20s?")  # magic, skus, tokens, slots, pad, 7 offsets, fingerprint, catalog hash, has hash
+SKU_ENTRY = struct.Struct("<II")
+TOKEN_ENTRY = struct.Struct("<IIII")
+SLOT = struct.Struct("<I")
+
+
+def _sku_hash(key: str) -> int:
+    return zlib.crc32(key.encode("utf-8"))
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class MappedPostings:
+    """
+    Read-only view of a saved index file. Opening it only reads the header;
+    tokens are found by binary search over the sorted token table and
+    postings are read straight from the mapped pages
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.n_skus, self.n_tokens, self.n_slots, _,
+         self._skus, self._slots, self._tokens, self._positions, self._weights, self._heap, self._end,
+         fingerprint, catalog_hash, has_hash) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a product index file")
+        self.fingerprint = fingerprint.decode() or None
+        self.catalog_hash = int.from_bytes(catalog_hash, "big") if has_hash else None
+
+    def close(self):
+        self._map.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._heap + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def sku(self, position: int) -> str:
+        return self._string(*SKU_ENTRY.unpack_from(self._map, self._skus + position * SKU_ENTRY.size))
+
+    def position(self, key: str) -> int:
+        """Position of the SKU whose case-folded form is key, or -1"""
+        mask = self.n_slots - 1
+        i = _sku_hash(key) & mask
+        while True:
+            entry = SLOT.unpack_from(self._map, self._slots + i * SLOT.size)[0]
+            if not entry:
+                return -1
+            if self.sku(entry - 1).casefold() == key:
+                return entry - 1
+            i = (i + 1) & mask
+
+    def token(self, i: int) -> str:
+        offset, length, _, _ = TOKEN_ENTRY.unpack_from(self._map, self._tokens + i * TOKEN_ENTRY.size)
+        return self._string(offset, length)
+
+    def lower_bound(self, token: str) -> int:
+        """Index of the first token >= token"""
+        lo, hi = 0, self.n_tokens
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.token(mid) < token:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, token: str) -> int:
+        """Index of token in the token table, or -1"""
+        i = self.lower_bound(token)
+        return i if i < self.n_tokens and self.token(i) == token else -1
+
+    def posting(self, i: int) -> Tuple[array, array]:
+        """(SKU positions, weights) of the i-th token"""
+        _, _, start, length = TOKEN_ENTRY.unpack_from(self._map, self._tokens + i * TOKEN_ENTRY.size)
+        positions, weights = array("I"), array("f")
+        positions.frombytes(self._map[self._positions + start * 4:self._positions + (start + length) * 4])
+        weights.frombytes(self._map[self._weights + start * 4:self._weights + (start + length) * 4])
+        if sys.byteorder != "little":
+            positions.byteswap()
+            weights.byteswap()
+        return positions, weights
+
+
+class ProductIndex:
+    """SKU hash map plus weighted token/prefix posting index over product fields"""
+
+    def __init__(self, base: Optional[MappedPostings] = None):
+        self.base = base                         # saved index this one was loaded from, if any
+        self.n_base = base.n_skus if base is not None else 0
+        # products indexed in memory (built, added or changed since loading);
+        # postings refer to SKUs by position, and base SKUs keep theirs
+        self.sku_map: Dict[str, str] = {}        # casefolded SKU -> SKU
+        self.postings: Dict[str, Dict[int, float]] = {}  # token -> {SKU position: weight}
+        self.tokens: List[str] = []              # sorted, for prefix lookups
+        self.order: Dict[str, int] = {}          # SKU -> catalog position, for stable ranking
+        self.skus: List[str] = []                # SKUs at positions n_base, n_base + 1, ...
+        self.product_tokens: Dict[str, Dict[str, float]] = {}  # SKU -> {token: weight}
+        self.shadowed: Set[int] = set()          # base positions whose saved postings no longer count
+        self.fingerprint: Optional[str] = base.fingerprint if base is not None else None
+        self.catalog_hash: Optional[int] = base.catalog_hash if base is not None else None  # see catalog_hash()
+        self.keywords: Optional[Dict[str, List[str]]] = None
+        self.dirty = False                       # edited since it was built, loaded or saved
+
+    @classmethod
+    def build(cls, products: Dict[str, Dict[str, Any]], keywords: Optional[Dict[str, List[str]]] = None) -> "ProductIndex":
+        """Index every product in the catalog, plus curated keywords for SKUs that exist"""
+        index = cls()
+        extra = product_keywords(products, keywords)
+        products_hash = 0
+        for sku, product in products.items():
+            index.add_product(sku, product, extra.get(sku, ()))
+            products_hash += product_hash(sku, product)
+        index.catalog_hash = products_hash % HASH_MODULUS
+        index.fingerprint = catalog_fingerprint(products, keywords) or _fingerprint(index.catalog_hash, keywords)
+        index.keywords = keywords
+        return index
+
+    def close(self):
+        if self.base is not None:
+            self.base.close()
+
+    def _sku_at(self, position: int) -> str:
+        return self.base.sku(position) if position < self.n_base else self.skus[position - self.n_base]
+
+    def _base_position(self, sku: str) -> int:
+        if self.base is None:
+            return -1
+        position = self.base.position(sku.casefold())
+        return position if position >= 0 and self.base.sku(position) == sku else -1
+
+    # ---- maintenance ----------------------------------------------------
+
+    def add_product(self, sku: str, product: Dict[str, Any], keywords: Iterable[str] = ()):
+        """Index one product; re-indexes it if it was already present"""
+        if sku in self.product_tokens:
+            self.remove_product(sku)
+        weights: Dict[str, float] = {}
+        fields = {
+            "sku": sku,
+            "name": product.get("name", ""),
+            "category": product.get("category", ""),
+            "description": product.get("description", ""),
+            "keywords": " ".join(keywords),
+        }
+        for field, text in fields.items():
+            for token in set(tokenize(text)):
+                weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+        self._add_tokens(sku, weights)
+
+    def update_product(self, sku: str, old: Optional[Dict[str, Any]], product: Dict[str, Any]):
+        """
+        Re-index one changed (or new, old=None) catalog product and bring the
+        fingerprint up to date in O(1), as build() of the edited in-memory
+        catalog would compute it. The index is only marked dirty;
+        save() writes it when the caller chooses to.
+        """
+        self.add_product(sku, product, product_keywords({sku: product}, self.keywords).get(sku, ()))
+        if self.catalog_hash is not None:
+            products_hash = self.catalog_hash + product_hash(sku, product)
+            if old is not None:
+                products_hash -= product_hash(sku, old)
+            self.catalog_hash = products_hash % HASH_MODULUS
+            self.fingerprint = _fingerprint(self.catalog_hash, self.keywords)
+        else:
+            self.fingerprint = None  # base unknown: never mistaken for a saved catalog's index
+        self.dirty = True
+
+    def _position(self, sku: str) -> int:
+        """Catalog position of a SKU, handing out the next free one to a new SKU"""
+        position = self.order.get(sku)
+        if position is None:
+            position = self._base_position(sku)
+            if position < 0:
+                position = self.n_base + len(self.skus)
+                self.skus.append(sku)
+            self.order[sku] = position
+        return position
+
+    def _add_tokens(self, sku: str, weights: Dict[str, float]):
+        position = self._position(sku)
+        if position < self.n_base:
+            self.shadowed.add(position)
+        self.sku_map[sku.casefold()] = sku
+        self.product_tokens[sku] = weights
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                bisect.insort(self.tokens, token)
+            self.postings[token][position] = weight
+
+    def remove_product(self, sku: str):
+        """Drop a product from the index"""
+        position = self.order.get(sku)
+        if position is None:
+            position = self._base_position(sku)
+            if position < 0:
+                return
+        if position < self.n_base:
+            self.shadowed.add(position)
+        for token in self.product_tokens.pop(sku, {}):
+            posting = self.postings[token]
+            posting.pop(position, None)
+            if not posting:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+        self.sku_map.pop(sku.casefold(), None)
+
+    # ---- lookups --------------------------------------------------------
+
+    def lookup_sku(self, query: str) -> Optional[str]:
+        """Exact, case-insensitive SKU lookup"""
+        key = query.strip().casefold()
+        sku = self.sku_map.get(key)
+        if sku is None and self.base is not None:
+            position = self.base.position(key)
+            if position >= 0 and position not in self.shadowed:
+                sku = self.base.sku(position)
+        return sku
+
+    def _has_token(self, token: str) -> bool:
+        return token in self.postings or (self.base is not None and self.base.find(token) >= 0)
+
+    def _matching_tokens(self, token: str) -> Set[str]:
+        # a whole-word hit is enough; otherwise fall back to indexed tokens that
+        # start with the query token ("glove" -> "gloves") or that the query
+        # token starts with ("drills" -> "drill"), never through a token shorter
+        # than MIN_PREFIX_LENGTH ("masks" must not match the "m" of "M/L")
+        if self._has_token(token):
+            return {token}
+        matches = set()
+        if len(token) < MIN_PREFIX_LENGTH:
+            return matches
+        i = bisect.bisect_left(self.tokens, token)
+        while i < len(self.tokens) and self.tokens[i].startswith(token):
+            matches.add(self.tokens[i])
+            i += 1
+        if self.base is not None:
+            i = self.base.lower_bound(token)
+            while i < self.base.n_tokens and self.base.token(i).startswith(token):
+                matches.add(self.base.token(i))
+                i += 1
+        for end in range(MIN_PREFIX_LENGTH, len(token)):
+            if self._has_token(token[:end]):
+                matches.add(token[:end])
+        return matches
+
+    def _add_scores(self, scores: Dict[int, float], token: str, factor: float):
+        if self.base is not None:
+            i = self.base.find(token)
+            if i >= 0:
+                shadowed = self.shadowed
+                for position, weight in zip(*self.base.posting(i)):
+                    if position not in shadowed:
+                        scores[position] = scores.get(position, 0.0) + weight * factor
+        for position, weight in self.postings.get(token, {}).items():
+            scores[position] = scores.get(position, 0.0) + weight * factor
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        SKUs matching the query, best first: a direct SKU hit on its own,
+        otherwise SKUs by summed field weight of the matched tokens (prefix
+        matches count for less), ties in catalog order
+        """
+        return self.search_with_total(query, limit)[0]
+
+    def search_with_total(self, query: str, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """search() plus how many SKUs matched in all, for a "...and N more" line"""
+        sku = self.lookup_sku(query)
+        if sku is not None:
+            return [sku], 1
+
+        scores: Dict[int, float] = {}  # SKU position -> score
+        for token in set(tokenize(query)):
+            for match in self._matching_tokens(token):
+                self._add_scores(scores, match, 1.0 if match == token else PREFIX_MATCH_WEIGHT)
+
+        key = lambda position: (-scores[position], position)
+        if limit is not None:
+            best = heapq.nsmallest(limit, scores, key=key)
+        else:
+            best = sorted(scores, key=key)
+        return [self._sku_at(position) for position in best], len(scores)
+
+    # ---- persistence ----------------------------------------------------
+
+    def save(self, path: str):
+        """
+        Write the index in the binary format load() maps: the saved postings
+        that still count and the in-memory ones merged, SKUs renumbered in
+        catalog order
+        """
+        live = [(position, self.base.sku(position)) for position in range(self.n_base)
+                if position not in self.shadowed]
+        live += [(self.order[sku], sku) for sku in self.product_tokens]
+        live.sort()
+        renumber = {position: i for i, (position, _) in enumerate(live)}
+
+        postings: Dict[str, Tuple[array, array]] = {}
+        for i in range(self.base.n_tokens if self.base is not None else 0):
+            positions, weights = postings.setdefault(self.base.token(i), (array("I"), array("f")))
+            for position, weight in zip(*self.base.posting(i)):
+                if position not in self.shadowed:
+                    positions.append(renumber[position])
+                    weights.append(weight)
+        for token, posting in self.postings.items():
+            positions, weights = postings.setdefault(token, (array("I"), array("f")))
+            for position, weight in posting.items():
+                positions.append(renumber[position])
+                weights.append(weight)
+
+        heap = bytearray()
+
+        def put(text: str) -> Tuple[int, int]:
+            data = text.encode("utf-8")
+            heap.extend(data)
+            return len(heap) - len(data), len(data)
+
+        skus = bytearray()
+        n_slots = 1
+        while n_slots < 2 * max(len(live), 1):
+            n_slots *= 2
+        slots = array("I", [0]) * n_slots
+        for i, (_, sku) in enumerate(live):
+            skus += SKU_ENTRY.pack(*put(sku))
+            slot = _sku_hash(sku.casefold()) & (n_slots - 1)
+            while slots[slot]:
+                slot = (slot + 1) & (n_slots - 1)
+            slots[slot] = i + 1
+
+        tokens = bytearray()
+        all_positions, all_weights = array("I"), array("f")
+        for token in sorted(postings):
+            positions, weights = postings[token]
+            if not positions:
+                continue
+            tokens += TOKEN_ENTRY.pack(*put(token), len(all_positions), len(positions))
+            all_positions.extend(positions)
+            all_weights.extend(weights)
+
+        sections = [bytes(skus), _little_endian(slots), bytes(tokens),
+                    _little_endian(all_positions), _little_endian(all_weights), bytes(heap)]
+        position = HEADER.size
+        starts = []
+        for section in sections:
+            starts.append(position)
+            position += len(section)
+        starts.append(position)
+        header = HEADER.pack(MAGIC, len(live), len(tokens) // TOKEN_ENTRY.size, n_slots, 0, *starts,
+                             (self.fingerprint or "").encode(), (self.catalog_hash or 0).to_bytes(20, "big"),
+                             self.catalog_hash is not None)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for section in sections:
+                f.write(section)
+        # a file that is still mapped can't be replaced on Windows, so let go
+        # of the saved index first and map the file just written in its place
+        base_path = self.base.path if self.base is not None else None
+        self.close()
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            if base_path is not None:
+                self.base = MappedPostings(base_path)
+            raise
+        keywords = self.keywords
+        self.__init__(MappedPostings(path))  # everything in memory is in the file now
+        self.keywords = keywords
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ProductIndex"]:
+        """Map an index written by save(); None if it is missing or unreadable"""
+        try:
+            return cls(MappedPostings(path))
+        except (OSError, ValueError, struct.error):
+            return None
+
+
+def product_keywords(products: Dict[str, Any], keywords: Optional[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """Invert curated {term: [SKU, ...]} into {SKU: [term, ...]}, dropping SKUs not in the catalog"""
+    by_sku: Dict[str, List[str]] = {}
+    for term, skus in (keywords or {}).items():
+        for sku in skus:
+            if sku in products:
+                by_sku.setdefault(sku, []).append(term)
+    return by_sku
+
+
+def load_or_build(path: Optional[str], products: Dict[str, Dict[str, Any]],
+                  keywords: Optional[Dict[str, List[str]]] = None) -> ProductIndex:
+    """
+    Load the saved index if it matches the catalog, otherwise build and save a
+    new one. An in-memory catalog has no content hash to check against, so its
+    saved index is used as is; delete the index file after changing PRODUCT_DB.
+    """
+    fingerprint = catalog_fingerprint(products, keywords)
+    index = ProductIndex.load(path) if path else None
+    if index is not None and (fingerprint is None or index.fingerprint == fingerprint):
+        index.keywords = keywords
+        return index
+    if index is not None:
+        index.close()
+    index = ProductIndex.build(products, keywords)
+    if path:
+        try:
+            index.save(path)
+        except OSError:
+            pass  # read-only location; the in-memory index still works
+    return index
@@ -0,0 +1,222 @@
+"""
+Query-result cache for the Q&A search.
+
+Two caches sit in front of the search: ranked hits, keyed on the normalized
+query text plus its category (and k / threshold), and hydrated answers,
+keyed on question_id. Both are LRU with a TTL as a backstop, but entries are
+normally dropped exactly when they go stale:
+
+  * ranked hits listen to the TF-IDF index. Appended questions only drop the
+    cached queries that share a term with them and whose category covers
+    their product; a refit (new IDF weights) drops them all. When answers are
+    searchable too (the FTS5 tier), new answers are checked the same way.
+  * hydrated answers are dropped when answers are merged into a question,
+    and an upvote or flag re-sorts that question's cached extras in place.
+
+Each process keeps its own cache, so changes made by another process are only
+seen once the TTL expires.
+"""
+
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+MAX_HITS = 10_000      # cached queries
+MAX_ANSWERS = 20_000   # cached hydrated questions
+TTL_SECONDS = 600.0
+
+
+def _approx_size(value):
+    """Rough bytes held by a cached value of lists, tuples, dicts, strings and numbers"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_approx_size(v) for v in value)
+    return size
+
+
+class LRUCache:
+    """Least-recently-used mapping with a time-to-live and hit / miss / size counters"""
+
+    def __init__(self, max_entries, ttl=TTL_SECONDS, on_remove=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_remove = on_remove  # called with the key of every entry that leaves the cache
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires at, value, approximate bytes)
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry[0] < self.clock():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, key, default=None):
+        """The cached value without touching the counters or the LRU order"""
+        entry = self._entries.get(key)
+        return default if entry is None else entry[1]
+
+    def put(self, key, value):
+        if key in self._entries:
+            self._remove(key)
+        size = _approx_size(value)
+        self._entries[key] = (self.clock() + self.ttl, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, key):
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        for key in list(self._entries):
+            self._remove(key)
+
+    def _remove(self, key):
+        self.bytes -= self._entries.pop(key)[2]
+        if self.on_remove is not None:
+            self.on_remove(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries), "bytes": self.bytes,
+            "lookups": lookups, "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions, "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class QueryCache:
+    """
+    Ranked hits and hydrated answers for one TfidfIndex. Keys are built by
+    the caller from already-normalized query text (see main.cached_search).
+    """
+
+    def __init__(self, index, max_hits=MAX_HITS, max_answers=MAX_ANSWERS, ttl=TTL_SECONDS):
+        self.index = index
+        self.hits = LRUCache(max_hits, ttl, on_remove=self._forget_hits)
+        self.answers = LRUCache(max_answers, ttl)
+        self._terms = {}        # term id -> keys of cached queries using it
+        self._hit_meta = {}     # key -> (term ids, frozenset of g_item_nos or None)
+        self._lock = threading.Lock()
+        index.add_listener(self._index_changed)
+
+    # ---- ranked hits ----------------------------------------------------
+
+    def get_hits(self, key):
+        """[(question_id, g_item_no, similarity)] cached for key, or None"""
+        with self._lock:
+            return self.hits.get(key)
+
+    def put_hits(self, key, query, g_item_nos, matches):
+        """
+        Caches the ranked matches of query (normalized text) searched within
+        g_item_nos (None for every product)
+        """
+        terms = self.index.query_terms(query)[0].tolist() if self.index.vectorizer is not None else []
+        scope = None if g_item_nos is None else frozenset(g_item_nos)
+        with self._lock:
+            self.hits.put(key, matches)
+            self._hit_meta[key] = (terms, scope)
+            for term in terms:
+                self._terms.setdefault(term, set()).add(key)
+
+    def _forget_hits(self, key):
+        terms, _ = self._hit_meta.pop(key, ((), None))
+        for term in terms:
+            keys = self._terms.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._terms[term]
+
+    def _index_changed(self, rows, g_item_nos):
+        with self._lock:
+            if rows is None:
+                # new IDF weights move every score, and a rebuilt index may
+                # hold different questions altogether
+                self.hits.clear()
+                self.answers.clear()
+                return
+        self.texts_added(rows, g_item_nos)
+
+    def texts_added(self, rows, g_item_nos):
+        """
+        Drops the cached queries that new searchable text could now match:
+        rows are its TF-IDF vectors, g_item_nos the product of each row
+        """
+        with self._lock:
+            # products of the new texts, per term they contain
+            products_by_term = {}
+            for i in range(rows.shape[0]):
+                g_item_no = int(g_item_nos[i])
+                for term in rows.indices[rows.indptr[i]:rows.indptr[i + 1]].tolist():
+                    products_by_term.setdefault(term, set()).add(g_item_no)
+            stale = set()
+            for term, products in products_by_term.items():
+                for key in self._terms.get(term, ()):
+                    scope = self._hit_meta[key][1]
+                    if scope is None or not scope.isdisjoint(products):
+                        stale.add(key)
+            for key in stale:
+                self.hits.invalidate(key)
+
+    # ---- hydrated answers -----------------------------------------------
+
+    def get_answers(self, question_id):
+        """Hydrated record (see main.hydrate_results, without "score") or None"""
+        with self._lock:
+            return self.answers.get(question_id)
+
+    def put_answers(self, question_id, record):
+        with self._lock:
+            self.answers.put(question_id, record)
+
+    def invalidate_answers(self, question_ids):
+        with self._lock:
+            for question_id in question_ids:
+                self.answers.invalidate(question_id)
+
+    def answer_changed(self, question_id, answer_id, upvotes, rank):
+        """Applies an answer's new upvote count and rank score to a cached question and re-sorts its extras"""
+        with self._lock:
+            record = self.answers.peek(question_id)
+            if record is None:
+                return
+            for extra in record["extras"]:
+                if extra[0] == answer_id:
+                    extra[2], extra[3] = upvotes, rank
+                    record["extras"].sort(key=lambda e: (-(e[3] if e[3] is not None else -math.inf), e[0]))
+                    return
+            # the primary answer, or one the cached copy has never seen: read it again next time
+            self.answers.invalidate(question_id)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits.stats(), "answers": self.answers.stats()}
@@ -0,0 +1,71 @@
+"""
+Answer ranking: one precomputed score per answer, blended with search
+similarity at query time.
+
+Every answer carries a mass: a weight for being posted plus one per upvote,
+each worth 2 ** ((t - EPOCH) / HALF_LIFE) for the time t it happened. Weights
+are kept in that fixed time frame, so a vote never has to be re-decayed: an
+answer's rank score,
+
+    log2(mass) - FLAG_PENALTY * flags
+
+only changes when the answer gets feedback, yet comparing two scores at any
+moment compares their upvotes decayed to that moment, with newer answers
+ahead of older ones with the same votes. Each flag costs FLAG_PENALTY
+half-lives, so flagged answers sink. Subtracting (now - EPOCH) / HALF_LIFE
+gives the score in today's terms (quality()), which is what gets blended
+with TF-IDF similarity to order the questions themselves.
+"""
+
+import math
+import time
+
+EPOCH = 1_704_067_200.0          # 2024-01-01 UTC, the origin of the weight frame
+HALF_LIFE = 30 * 86_400.0        # an upvote counts half as much after this many seconds
+POSTED_WEIGHT = 1.0              # an answer's own weight, as if it got one vote when posted
+FLAG_PENALTY = 3.0               # half-lives lost per flag: each flag divides the mass by 8
+QUALITY_WEIGHT = 0.05            # most a question's answers can move its similarity
+QUALITY_SCALE = 4.0              # quality (in half-lives) where that nudge is ~3/4 used
+
+
+def weight(t):
+    """Weight of one vote (or a posting) at epoch time t"""
+    return 2.0 ** ((t - EPOCH) / HALF_LIFE)
+
+
+def rank_score(mass, flags):
+    return math.log2(mass) - FLAG_PENALTY * flags if mass > 0 else -math.inf
+
+
+def quality(score, now=None):
+    """A rank score in today's terms: log2 of the decayed votes, less the flag penalty"""
+    return score - ((time.time() if now is None else now) - EPOCH) / HALF_LIFE
+
+
+def blend(similarity, best_score, now=None):
+    """Question order key: TF-IDF similarity nudged by the quality of its best answer"""
+    if best_score is None or best_score == -math.inf:
+        return similarity
+    return similarity + QUALITY_WEIGHT * math.tanh(quality(best_score, now) / QUALITY_SCALE)
+
+
+def rank_unranked(conn, now=None):
+    """
+    Gives answers stored without a rank (new rows, or rows from before
+    ranking existed) their posting weight and score; their upvotes so far
+    count as votes made now. Returns how many answers were ranked.
+    """
+    now = time.time() if now is None else now
+    rows = conn.execute(
+        "SELECT answer_id, created_at, upvotes, flags FROM Answer WHERE rank_score IS NULL"
+    ).fetchall()
+    updates = []
+    for answer_id, created_at, upvotes, flags in rows:
+        created_at = now if created_at is None else created_at
+        mass = POSTED_WEIGHT * weight(created_at) + (upvotes or 0) * weight(now)
+        updates.append((created_at, mass, rank_score(mass, flags or 0), answer_id))
+    if updates:
+        # even an empty executemany would open a transaction and hold a read snapshot
+        conn.executemany(
+            "UPDATE Answer SET created_at = ?, rank_mass = ?, rank_score = ? WHERE answer_id = ?", updates)
+    return len(updates)
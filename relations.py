@@ -0,0 +1,228 @@
+"""
+Product relationship graph for the Grainger rep toolbar.
+
+Frequently-bought-together and alternative edges are kept in CSR adjacency
+arrays per relation: the neighbours of catalog row r are
+indices[indptr[r]:indptr[r + 1]], with matching weights, already sorted best
+first. SKUs that are not in the catalog and self-links are dropped when the
+graph is built, so showing a product's neighbourhood is one array slice with
+nothing left to re-check.
+"""
+
+import json
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+GRAPH_FORMAT = 1
+RELATIONS = ("frequently_bought_together", "alternatives")
+
+
+def rank_weight(rank: int) -> float:
+    """Edge weight for the rank-th SKU of a curated list: earlier entries matter more"""
+    return 1.0 / (rank + 1)
+
+
+class Adjacency:
+    """CSR adjacency for one relation: row -> neighbour rows and weights, best first"""
+
+    __slots__ = ("indptr", "indices", "weights")
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def from_edges(cls, n_rows: int, src: Any, dst: Any, weight: Any) -> "Adjacency":
+        """Build from edge arrays; duplicate (src, dst) edges keep their best weight"""
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weight = np.asarray(weight, dtype=np.float32)
+        keep = (src != dst) & (src >= 0) & (dst >= 0)
+        src, dst, weight = src[keep], dst[keep], weight[keep]
+
+        # best weight first within each source row, then drop repeated targets
+        order = np.lexsort((dst, -weight, src))
+        src, dst, weight = src[order], dst[order], weight[order]
+        if len(src):
+            pair = src * n_rows + dst
+            _, first = np.unique(pair, return_index=True)
+            first.sort()
+            src, dst, weight = src[first], dst[first], weight[first]
+
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, dst.astype(np.int32), weight)
+
+    def neighbors(self, row: int, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(neighbour rows, weights) of one row, best first"""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.indices[start:end], self.weights[start:end]
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.indices)
+
+
+class RelationGraph:
+    """Weighted FBT/alternative edges between rows of a catalog"""
+
+    def __init__(self, catalog: Any, adjacency: Dict[str, Adjacency]):
+        self.catalog = catalog
+        self.adjacency = adjacency
+
+    @classmethod
+    def build(cls, catalog: Any, derived: Optional[Dict[str, Callable]] = None) -> "RelationGraph":
+        """
+        Graph from the catalog's own relationship lists: each listed SKU that
+        exists becomes an edge weighted by its position in the list. Relations
+        named in derived are instead computed by derived[kind](catalog), which
+        returns (row, row, weight) edge arrays
+        """
+        n_rows = len(catalog)
+        adjacency = {}
+        for kind in RELATIONS:
+            if derived and kind in derived:
+                adjacency[kind] = Adjacency.from_edges(n_rows, *derived[kind](catalog))
+                continue
+            src: List[int] = []
+            dst: List[int] = []
+            weight: List[float] = []
+            for row, (_, product) in enumerate(catalog.items()):
+                for rank, sku in enumerate(product.get(kind, [])):
+                    target = catalog.row(sku)
+                    if target >= 0:
+                        src.append(row)
+                        dst.append(target)
+                        weight.append(rank_weight(rank))
+            adjacency[kind] = Adjacency.from_edges(n_rows, src, dst, weight)
+        return cls(catalog, adjacency)
+
+    def with_edges(self, kind: str, src: Any, dst: Any, weight: Any) -> "RelationGraph":
+        """Copy of the graph with one relation replaced by the given row -> row edges"""
+        adjacency = dict(self.adjacency)
+        adjacency[kind] = Adjacency.from_edges(len(self.catalog), src, dst, weight)
+        return RelationGraph(self.catalog, adjacency)
+
+    # ---- queries --------------------------------------------------------
+
+    def _sku(self, row: int) -> str:
+        return self.catalog.field(int(row), "sku")
+
+    def ranked(self, sku: str, kind: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """[(SKU, weight)] directly related to sku, best first; every SKU is in the catalog"""
+        row = self.catalog.row(sku)
+        if row < 0:
+            return []
+        rows, weights = self.adjacency[kind].neighbors(row, limit)
+        return [(self._sku(r), float(w)) for r, w in zip(rows, weights)]
+
+    def neighbors(self, sku: str, kind: str, limit: Optional[int] = None) -> List[str]:
+        """SKUs directly related to sku, best first"""
+        return [s for s, _ in self.ranked(sku, kind, limit)]
+
+    def k_hop(self, sku: str, kind: str, hops: int = 2, limit: Optional[int] = None,
+              fanout: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        [(SKU, score)] reachable from sku in up to `hops` steps, best first. A
+        path scores the product of its edge weights and a SKU sums its paths;
+        fanout caps how many neighbours of each node are followed
+        """
+        start = self.catalog.row(sku)
+        if start < 0:
+            return []
+        adjacency = self.adjacency[kind]
+        frontier_rows = np.array([start], dtype=np.int64)
+        frontier_scores = np.array([1.0])
+        reached_rows, reached_scores = [], []
+        for _ in range(hops):
+            starts = adjacency.indptr[frontier_rows]
+            lengths = adjacency.indptr[frontier_rows + 1] - starts
+            if fanout is not None:
+                lengths = np.minimum(lengths, fanout)
+            total = int(lengths.sum())
+            if not total:
+                break
+            # flat positions of every followed edge, without a Python loop per node
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            frontier_rows, inverse = np.unique(adjacency.indices[offsets], return_inverse=True)
+            frontier_scores = np.bincount(inverse, weights=np.repeat(frontier_scores, lengths) * adjacency.weights[offsets])
+            reached_rows.append(frontier_rows)
+            reached_scores.append(frontier_scores)
+        if not reached_rows:
+            return []
+
+        found, inverse = np.unique(np.concatenate(reached_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(reached_scores))
+        keep = found != start
+        found, scores = found[keep], scores[keep]
+        if limit is not None and len(found) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            found, scores = found[top], scores[top]
+        order = np.lexsort((found, -scores))
+        return [(self._sku(found[i]), float(scores[i])) for i in order]
+
+    # ---- persistence ----------------------------------------------------
+
+    def save(self, graph_dir: str, derived: Optional[Dict[str, Callable]] = None):
+        """Write the adjacency arrays as .npy files (loadable with mmap), replacing any previous copy"""
+        tmp_dir = graph_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for kind, adjacency in self.adjacency.items():
+            for name in Adjacency.__slots__:
+                np.save(os.path.join(tmp_dir, f"{kind}.{name}.npy"), getattr(adjacency, name))
+        meta = {"format": GRAPH_FORMAT, "rows": len(self.catalog), "relations": list(self.adjacency),
+                "catalog": getattr(self.catalog, "content_hash", None), "derived": sorted(derived or ())}
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        old_dir = graph_dir + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(graph_dir):
+            os.replace(graph_dir, old_dir)
+        os.replace(tmp_dir, graph_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, graph_dir: str, catalog: Any, derived: Optional[Dict[str, Callable]] = None,
+             mmap_mode: Optional[str] = "r") -> Optional["RelationGraph"]:
+        """Read a graph written by save() for this catalog; None if missing, unreadable or stale"""
+        try:
+            with open(os.path.join(graph_dir, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if (meta.get("format") != GRAPH_FORMAT or meta["rows"] != len(catalog)
+                    or meta["catalog"] != getattr(catalog, "content_hash", None)
+                    or meta.get("derived", []) != sorted(derived or ())):
+                return None
+            adjacency = {
+                kind: Adjacency(*(np.load(os.path.join(graph_dir, f"{kind}.{name}.npy"), mmap_mode=mmap_mode)
+                                  for name in Adjacency.__slots__))
+                for kind in meta["relations"]
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(catalog, adjacency)
+
+
+def load_or_build(graph_dir: Optional[str], catalog: Any, derived: Optional[Dict[str, Callable]] = None) -> RelationGraph:
+    """
+    Saved graph for a mapped catalog file if there is a current one, otherwise
+    built from the catalog (and saved, when the catalog is a file whose
+    contents can be checked next time)
+    """
+    if graph_dir and getattr(catalog, "content_hash", None):
+        graph = RelationGraph.load(graph_dir, catalog, derived)
+        if graph is not None:
+            return graph
+    graph = RelationGraph.build(catalog, derived)
+    if graph_dir and getattr(catalog, "content_hash", None):
+        try:
+            graph.save(graph_dir, derived)
+        except OSError:
+            pass  # read-only location; the in-memory graph still works
+    return graph
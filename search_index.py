@@ -0,0 +1,589 @@
+"""
+Persisted TF-IDF index over the Question table.
+
+The vocabulary, IDF weights and sparse question matrix are saved to disk so a
+restart only has to load arrays instead of refitting the vectorizer. Questions
+added after the last fit are appended with the existing weights; once enough of
+the corpus has never been seen by the IDF weights, a full refit runs in a
+background thread and is swapped in when done.
+
+A weights-only index keeps just the vocabulary, IDF weights and row ids in
+memory, for callers that find candidates some other way (the FTS5 tier in
+main.py) and only need the vectorizer to re-rank them. It still writes delta
+segments, so the full index on disk stays current.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+INDEX_FORMAT = 1
+MAX_CACHED_SCOPES = 32
+BATCH_MAX_SCORES = 1_000_000  # (row, query) scores held at once by search_batch
+DENSE_SCORING = 1 / 12  # posting entries per row past which search() adds into a full-length array
+
+
+class TfidfIndex:
+    """TF-IDF matrix over question texts, one row per question_id."""
+
+    def __init__(self, index_dir=None, drift_threshold=0.2, weights_only=False):
+        self.index_dir = index_dir
+        self.drift_threshold = drift_threshold
+        self.weights_only = weights_only  # matrix dropped once saved; see the module docstring
+        self.vectorizer = None
+        self.matrix = sparse.csr_matrix((0, 0))
+        self.question_ids = np.empty(0, dtype=np.int64)
+        self.g_item_nos = np.empty(0, dtype=np.int64)
+        # bookkeeping for IDF drift since the last full fit
+        self.fitted_docs = 0
+        self.appended_docs = 0
+        self.appended_tokens = 0
+        self.unknown_tokens = 0
+        self._segments = []  # delta files written since the last full save
+        self._analyzer = None  # (vectorizer, its analyzer) for query_terms
+        self._listeners = []  # called as fn(rows, g_item_nos) on append, fn(None, None) on a refit
+        self._postings = None  # CSC copy of matrix: column t is term t's posting list
+        self._view = None  # what searches read; see _searchable
+        self._lock = threading.RLock()
+        self._refit_thread = None
+
+    def add_listener(self, fn):
+        """
+        Registers fn to hear about changes that can alter search results:
+        fn(rows, g_item_nos) with the TF-IDF rows of newly appended questions
+        and their products, or fn(None, None) when the whole index was
+        re-weighted.
+        """
+        self._listeners.append(fn)
+
+    def _notify(self, rows, g_item_nos):
+        for fn in self._listeners:
+            fn(rows, g_item_nos)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    @property
+    def last_question_id(self):
+        return int(self.question_ids.max()) if len(self.question_ids) else 0
+
+    def drift(self):
+        """
+        How far the IDF weights have drifted: the larger of the share of rows
+        appended since the last fit and the share of appended tokens that are
+        missing from the vocabulary.
+        """
+        growth = self.appended_docs / max(self.fitted_docs, 1)
+        unknown = self.unknown_tokens / max(self.appended_tokens, 1)
+        return max(growth, unknown)
+
+    def transform(self, texts):
+        return self.vectorizer.transform(texts)
+
+    def query_terms(self, user_input, vectorizer=None):
+        """
+        (term ids, weights) of one query's L2-normalized TF-IDF vector, the
+        same values vectorizer.transform gives but without its per-call input
+        validation, which costs more than the search itself for one short query
+        """
+        vectorizer = vectorizer or self.vectorizer
+        analyze = self._analyzer
+        if analyze is None or analyze[0] is not vectorizer:
+            analyze = self._analyzer = (vectorizer, vectorizer.build_analyzer())
+        vocabulary = vectorizer.vocabulary_
+        counts = {}
+        for token in analyze[1](user_input):
+            term = vocabulary.get(token)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        terms = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * vectorizer.idf_[terms]
+        return terms, weights / np.sqrt(np.dot(weights, weights))
+
+    # ---- retrieval ------------------------------------------------------
+
+    def _matrix_changed(self):
+        self._postings = None
+        self._view = None
+
+    def _release_matrix(self):
+        """Drops the matrix of a weights-only index (call after it has been saved)"""
+        if self.weights_only and self.matrix.shape[0]:
+            self.matrix = sparse.csr_matrix((0, self.matrix.shape[1]))
+            self._matrix_changed()
+
+    def _check_searchable(self):
+        if self.weights_only:
+            raise RuntimeError("a weights-only index has no matrix to search")
+
+    def postings(self):
+        """
+        Inverted index over the matrix. Built lazily and dropped whenever the
+        matrix changes, so a burst of appends only pays for one conversion.
+        """
+        postings = self._postings
+        if postings is None:
+            with self._lock:
+                postings = self._postings = self.matrix.tocsc()
+        return postings
+
+    def _searchable(self):
+        """
+        (vectorizer, matrix, postings, question_ids, g_item_nos, scope cache)
+        of one version of the index. Appends and refits replace these under
+        the lock, and the tuple is rebuilt after any of them, so a search that
+        reads everything from one tuple never mixes a new vocabulary with old
+        posting lists or maps rows to another version's question ids.
+        """
+        view = self._view
+        if view is None:
+            with self._lock:
+                view = self._view
+                if view is None:
+                    view = self._view = (self.vectorizer, self.matrix, self.postings(),
+                                         self.question_ids, self.g_item_nos, {})
+        return view
+
+    def scoped_postings(self, g_item_nos, view=None):
+        """
+        Inverted index over just the questions about the given products, as
+        (row numbers, CSC sub-matrix). Cached per product set, so a category
+        search only ever reads that category's posting lists.
+        """
+        _, matrix, _, _, row_products, scopes = view or self._searchable()
+        key = frozenset(g_item_nos)
+        scope = scopes.get(key)
+        if scope is None:
+            rows = np.flatnonzero(np.isin(row_products, list(key)))
+            scope = (rows, matrix[rows].tocsc())
+            with self._lock:
+                if len(scopes) >= MAX_CACHED_SCOPES:
+                    scopes.pop(next(iter(scopes)), None)
+                scopes[key] = scope
+        return scope
+
+    def search(self, user_input, k=None, threshold=0.0, g_item_nos=None, ids=False):
+        """
+        Returns [(row, score)] for the k best rows scoring above threshold,
+        best first, or [(question_id, g_item_no, score)] with ids=True (read
+        from the same version of the index as the scores; see _searchable).
+        Only rows sharing a term with the query are scored: the query's
+        posting lists are gathered, summed per row and the top k picked with
+        argpartition, so the cost follows the posting lists rather than the
+        corpus size. Queries with common words touch most rows; once the
+        postings outnumber DENSE_SCORING of the rows each list is added
+        straight into one score per row, which is cheaper than sorting them.
+        Rows and queries are L2-normalized, so the dot product is the cosine
+        similarity.
+
+        When g_item_nos is given, only questions about those products are
+        scored at all (see scoped_postings).
+        """
+        self._check_searchable()
+        view = self._searchable()
+        vectorizer, _, postings, question_ids, row_products, _ = view
+        if vectorizer is None:
+            return []
+        terms, term_weights = self.query_terms(user_input, vectorizer)
+        if not len(terms):
+            return []
+        row_map = None
+        if g_item_nos is not None:
+            row_map, postings = self.scoped_postings(g_item_nos, view)
+        starts = postings.indptr[terms]
+        ends = postings.indptr[terms + 1]
+        touched = int((ends - starts).sum())
+        if not touched:
+            return []
+
+        n_rows = postings.shape[0]
+        if threshold >= 0 and touched >= DENSE_SCORING * n_rows:
+            # a row appears once per posting list, so each list adds in place;
+            # rows without a shared term score 0 and fall under the threshold
+            scores = np.zeros(n_rows)
+            for s, e, w in zip(starts.tolist(), ends.tolist(), term_weights.tolist()):
+                scores[postings.indices[s:e]] += postings.data[s:e] * w
+            candidates = np.flatnonzero(scores > threshold)
+            scores = scores[candidates]
+        else:
+            rows = np.concatenate([postings.indices[s:e] for s, e in zip(starts, ends)])
+            weights = np.concatenate(
+                [postings.data[s:e] * w for s, e, w in zip(starts, ends, term_weights)])
+            candidates, slot = np.unique(rows, return_inverse=True)
+            scores = np.bincount(slot, weights=weights)
+            keep = scores > threshold
+            candidates, scores = candidates[keep], scores[keep]
+        if row_map is not None:
+            candidates = row_map[candidates]
+        if k is not None and len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        # best score first, ties in index order
+        order = np.lexsort((candidates, -scores))
+        candidates, scores = candidates[order], scores[order].tolist()
+        if ids:
+            return list(zip(question_ids[candidates].tolist(), row_products[candidates].tolist(), scores))
+        return list(zip(candidates.tolist(), scores))
+
+    def search_batch(self, queries, k=None, threshold=0.0, g_item_nos=None, max_scores=BATCH_MAX_SCORES,
+                     ids=False):
+        """
+        search() for many queries at once: [[(row, score)], ...] in query
+        order, or [[(question_id, g_item_no, score)], ...] with ids=True.
+        The queries are vectorized with one transform call and scored in
+        chunks as one sparse-times-dense product: the chunk's posting lists
+        are read once for all of its queries, so a common word is no longer
+        walked again for every query that contains it. Each chunk's
+        (queries x rows) score block holds about max_scores values. With k
+        set, argpartition picks every query's k best in one call over the
+        block and only those k per query are sorted; without it, every score
+        above the threshold is.
+        """
+        self._check_searchable()
+        view = self._searchable()
+        vectorizer, _, postings, question_ids, row_products, _ = view
+        if vectorizer is None or not len(queries):
+            return [[] for _ in queries]
+        row_map = None
+        if g_item_nos is not None:
+            row_map, postings = self.scoped_postings(g_item_nos, view)
+        vectors = vectorizer.transform(queries)
+        # rows sharing no term with a query score 0, like the rows search() never touches
+        floor = max(threshold, 0.0)
+        step = max(1, max_scores // max(postings.shape[0], 1))
+
+        results = []
+        for start in range(0, len(queries), step):
+            chunk = vectors[start:start + step]
+            terms = np.unique(chunk.indices)
+            if not len(terms):
+                results.extend([] for _ in range(chunk.shape[0]))
+                continue
+            # (queries x rows), so each query's scores are one contiguous row
+            scores = np.ascontiguousarray((postings[:, terms] @ chunk[:, terms].T.toarray()).T)
+            if k is not None and k < scores.shape[1]:
+                # each query's k best first, as search() does, and only those are sorted:
+                # best score first, ties in index order
+                rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                values = np.take_along_axis(scores, rows, axis=1)
+                order = np.lexsort((rows, -values), axis=1)
+                rows, values = np.take_along_axis(rows, order, axis=1), np.take_along_axis(values, order, axis=1)
+                keep = values > floor  # a prefix of each sorted row
+                rows, values = rows[keep], values[keep]
+                bounds = np.concatenate(([0], np.cumsum(keep.sum(axis=1))))
+            else:
+                query_no, rows = np.nonzero(scores > floor)
+                values = scores[query_no, rows]
+                # per query: best score first, ties in index order
+                order = np.lexsort((rows, -values, query_no))
+                query_no, rows, values = query_no[order], rows[order], values[order]
+                bounds = np.searchsorted(query_no, np.arange(chunk.shape[0] + 1))
+            if row_map is not None:
+                rows = row_map[rows]
+            values = values.tolist()
+            if ids:
+                columns = (question_ids[rows].tolist(), row_products[rows].tolist(), values)
+            else:
+                columns = (rows.tolist(), values)
+            results.extend(list(zip(*(column[bounds[i]:bounds[i + 1]] for column in columns)))
+                           for i in range(chunk.shape[0]))
+        return results
+
+    # ---- building -------------------------------------------------------
+
+    def fit(self, question_ids, question_texts, g_item_nos):
+        """Refits the vectorizer and rebuilds the matrix from scratch."""
+        vectorizer, matrix = _fit(question_texts)
+        with self._lock:
+            self.vectorizer = vectorizer
+            self.matrix = matrix
+            self._matrix_changed()
+            self.question_ids = np.asarray(question_ids, dtype=np.int64)
+            self.g_item_nos = np.asarray(g_item_nos, dtype=np.int64)
+            self.fitted_docs = len(question_ids)
+            self.appended_docs = self.appended_tokens = self.unknown_tokens = 0
+            self._notify(None, None)
+
+    def append(self, question_ids, question_texts, g_item_nos):
+        """
+        Adds rows using the current vocabulary and IDF weights.
+        Returns the new rows' matrix so callers can persist just the delta.
+        """
+        with self._lock:
+            if self.vectorizer is None:
+                self.fit(question_ids, question_texts, g_item_nos)
+                return None
+            rows = self.vectorizer.transform(question_texts)
+            analyzer = self.vectorizer.build_analyzer()
+            vocabulary = self.vectorizer.vocabulary_
+            for text in question_texts:
+                tokens = analyzer(text)
+                self.appended_tokens += len(tokens)
+                self.unknown_tokens += sum(1 for t in tokens if t not in vocabulary)
+            self.appended_docs += len(question_ids)
+            if not self.weights_only:
+                self.matrix = sparse.vstack([self.matrix, rows], format="csr")
+                self._matrix_changed()
+            self.question_ids = np.concatenate(
+                [self.question_ids, np.asarray(question_ids, dtype=np.int64)])
+            self.g_item_nos = np.concatenate(
+                [self.g_item_nos, np.asarray(g_item_nos, dtype=np.int64)])
+            self._notify(rows, g_item_nos)
+            return rows
+
+    def sync(self, conn, db_path=None):
+        """
+        Brings the index in line with the Question table and returns how many
+        questions were added. New question_ids are appended incrementally; an
+        index that no longer matches the table (e.g. the database was replaced)
+        is rebuilt. A background refit is started when drift passes the
+        threshold.
+        """
+        cursor = conn.cursor()
+        with self._lock:
+            last_qid = self.last_question_id
+            count, max_qid = cursor.execute(
+                "SELECT COUNT(*), COALESCE(MAX(question_id), 0) FROM Question WHERE question_id <= ?",
+                (last_qid,)
+            ).fetchone()
+            if count != len(self) or max_qid != last_qid:
+                self.fit(*_load_questions(cursor))
+                self.save()
+                self._release_matrix()
+                return len(self)
+
+            new = _load_questions(cursor, after_id=last_qid)
+            if new[0]:
+                full_fit = self.vectorizer is None
+                rows = self.append(*new)
+                if full_fit:
+                    self.save()
+                    self._release_matrix()
+                else:
+                    self._save_segment(new[0], new[2], rows)
+
+        # also covers a refit that was cut short when the last session exited
+        if self.drift() > self.drift_threshold:
+            self.refit_in_background(conn, db_path)
+        return len(new[0])
+
+    def refit_in_background(self, conn, db_path=None):
+        """
+        Re-weights the whole corpus. With an on-disk database the refit runs on
+        its own connection in a background thread (not a daemon, so a refit in
+        progress is finished and saved before the program exits); otherwise it
+        runs inline.
+        """
+        if self._refit_thread is not None and self._refit_thread.is_alive():
+            return
+        if not db_path or db_path == ":memory:":
+            self._refit(conn)
+            return
+        self._refit_thread = threading.Thread(
+            target=self._refit_from_path, args=(db_path,))
+        self._refit_thread.start()
+
+    def _refit_from_path(self, db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            self._refit(conn)
+        finally:
+            conn.close()
+
+    def _refit(self, conn):
+        question_ids, texts, g_item_nos = _load_questions(conn.cursor())
+        vectorizer, matrix = _fit(texts)
+        with self._lock:
+            # rows appended while we were fitting are re-weighted with the new vocabulary
+            seen = len(question_ids)
+            extra_ids = self.question_ids[seen:]
+            if len(extra_ids):
+                extra = _load_questions(conn.cursor(), after_id=int(question_ids[-1]) if seen else 0)
+                matrix = sparse.vstack([matrix, vectorizer.transform(extra[1])], format="csr")
+                question_ids = list(question_ids) + list(extra[0])
+                g_item_nos = list(g_item_nos) + list(extra[2])
+            self.vectorizer = vectorizer
+            self.matrix = matrix
+            self._matrix_changed()
+            self.question_ids = np.asarray(question_ids, dtype=np.int64)
+            self.g_item_nos = np.asarray(g_item_nos, dtype=np.int64)
+            self.fitted_docs = len(question_ids)
+            self.appended_docs = self.appended_tokens = self.unknown_tokens = 0
+            self._notify(None, None)
+            self.save()
+            self._release_matrix()
+
+    # ---- persistence ----------------------------------------------------
+
+    def save(self):
+        """Writes the full index, replacing any previous copy and its delta segments."""
+        if not self.index_dir:
+            return
+        if self.weights_only and self.matrix.shape[0] != len(self.question_ids):
+            raise RuntimeError("a weights-only index can only be saved right after a fit")
+        with self._lock:
+            tmp_dir = self.index_dir + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            matrix = self.matrix.tocsr()
+            np.save(os.path.join(tmp_dir, "data.npy"), matrix.data)
+            np.save(os.path.join(tmp_dir, "indices.npy"), matrix.indices)
+            np.save(os.path.join(tmp_dir, "indptr.npy"), matrix.indptr)
+            np.save(os.path.join(tmp_dir, "question_ids.npy"), self.question_ids)
+            np.save(os.path.join(tmp_dir, "g_item_nos.npy"), self.g_item_nos)
+            # the inverted index too, so a memory-mapped load can search without converting
+            postings = self.postings()
+            np.save(os.path.join(tmp_dir, "postings_data.npy"), postings.data)
+            np.save(os.path.join(tmp_dir, "postings_indices.npy"), postings.indices)
+            np.save(os.path.join(tmp_dir, "postings_indptr.npy"), postings.indptr)
+            meta = {
+                "format": INDEX_FORMAT,
+                "shape": list(matrix.shape),
+                "fitted_docs": self.fitted_docs,
+                "segments": [],
+                "appended_docs": self.appended_docs,
+                "appended_tokens": self.appended_tokens,
+                "unknown_tokens": self.unknown_tokens,
+                "vocabulary": None,
+            }
+            if self.vectorizer is not None:
+                np.save(os.path.join(tmp_dir, "idf.npy"), self.vectorizer.idf_)
+                meta["vocabulary"] = {t: int(i) for t, i in self.vectorizer.vocabulary_.items()}
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+            old_dir = self.index_dir + ".old"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(self.index_dir):
+                os.rename(self.index_dir, old_dir)
+            os.rename(tmp_dir, self.index_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+            self._segments = []
+
+    def compact(self):
+        """
+        Waits for any background refit, then folds delta segments into a full
+        save, so that load(..., mmap_mode="r") maps every array straight from
+        disk instead of stacking copies.
+        """
+        thread = self._refit_thread
+        if thread is not None:
+            thread.join()
+        if self.index_dir and (self._segments or not os.path.exists(
+                os.path.join(self.index_dir, "postings_indptr.npy"))):
+            self.save()
+
+    def _save_segment(self, question_ids, g_item_nos, rows):
+        """Persists appended rows as a small delta file instead of rewriting the index."""
+        if not self.index_dir or not os.path.exists(self.index_dir):
+            self.save()
+            return
+        name = f"segment_{int(question_ids[0])}.npz"
+        sparse.save_npz(os.path.join(self.index_dir, name), rows)
+        np.savez(os.path.join(self.index_dir, name[:-4] + "_ids.npz"),
+                 question_ids=np.asarray(question_ids, dtype=np.int64),
+                 g_item_nos=np.asarray(g_item_nos, dtype=np.int64))
+        self._segments.append(name)
+        self._write_meta()
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.index_dir, "meta.json")
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        meta.update({
+            "segments": self._segments,
+            "appended_docs": self.appended_docs,
+            "appended_tokens": self.appended_tokens,
+            "unknown_tokens": self.unknown_tokens,
+        })
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def load(cls, index_dir, drift_threshold=0.2, mmap_mode=None, weights_only=False):
+        """
+        Loads a saved index, or returns None when there is none (or it is unreadable).
+        With mmap_mode="r" the arrays are mapped read-only rather than read,
+        so processes loading the same compacted index share its pages.
+        With weights_only the matrix and posting lists are not read at all.
+        """
+        meta_path = os.path.join(index_dir, "meta.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != INDEX_FORMAT:
+            return None
+
+        index = cls(index_dir, drift_threshold, weights_only)
+        path = lambda name: os.path.join(index_dir, name)
+        load = lambda name: np.load(path(name), mmap_mode=mmap_mode)
+        if weights_only:
+            index.matrix = sparse.csr_matrix((0, meta["shape"][1]))
+        else:
+            index.matrix = sparse.csr_matrix(
+                (load("data.npy"), load("indices.npy"), load("indptr.npy")), shape=tuple(meta["shape"]))
+        index.question_ids = load("question_ids.npy")
+        index.g_item_nos = load("g_item_nos.npy")
+        if not weights_only and not meta["segments"] and os.path.exists(path("postings_indptr.npy")):
+            index._postings = sparse.csc_matrix(
+                (load("postings_data.npy"), load("postings_indices.npy"), load("postings_indptr.npy")),
+                shape=tuple(meta["shape"]))
+        if meta["vocabulary"] is not None:
+            vectorizer = TfidfVectorizer()
+            vectorizer.vocabulary_ = meta["vocabulary"]
+            vectorizer.idf_ = np.load(path("idf.npy"))
+            index.vectorizer = vectorizer
+
+        blocks = [index.matrix]
+        for name in meta["segments"]:
+            if not weights_only:
+                blocks.append(sparse.load_npz(path(name)))
+            ids = np.load(path(name[:-4] + "_ids.npz"))
+            index.question_ids = np.concatenate([index.question_ids, ids["question_ids"]])
+            index.g_item_nos = np.concatenate([index.g_item_nos, ids["g_item_nos"]])
+        if len(blocks) > 1:
+            index.matrix = sparse.vstack(blocks, format="csr")
+
+        index._segments = list(meta["segments"])
+        index.fitted_docs = meta["fitted_docs"]
+        index.appended_docs = meta["appended_docs"]
+        index.appended_tokens = meta["appended_tokens"]
+        index.unknown_tokens = meta["unknown_tokens"]
+        return index
+
+
+def _fit(texts):
+    if not texts:
+        return None, sparse.csr_matrix((0, 0))
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform(texts).tocsr()
+    return vectorizer, matrix
+
+
+def _load_questions(cursor, after_id=0):
+    """Returns (question_ids, question_texts, g_item_nos) for questions past after_id, in id order."""
+    cursor.execute(
+        "SELECT question_id, question_text, g_item_no FROM Question WHERE question_id > ? ORDER BY question_id",
+        (after_id,)
+    )
+    fetched = cursor.fetchall()
+    return ([r[0] for r in fetched], [r[1] or "" for r in fetched], [r[2] or 0 for r in fetched])
+
+
+def open_index(conn, db_path=None, index_dir=None, weights_only=False):
+    """Loads the saved index for this database (or builds one) and syncs it with the Question table."""
+    index = ((TfidfIndex.load(index_dir, weights_only=weights_only) if index_dir else None)
+             or TfidfIndex(index_dir, weights_only=weights_only))
+    index.sync(conn, db_path)
+    return index
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Local HTTP query service for the Q&A search and the product lookup.
+
+An asyncio server accepts the connections and never does the searching
+itself: each request is handed to a process pool. While every worker is
+busy, requests queue up and go to the next free worker as one task, so the
+hand-off cost is shared under load. Every worker process
+memory-maps the compacted TF-IDF index (so all workers share one copy of the
+matrix in the page cache; with GRAINGER_SEARCH=fts only its weights are read), opens its own read-only SQLite connection once
+and keeps it for every request it serves, and loads the toolbar's catalog and
+product index the first time it is asked for products.
+
+Endpoints (GET, JSON responses):
+  /search?q=...&category=adhesives&k=3   hydrated Q&A matches
+  /products?q=...&limit=3                product search results
+  /stats                                 query cache stats of the worker that answered
+  /health
+
+The index is a snapshot taken at startup; restart the service to pick up
+newly ingested questions.
+
+run: python service.py [--port 8765] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import main
+from query_cache import QueryCache
+from search_index import TfidfIndex
+
+PRODUCT_FIELDS = ("sku", "name", "category", "price", "stock", "rating")
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BATCH = 64  # requests sent to a worker in one task while every worker is busy
+
+_worker = None  # the Worker of this pool process
+
+
+class BadRequest(Exception):
+    """A request the service cannot answer; the message goes back to the client"""
+
+
+class Worker:
+    """Per-process search state: mapped index, one SQLite connection, lazily loaded catalog"""
+
+    def __init__(self, db_path, index_dir):
+        main.search_tier = main.SEARCH_TIER
+        weights_only = main.search_tier == "fts"  # the FTS5 tier only needs the vectorizer
+        self.index = TfidfIndex.load(index_dir, mmap_mode="r", weights_only=weights_only) if index_dir else None
+        main.index = self.index
+        main.query_cache = QueryCache(self.index) if self.index is not None else None
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        self.categories = main.load_categories(self.conn)
+        self._widget = None
+
+    @property
+    def widget(self):
+        if self._widget is None:
+            import menu
+            self._widget = menu.GraingerWidget(show_timings=False)
+        return self._widget
+
+    def search(self, query, category=None, k=3):
+        g_item_nos = None
+        if category is not None:
+            if category not in self.categories:
+                raise BadRequest(f"unknown category {category!r}")
+            g_item_nos = self.categories[category]
+        return main.cached_search(self.conn, query, k=k, g_item_nos=g_item_nos, category=category)
+
+    def stats(self):
+        stats = main.query_cache.stats() if main.query_cache is not None else {}
+        return dict(stats, pid=os.getpid())
+
+    def products(self, query, limit=3):
+        products = self.widget.products
+        return [{field: products[sku][field] for field in PRODUCT_FIELDS}
+                for sku in self.widget.search_products(query, limit)]
+
+
+def _init_worker(db_path, index_dir):
+    global _worker
+    _worker = Worker(db_path, index_dir)
+
+
+def _count(value):
+    """A positive integer query parameter"""
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"{value!r} is not positive")
+    return number
+
+
+def _run(method, *args):
+    """(ok, result or error message) of one call on this process's Worker"""
+    try:
+        return True, getattr(_worker, method)(*args)
+    except BadRequest as e:
+        return False, str(e)
+    except Exception as e:  # fail just this call, not the rest of its batch
+        return False, f"internal error: {type(e).__name__}: {e}"
+
+
+def _run_batch(calls):
+    """Pool entry point: results of several (method, *args) calls, in order"""
+    return [_run(*call) for call in calls]
+
+
+class QueryService:
+    """Minimal HTTP/1.1 front end (keep-alive, GET only) over a pool of Workers"""
+
+    def __init__(self, db_path=main.DB_PATH, index_dir=main.INDEX_DIR, workers=None):
+        # bring the saved index up to date once, here, so the workers only read it
+        conn = main.load_engine(db_path, index_dir, tier="tfidf")
+        main.index.compact()
+        conn.close()
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(db_path, index_dir))
+        self._pending = []  # [(call, future)] waiting for a free worker
+        self._busy = 0      # batches currently in the pool
+
+    def submit(self, *call):
+        """Future for one (method, *args) call, run in the pool in a batch with whatever else is waiting"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((call, future))
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        while self._pending and self._busy < self.workers:
+            batch, self._pending = self._pending[:MAX_BATCH], self._pending[MAX_BATCH:]
+            self._busy += 1
+            task = asyncio.get_running_loop().run_in_executor(self.pool, _run_batch, [call for call, _ in batch])
+            task.add_done_callback(lambda task, batch=batch: self._finish(task, batch))
+
+    def _finish(self, task, batch):
+        self._busy -= 1
+        try:
+            results = task.result()
+        except Exception as e:  # a worker died; fail this batch, keep serving
+            results = [(False, f"worker error: {e}")] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        self._dispatch()
+
+    async def route(self, path, params):
+        def param(name, default=None, cast=str):
+            values = params.get(name)
+            if not values:
+                if default is None:
+                    raise BadRequest(f"missing parameter {name!r}")
+                return default
+            try:
+                return cast(values[0])
+            except ValueError:
+                raise BadRequest(f"bad value for {name!r}")
+
+        if path == "/health":
+            return True, {"status": "ok"}
+        if path == "/search":
+            call = ("search", param("q"), params.get("category", [None])[0], param("k", 3, _count))
+        elif path == "/stats":
+            call = ("stats",)
+        elif path == "/products":
+            call = ("products", param("q"), param("limit", 3, _count))
+        else:
+            return None, "not found"
+        return await self.submit(*call)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    length = None  # the body can't be skipped, so answer and close
+                if length:
+                    await reader.readexactly(length)  # bodies are not used by any endpoint
+
+                url = urlsplit(target)
+                if length is None:
+                    status, body = 400, {"error": "bad Content-Length"}
+                elif method != "GET":
+                    status, body = 405, {"error": "only GET is supported"}
+                else:
+                    try:
+                        ok, result = await self.route(url.path, parse_qs(url.query))
+                    except BadRequest as e:
+                        ok, result = False, str(e)
+                    if ok:
+                        status, body = 200, result
+                    else:
+                        status, body = (404 if ok is None else 400), {"error": result}
+
+                keep_alive = (length is not None and version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=4096,
+                                            limit=MAX_HEADER_BYTES)
+        print(f"Serving on http://{host}:{port} with {self.workers} workers", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+def service_main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Q&A search and product lookup over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="search processes (default: CPU count)")
+    parser.add_argument("--db", default=main.DB_PATH)
+    parser.add_argument("--index", default=main.INDEX_DIR)
+    args = parser.parse_args(argv)
+
+    service = QueryService(args.db, args.index, args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    service_main()